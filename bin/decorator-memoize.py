@@ -0,0 +1,37 @@
+"""Compares the per-call overhead of @memoize in `caixa.decorators` against `functools.lru_cache`""" 
+import timeit
+from functools import lru_cache
+from caixa.decorators import memoize
+
+NUMBER = 200000
+
+
+def plain(x: int, y: int = 1) -> int:
+    return x + y
+
+CONTENDERS = {
+    'lru_cache(maxsize=None)': lru_cache(maxsize=None)(plain),
+    'lru_cache(maxsize=128)': lru_cache(maxsize=128)(plain),
+    'memoize': memoize(plain),
+    'memoize(maxsize=128)': memoize(maxsize=128)(plain),
+    'memoize(lock=True)': memoize(lock=True)(plain),
+    'memoize(ttl=60)': memoize(ttl=60)(plain),
+}
+
+CALLS = {
+    'positional': lambda f: f(3, 1),
+    'with default': lambda f: f(3),
+    'keyword': lambda f: f(3, y=1),
+}
+
+
+def main():
+    for (callname, call) in CALLS.items():
+        print(f"{callname}:")
+        for (name, function) in CONTENDERS.items():
+            call(function)  # warm the cache
+            delta = min(timeit.repeat(lambda: call(function), number=NUMBER, repeat=5))
+            print(f"  {name:<24} {1e9 * delta / NUMBER:8.1f} ns/call")
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 """Demonstrates usage of @timed decorator in `caixa.decorators`""" 
 import time
 import random 
-from caixa.decorators import timed
+from caixa.decorators import timed, TimingRegistry
 
 
 @timed(bare=False)
@@ -34,3 +34,18 @@ def woohoo(string: str) -> int:
 
 print(f"Argless case: got {length} in {delta} sec")
 
+
+registry = TimingRegistry()
+
+@timed(collect=registry)
+def hoohah(string: str) -> int:
+    delay = random.random() * .01
+    time.sleep(delay)
+    return len(string)
+
+for _ in range(50):
+    length = hoohah("bwah!")
+
+print(f"collect=registry: got {length}, with stats:")
+for line in registry.describe():
+    print(line)
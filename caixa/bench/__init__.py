@@ -0,0 +1,3 @@
+from .runner import BenchResult, run_benchmark
+from .suite import BenchSuite
+from .compare import Comparison, compare
@@ -0,0 +1,46 @@
+"""
+Runs the benchmark suite for caixa's own hot paths, optionally saving the results and comparing them
+against a saved baseline.  Exits with status 1 if any regressions are found, so it can gate CI runs:
+
+    python -m caixa.bench --dir bench --save baseline.json          # on the reference commit
+    python -m caixa.bench --dir bench --baseline baseline.json      # on the candidate
+"""
+import sys
+from caixa.argparse import ArgumentParser
+from caixa.xdir import XDir
+from .compare import compare, regressions
+from .hotpaths import SUITE
+
+
+def parse_args(argv: list[str]):
+    parser = ArgumentParser(prog='python -m caixa.bench')
+    parser.add_argument('--dir', default='.', help='directory for saved results')
+    parser.add_argument('--save', help='file (under --dir) to save results to')
+    parser.add_argument('--baseline', help='file (under --dir) with baseline results to compare against')
+    parser.add_argument('--filter', help='only run benchmarks whose names match this regex')
+    parser.add_argument('--trials', type=int, default=7)
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown counted as a regression')
+    return parser.parse_args(argv)
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    if args._message:
+        print(f"error: {args._message}", file=sys.stderr)
+        return 2
+    xdir = XDir(args.dir, vivify=True)
+    results = SUITE.run(args.filter, verbose=True, trials=args.trials)
+    if args.save:
+        SUITE.save(xdir, args.save, results)
+    if args.baseline:
+        baseline = SUITE.load(xdir, args.baseline)
+        if args.filter:
+            baseline = {name: baseline[name] for name in results if name in baseline}
+        comparisons = compare(results, baseline, args.threshold)
+        for c in comparisons:
+            print(c.describe())
+        if any(regressions(comparisons)):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""
+Provides `compare`, which matches up a set of benchmark results against a baseline set, and flags
+regressions (and improvements).
+
+A benchmark counts as having regressed if its median time has grown by more than the given relative
+:threshold, and if the increase is also larger than the interquartile range of either run (so that
+we don't cry wolf over a noisy benchmark).  Improvements are flagged symmetrically.
+"""
+from dataclasses import dataclass
+from typing import Iterator, Optional
+from .runner import BenchResult
+
+
+@dataclass
+class Comparison:
+    name: str
+    current: Optional[BenchResult]
+    baseline: Optional[BenchResult]
+    status: str  # one of 'ok', 'regression', 'improvement', 'new', 'missing'
+
+    @property
+    def ratio(self) -> Optional[float]:
+        """The ratio of current to baseline median times (so > 1 means slower)."""
+        if self.current is None or self.baseline is None:
+            return None
+        return self.current.median / self.baseline.median
+
+    def describe(self) -> str:
+        if self.ratio is None:
+            return f"{self.name}: {self.status}"
+        return f"{self.name}: {self.status} ({self.ratio:.2f}x baseline)"
+
+
+def classify(current: BenchResult, baseline: BenchResult, threshold: float) -> str:
+    delta = current.median - baseline.median
+    noise = max(current.iqr, baseline.iqr)
+    if delta > threshold * baseline.median and delta > noise:
+        return 'regression'
+    if -delta > threshold * baseline.median and -delta > noise:
+        return 'improvement'
+    return 'ok'
+
+def compare(results: dict[str, BenchResult], baseline: dict[str, BenchResult], threshold: float = 0.1) -> list[Comparison]:
+    comparisons = []
+    for (name, current) in results.items():
+        if name in baseline:
+            status = classify(current, baseline[name], threshold)
+            comparisons.append(Comparison(name, current, baseline[name], status))
+        else:
+            comparisons.append(Comparison(name, current, None, 'new'))
+    for name in baseline.keys() - results.keys():
+        comparisons.append(Comparison(name, None, baseline[name], 'missing'))
+    return comparisons
+
+def regressions(comparisons: list[Comparison]) -> Iterator[Comparison]:
+    return (c for c in comparisons if c.status == 'regression')
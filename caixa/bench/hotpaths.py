@@ -0,0 +1,101 @@
+"""
+A benchmark suite covering the hot paths in caixa itself.  Run it via `python -m caixa.bench`.
+"""
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+from caixa.argparse import ArgSpec
+from caixa.options import resolve_options, OptionsSchema
+from caixa.profile import TaggedProfiler, BatchedTaggedProfiler
+from caixa.text.util import basic_shape, has_non, is_alpha, is_blank, is_integer_like
+from caixa.text.batch import basic_shape_many
+from caixa.xdir import XDir
+from .suite import BenchSuite
+
+SUITE = BenchSuite('caixa')
+
+DEFAULTS = {'allow-snorkeling': True, 'rescue-after': 10, 'label': 'foo', 'ratio': 0.5, 'mode': None}
+UPDATES = {'rescue-after': 5, 'label': 'bar'}
+SCHEMA = OptionsSchema(DEFAULTS)
+# Held onto, so that the benchmark measures lookups of an already interned instance
+FROZEN = SCHEMA.freeze(UPDATES)
+
+STRINGS = ['foo', 'foo-bar', 'foo bar', ' foo', '', '  ', '12345', '-foo', 'foo--bar', 'x' * 40] * 10
+
+RECORDS = [{'id': str(i), 'name': STRINGS[i % len(STRINGS)], 'code': STRINGS[(i * 7) % len(STRINGS)]} for i in range(1000)]
+TAGMAP = {'blank': is_blank, 'integer': is_integer_like, 'empty': lambda s: s == ''}
+
+ARGV = "--limit 2 --help foo --bar".split(" ")
+ARGSPEC = ArgSpec({'mono': '--help,-h', 'pair': '--limit'})
+
+
+@SUITE.bench(name='options.resolve_options')
+def bench_resolve_options():
+    resolve_options(DEFAULTS, UPDATES)
+
+@SUITE.bench(name='options.OptionsSchema.resolve')
+def bench_schema_resolve():
+    SCHEMA.resolve(UPDATES)
+
+@SUITE.bench(name='options.OptionsSchema.freeze')
+def bench_schema_freeze():
+    SCHEMA.freeze(UPDATES)
+
+@SUITE.bench(name='options.OptionsSchema.resolve[defaults]')
+def bench_schema_resolve_defaults():
+    SCHEMA.resolve(None)
+
+@SUITE.bench(name='text.basic_shape')
+def bench_basic_shape():
+    for s in STRINGS:
+        basic_shape(s)
+
+@SUITE.bench(name='text.basic_shape_many')
+def bench_basic_shape_many():
+    basic_shape_many(STRINGS)
+
+TEXT = ("Thequickbrownfoxjumpsoverthelazydog" * 200) + "!"
+HAS_NON_ALPHA = has_non(is_alpha)
+HAS_NON_ALPHA_PERCHAR = has_non(is_alpha, compiled=False)
+
+@SUITE.bench(name='text.has_non')
+def bench_has_non():
+    HAS_NON_ALPHA(TEXT)
+
+@SUITE.bench(name='text.has_non[perchar]')
+def bench_has_non_perchar():
+    HAS_NON_ALPHA_PERCHAR(TEXT)
+
+@SUITE.bench(name='profile.TaggedProfiler.profile')
+def bench_profile():
+    TaggedProfiler(TAGMAP).profile(RECORDS, index=True)
+
+@SUITE.bench(name='profile.BatchedTaggedProfiler.profile')
+def bench_profile_batched():
+    BatchedTaggedProfiler(TAGMAP).profile(RECORDS, index=True)
+
+@SUITE.bench(name='argparse.ArgSpec.resolve')
+def bench_argspec_resolve():
+    ARGSPEC.resolve(ARGV)
+
+
+@contextmanager
+def _blocks(segmented: bool) -> Iterator[XDir]:
+    with tempfile.TemporaryDirectory() as path:
+        xdir = XDir(path, fsync=False)
+        if segmented:
+            xdir.segment('blocks', vivify=True)
+        for i in range(100):
+            xdir.save_block('blocks', i, RECORDS[:100])
+        yield xdir
+        xdir.close()
+
+@SUITE.bench(name='xdir.read_blocks', setup=lambda: _blocks(False))
+def bench_read_blocks(xdir: XDir):
+    for _ in xdir.read_blocks('blocks'):
+        pass
+
+@SUITE.bench(name='xdir.read_blocks[segment]', setup=lambda: _blocks(True))
+def bench_read_blocks_segment(xdir: XDir):
+    for _ in xdir.read_blocks('blocks'):
+        pass
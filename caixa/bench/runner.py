@@ -0,0 +1,107 @@
+"""
+Provides `run_benchmark`, which times a function in the manner of `timeit` (but with a bit more care),
+and `BenchResult`, a record of the timings thus obtained along with the usual summary statistics.
+
+A run goes like this:
+
+  - The function is called a few times to warm up (populating caches, triggering imports, etc).
+  - Unless given explicitly, the number of loops per trial is calibrated so that each trial takes
+    at least :min_time seconds (so that timer resolution and call overhead don't dominate).
+  - Each of the :trials is then timed with `time.perf_counter`, after a `gc.collect()` and with the
+    garbage collector disabled (unless :gc is set).
+
+We report per-call times based on the median across trials, with the interquartile range as a
+measure of spread - both of which are much less sensitive to the odd outlier than mean and stdev.
+"""
+import gc as _gc
+import time
+import statistics
+from dataclasses import dataclass, asdict
+from typing import Callable, Optional
+
+
+@dataclass
+class BenchResult:
+    name: str
+    loops: int
+    times: list[float]  # seconds per call, for each trial
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times)
+
+    @property
+    def iqr(self) -> float:
+        if len(self.times) < 2:
+            return 0.0
+        q1, _, q3 = statistics.quantiles(self.times, n=4, method='inclusive')
+        return q3 - q1
+
+    @property
+    def best(self) -> float:
+        return min(self.times)
+
+    @property
+    def ops_per_sec(self) -> float:
+        return 1 / self.median if self.median > 0 else float('inf')
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'BenchResult':
+        return cls(d['name'], d['loops'], list(d['times']))
+
+    def describe(self) -> str:
+        return (f"{self.name}: median={_fmt(self.median)}, iqr={_fmt(self.iqr)}, "
+                f"ops/sec={self.ops_per_sec:,.0f} ({len(self.times)} trials x {self.loops} loops)")
+
+
+def _fmt(seconds: float) -> str:
+    for (unit, scale) in (('ns', 1e-9), ('us', 1e-6), ('ms', 1e-3)):
+        if seconds < 1000 * scale:
+            return f"{seconds / scale:.1f} {unit}"
+    return f"{seconds:.3f} s"
+
+def time_loops(function: Callable, loops: int, gc: bool = False) -> float:
+    """Returns the total time (in seconds) taken by :loops calls to :function."""
+    _gc.collect()
+    enabled = _gc.isenabled()
+    if not gc:
+        _gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            function()
+        return time.perf_counter() - t0
+    finally:
+        if enabled:
+            _gc.enable()
+
+def calibrate(function: Callable, min_time: float = 0.1, gc: bool = False) -> int:
+    """Returns a loop count (a power of 10 times 1, 2 or 5) for which one trial takes at least :min_time seconds."""
+    loops = 1
+    while True:
+        for factor in (1, 2, 5):
+            n = loops * factor
+            if time_loops(function, n, gc) >= min_time:
+                return n
+        loops *= 10
+
+def run_benchmark(
+        function: Callable,
+        name: Optional[str] = None,
+        trials: int = 7,
+        warmup: int = 3,
+        loops: Optional[int] = None,
+        min_time: float = 0.1,
+        gc: bool = False) -> BenchResult:
+    """Benchmarks the (argless) :function, as described in the module docstring."""
+    if trials < 1:
+        raise ValueError(f"invalid trials count '{trials}'")
+    for _ in range(warmup):
+        function()
+    if loops is None:
+        loops = calibrate(function, min_time, gc)
+    times = [time_loops(function, loops, gc) / loops for _ in range(trials)]
+    return BenchResult(name or getattr(function, '__qualname__', str(function)), loops, times)
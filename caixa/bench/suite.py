@@ -0,0 +1,102 @@
+"""
+Provides `BenchSuite`, a named collection of benchmarks which can be run as a batch, with results
+saved to (and compared against) JSON files in an XDir.
+
+    suite = BenchSuite('mystuff')
+
+    @suite.bench
+    def parse_small():
+        parse(SMALL)
+
+    results = suite.run()
+    suite.save(xdir, 'bench-latest.json', results)
+    report = compare(results, suite.load(xdir, 'bench-baseline.json'))
+
+Benchmarks may also be given a :setup function, whose return value is passed as the sole argument to
+the benchmarked function (so that fixtures don't get rebuilt in every loop), and whose return value can
+be a context manager if the fixture needs cleaning up (temporary directories, say).
+"""
+import re
+import sys
+import time
+import platform
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Any
+from caixa.xdir import XDir
+from .runner import BenchResult, run_benchmark
+
+
+@dataclass
+class BenchCase:
+    name: str
+    function: Callable
+    setup: Optional[Callable] = None
+
+
+class BenchSuite:
+
+    def __init__(self, name: str):
+        self.name = name
+        self.cases: dict[str, BenchCase] = {}
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+    def add(self, name: str, function: Callable, setup: Optional[Callable] = None) -> None:
+        if name in self.cases:
+            raise ValueError(f"duplicate benchmark name '{name}'")
+        self.cases[name] = BenchCase(name, function, setup)
+
+    def bench(self, function: Optional[Callable] = None, name: Optional[str] = None, setup: Optional[Callable] = None) -> Callable:
+        """A decorator version of `add`, usable bare or with arguments."""
+        def decorator(f: Callable) -> Callable:
+            self.add(name or f.__name__, f, setup)
+            return f
+        return decorator if function is None else decorator(function)
+
+    def select(self, pattern: Optional[str] = None) -> Iterator[BenchCase]:
+        regex = re.compile(pattern) if pattern else None
+        for case in self.cases.values():
+            if regex is None or regex.search(case.name):
+                yield case
+
+    def run(self, pattern: Optional[str] = None, verbose: bool = False, **kwargs) -> dict[str, BenchResult]:
+        """Runs every benchmark whose name matches :pattern; any :kwargs are passed to `run_benchmark`."""
+        results = {}
+        for case in self.select(pattern):
+            fixture = case.setup() if case.setup else None
+            context = fixture if hasattr(fixture, '__enter__') else nullcontext(fixture)
+            with context as value:
+                function = case.function if case.setup is None else _bind(case.function, value)
+                results[case.name] = run_benchmark(function, case.name, **kwargs)
+            if verbose:
+                print(results[case.name].describe(), flush=True)
+        return results
+
+    #
+    # Persistence
+    #
+
+    def save(self, xdir: XDir, subpath: str, results: dict[str, BenchResult]) -> None:
+        struct = {'suite': self.name, 'meta': environment(), 'results': {k: r.to_dict() for (k, r) in results.items()}}
+        xdir.save_json(subpath, struct)
+
+    @staticmethod
+    def load(xdir: XDir, subpath: str) -> dict[str, BenchResult]:
+        struct = xdir.load_json(subpath)
+        return {k: BenchResult.from_dict(d) for (k, d) in struct['results'].items()}
+
+
+def _bind(function: Callable, value: Any) -> Callable:
+    return lambda: function(value)
+
+def environment() -> dict[str, Any]:
+    """Describes the environment in which a set of results was obtained."""
+    return {
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
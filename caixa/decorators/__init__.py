@@ -1,2 +1,4 @@
 from .memoize import memoize
-from .bench import timed, timed_with_return, timed_without_return 
+from .bench import timed, timed_with_return, timed_without_return, timed_collect
+from .registry import TimingRegistry, TimingStats
+from .persist import memoize_to, persistent_memoize
@@ -1,6 +1,8 @@
 import time
+import inspect
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Optional, Union, Any
+from .registry import TimingRegistry, REGISTRY
 
 """
 Provides decorators for creating easy wrappers to measure the execution time of an input function. 
@@ -24,9 +26,9 @@ def timed_without_return(func: Callable) -> Callable:
     """
     @wraps(func)
     def called(*args, **kwargs) -> float: 
-        t0 = time.time()
+        t0 = time.perf_counter()
         func(*args, **kwargs)
-        delta = time.time() - t0
+        delta = time.perf_counter() - t0
         return delta
     return called
 
@@ -44,13 +46,53 @@ def timed_with_return(func: Callable) -> Callable:
     """
     @wraps(func)
     def called(*args, **kwargs) -> tuple[float, Any]: 
-        t0 = time.time()
+        t0 = time.perf_counter()
         x = func(*args, **kwargs)
-        delta = time.time() - t0
+        delta = time.perf_counter() - t0
         return (delta, x)
     return called
 
-def timed(bare: bool = False) -> Callable:
+def timed_collect(registry: TimingRegistry, name: Optional[str] = None) -> Callable:
+    """
+    Returns a timing decorator which leaves the return signature of the decorated function alone, 
+    and instead records each elapsed time (as measured by `time.perf_counter_ns`) in the statistics 
+    kept for it in the given :registry.  These are keyed on :name, which defaults to the qualified 
+    name of the function.  Coroutine functions are timed up to the completion of the awaited call.
+
+        registry = TimingRegistry()
+
+        @timed_collect(registry)
+        def foobar(args: Any) -> Any:
+           return thing
+
+        thing = foobar(args)
+        print(registry['foobar'].describe())
+    """
+    def decorator(func: Callable) -> Callable:
+        stats = registry.stats(name or func.__qualname__)
+        record = stats.record
+        clock = time.perf_counter_ns
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def acalled(*args, **kwargs) -> Any:
+                t0 = clock()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    record(clock() - t0)
+            return acalled
+
+        @wraps(func)
+        def called(*args, **kwargs) -> Any:
+            t0 = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(clock() - t0)
+        return called
+    return decorator
+
+def timed(bare: bool = False, collect: Optional[Union[TimingRegistry, bool]] = None, name: Optional[str] = None) -> Callable:
     """
     A simple timing decorator, which adjusts its returned signature according to the 
     signature of the calling function (as specified by the 'bare' flag).
@@ -92,7 +134,19 @@ def timed(bare: bool = False) -> Callable:
 
     When run dynamically it will get confused about what it's being called on, which will trigger 
     a TypeError in the calling context. 
+
+    Finally, if a `collect` registry is given (or `collect=True`, for the default registry) then the 
+    returned signature is left as-is, and timings are recorded in the registry instead - as per
+    `timed_collect` above:
+
+        @timed(collect=registry)
+        def foobar_with_return(x: Any) -> Any:
+            return y
+
+        y = foobar_with_return(x)
     """
+    if collect is not None and collect is not False:
+        return timed_collect(REGISTRY if collect is True else collect, name)
     if bare:
         return timed_without_return
     else:
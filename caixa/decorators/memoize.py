@@ -1,14 +1,314 @@
-from typing import Callable
+"""
+Provides the `memoize` decorator, a general-purpose memoizer along the lines of `functools.lru_cache`,
+but with a few extras:
 
-def memoize(function: Callable) -> Callable:
+  - Cache keys are normalized against the signature of the wrapped function, so that `f(1, b=2)`,
+    `f(a=1, b=2)` and (if b defaults to 2) `f(1)` all share a single cache entry.
+  - Optional LRU eviction (via :maxsize) and expiry of stale entries (via :ttl, in seconds).  Without
+    a :maxsize, expired entries are also swept out as new ones come in, so that the cache stays bounded.
+  - Hit / miss / eviction counters, available through `cache_info()`.
+  - An optional thread-safe mode (via :lock) in which the lock guards only the cache itself, and is
+    never held while the wrapped function runs.
+  - Support for coroutine functions, along with coalescing of concurrent calls having the same key
+    (so that a burst of identical requests results in just one call to the backend).
+
+It can be used either bare or with arguments:
+
+    @memoize
+    def foo(x, y=0): ...
+
+    @memoize(maxsize=1000, ttl=60, lock=True)
+    def bar(x, y=0): ...
+"""
+import time
+import asyncio
+import inspect
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+from functools import wraps
+from threading import Lock
+from typing import Callable, Optional, Any
+from caixa.trace import TRACER
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+_MISSING = object()
+
+
+def make_keyer(function: Callable) -> Callable:
+    """
+    Returns a function which maps the (args, kwargs) of a call to :function onto a hashable key, such
+    that any two calls binding the same values to the same parameters get the same key.
+
+    For the common case of a function with only positional-or-keyword parameters, we avoid the (relatively
+    slow) general path through `inspect.Signature.bind` unless the call looks like it won't bind cleanly,
+    in which case `bind` gets to raise the appropriate TypeError.
+    """
+    try:
+        sig = inspect.signature(function)
+    except (TypeError, ValueError):
+        # Some builtins have no introspectable signature, in which case we make do with the raw call.
+        # Always a two-part key, so that (say) f(('a', 1)) and f(a=1) can't collide.
+        return lambda args, kwargs: (args, tuple(sorted(kwargs.items())))
+    params = list(sig.parameters.values())
+    var_keyword = [p.name for p in params if p.kind is p.VAR_KEYWORD]
+
+    def slow(args: tuple, kwargs: dict) -> tuple:
+        bound = sig.bind(*args, **kwargs)
+        bound.apply_defaults()
+        if var_keyword:
+            extra = bound.arguments[var_keyword[0]]
+            bound.arguments[var_keyword[0]] = tuple(sorted(extra.items()))
+        return tuple(bound.arguments.values())
+
+    positional = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    if not all(p.kind in positional for p in params):
+        return slow
+    nparams = len(params)
+    defaults = tuple(p.default for p in params if p.default is not p.empty)
+    nrequired = nparams - len(defaults)
+    slots = (_MISSING,) * nrequired + defaults
+    index = {p.name: i for (i, p) in enumerate(params) if p.kind is p.POSITIONAL_OR_KEYWORD}
+
+    def fast(args: tuple, kwargs: dict) -> tuple:
+        n = len(args)
+        if not kwargs:
+            if n == nparams:
+                return args
+            if nrequired <= n < nparams:
+                return args + defaults[n - nrequired:]
+            return slow(args, kwargs)
+        if n > nparams:
+            return slow(args, kwargs)
+        values = list(args + slots[n:])
+        for (k, v) in kwargs.items():
+            i = index.get(k)
+            if i is None or i < n:
+                return slow(args, kwargs)
+            values[i] = v
+        for i in range(n, nrequired):
+            if values[i] is _MISSING:
+                return slow(args, kwargs)
+        return tuple(values)
+    return fast
+
+
+class MemoCache:
     """
-    An extremely simple, general-purpose shallow memoizer.
+    The cache behind a memoized function: a dict (or, if bounded, an LRU-ordered dict) plus counters.
+    With a :ttl but no :maxsize the dict is kept in order of expiry instead, so that `put` can sweep
+    expired entries off the front of it.
     """
-    cache = {}
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None, clock: Callable = time.monotonic):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError(f"invalid maxsize '{maxsize}'")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"invalid ttl '{ttl}'")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.data: dict = {} if maxsize is None and ttl is None else OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        self.mutex = Lock()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key: Any) -> Any:
+        """Returns the cached value for :key, or the sentinel `_MISSING` (counting a hit or miss either way)."""
+        entry = self.data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return _MISSING
+        if self.ttl is not None:
+            value, expires = entry
+            if self.clock() >= expires:
+                del self.data[key]
+                self.evictions += 1
+                self.misses += 1
+                return _MISSING
+        else:
+            value = entry
+        if self.maxsize is not None:
+            self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        data = self.data
+        if self.ttl is None:
+            data[key] = value
+        else:
+            now = self.clock()
+            data[key] = (value, now + self.ttl)
+            if self.maxsize is None:
+                data.move_to_end(key)
+                self._sweep(now)
+        if self.maxsize is not None:
+            data.move_to_end(key)
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
+                self.evictions += 1
+
+    def _sweep(self, now: float) -> None:
+        # Entries are in order of expiry (see above), so the expired ones are all at the front
+        data = self.data
+        while data:
+            (_, expires) = next(iter(data.values()))
+            if now < expires:
+                break
+            data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self.mutex:
+            self.data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self.data))
+
+
+def memoize(
+        function: Optional[Callable] = None,
+        maxsize: Optional[int] = None,
+        ttl: Optional[float] = None,
+        lock: bool = False,
+        coalesce: bool = False) -> Callable:
+    """
+    Memoizes the given :function, as described in the module docstring.  The wrapper exposes
+    `cache_info()` and `cache_clear()` in the same manner as `functools.lru_cache`.
+    Note that, as with `lru_cache`, all arguments need to be hashable.
+
+    If :function is a coroutine function, the wrapper is one too, and it caches the awaited results
+    (rather than the coroutine objects).  In that case concurrent calls with the same key are always
+    coalesced: the first caller runs the coroutine, and the rest await its result.  Setting :coalesce
+    does the same for sync functions called from multiple threads (and implies :lock).
+    """
+    if function is None:
+        return lambda f: memoize(f, maxsize=maxsize, ttl=ttl, lock=lock, coalesce=coalesce)
+    cache = MemoCache(maxsize, ttl)
+    keyer = make_keyer(function)
+    # The function is only ever called on a cache miss, so wrapping it in a span costs hits nothing.
+    compute = TRACER.traced(f"memoize:{function.__qualname__}")(function)
+    if inspect.iscoroutinefunction(function):
+        wrapper = _async_wrapper(compute, cache, keyer)
+    elif coalesce:
+        wrapper = _coalescing_wrapper(compute, cache, keyer)
+    elif lock:
+        wrapper = _locked_wrapper(compute, cache, keyer)
+    elif maxsize is None and ttl is None:
+        wrapper = _lean_wrapper(compute, cache, keyer)
+    else:
+        wrapper = _plain_wrapper(compute, cache, keyer)
+    wrapper.__wrapped__ = function
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
+def _plain_wrapper(function: Callable, cache: MemoCache, keyer: Callable) -> Callable:
+    @wraps(function)
     def wrapper(*args, **kwargs):
-        key = tuple(args)
-        if key not in cache:
-            cache[key] = function(*args, **kwargs)
-        return cache[key]
-    return wrapper 
+        key = keyer(args, kwargs)
+        value = cache.get(key)
+        if value is _MISSING:
+            value = function(*args, **kwargs)
+            cache.put(key, value)
+        return value
+    return wrapper
+
+def _lean_wrapper(function: Callable, cache: MemoCache, keyer: Callable) -> Callable:
+    """For the most common (unbounded) case, a leaner wrapper which goes straight to the underlying dict."""
+    data = cache.data
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        key = keyer(args, kwargs)
+        value = data.get(key, _MISSING)
+        if value is _MISSING:
+            cache.misses += 1
+            value = data[key] = function(*args, **kwargs)
+        else:
+            cache.hits += 1
+        return value
+    return wrapper
+
+def _locked_wrapper(function: Callable, cache: MemoCache, keyer: Callable) -> Callable:
+    mutex = cache.mutex
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        key = keyer(args, kwargs)
+        with mutex:
+            value = cache.get(key)
+        if value is _MISSING:
+            value = function(*args, **kwargs)
+            with mutex:
+                cache.put(key, value)
+        return value
+    return wrapper
+
+def _coalescing_wrapper(function: Callable, cache: MemoCache, keyer: Callable) -> Callable:
+    mutex = cache.mutex
+    inflight: dict[Any, Future] = {}
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        key = keyer(args, kwargs)
+        with mutex:
+            value = cache.get(key)
+            if value is not _MISSING:
+                return value
+            future = inflight.get(key)
+            leader = future is None
+            if leader:
+                future = inflight[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            value = function(*args, **kwargs)
+        except BaseException as e:
+            with mutex:
+                del inflight[key]
+            future.set_exception(e)
+            raise
+        with mutex:
+            cache.put(key, value)
+            del inflight[key]
+        future.set_result(value)
+        return value
+    return wrapper
+
+def _async_wrapper(function: Callable, cache: MemoCache, keyer: Callable) -> Callable:
+    # No locking needed here, since everything in between the awaits runs without interruption. 
+    inflight: dict[Any, asyncio.Future] = {}
 
+    @wraps(function)
+    async def wrapper(*args, **kwargs):
+        key = keyer(args, kwargs)
+        value = cache.get(key)
+        if value is not _MISSING:
+            return value
+        future = inflight.get(key)
+        if future is not None:
+            # Shielded, so that a waiter being cancelled doesn't cancel the shared computation
+            return await asyncio.shield(future)
+        future = inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await function(*args, **kwargs)
+        except BaseException as e:
+            del inflight[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark the exception as retrieved, in case there were no waiters
+                future.exception()
+            raise
+        cache.put(key, value)
+        del inflight[key]
+        future.set_result(value)
+        return value
+    return wrapper
@@ -0,0 +1,302 @@
+import os
+import time
+import atexit
+import struct
+import pickle
+import hashlib
+from collections import namedtuple
+from functools import wraps
+from typing import Callable, Optional, Union, Any
+from caixa.xdir import XDir, Codec
+from .memoize import make_keyer
+
+"""
+Provides the `memoize_to` decorator (also available as `persistent_memoize`), which memoizes the
+results of a function to disk via an XDir, so that they survive across process restarts.
+
+Each call is reduced to a key by normalizing its arguments against the function signature (in the
+same way as `memoize` does), and then hashing these with `stable_digest`.  Results are stored as
+pickles named after that key, in a subdirectory named after the function.  A manifest recording the
+size and access times of every entry is kept alongside them (and in memory), so that a cache miss
+costs us a dict lookup - and no file access at all.
+
+    @memoize_to(XDir('/var/cache/myjob', vivify=True), maxsize=10000)
+    def expensive(x, y=1): ...
+
+The cache can be bounded by number of entries (:maxsize), by total bytes (:maxbytes) or by age (:ttl,
+in seconds), with least-recently-used entries evicted first.  Once a bound is exceeded, entries are
+evicted in a batch, down to :LOWWATER of the bound, so that the cost of eviction is spread over many
+stores.
+
+Changes to the manifest are kept in memory, and written out (merged with whatever other processes have
+written in the meantime) every :flush_every stores, at least every :flush_interval seconds when stores
+are being made, whenever entries get evicted, and at interpreter exit.  So the cost of rewriting the
+manifest is spread over many stores too - at the price of losing track of the most recent entries after
+a crash (their files then being deleted as orphans by `cache_cleanup`).
+"""
+
+MANIFEST = 'manifest.json'
+
+# The fraction of :maxsize / :maxbytes which eviction brings the cache back down to
+LOWWATER = 0.9
+
+PersistInfo = namedtuple('PersistInfo', ['hits', 'misses', 'evictions', 'currsize', 'currbytes'])
+
+
+def stable_digest(obj: Any, digest_size: int = 16) -> str:
+    """
+    Returns a hex digest of the given :obj which (unlike `hash`) is stable across processes and
+    interpreter runs.  Builtin scalars and containers are encoded canonically (with dicts and sets
+    sorted), so equal values give equal digests; anything else falls back to its pickle.
+    """
+    hasher = hashlib.blake2b(digest_size=digest_size)
+    _feed(hasher, obj)
+    return hasher.hexdigest()
+
+def _encode(obj: Any) -> bytes:
+    hasher = hashlib.blake2b()
+    _feed(hasher, obj)
+    return hasher.digest()
+
+def _feed(hasher: Any, obj: Any) -> None:
+    if obj is None:
+        hasher.update(b'N')
+    elif obj is True or obj is False:
+        hasher.update(b'T' if obj else b'F')
+    elif type(obj) is int:
+        hasher.update(b'i%d;' % obj)
+    elif type(obj) is float:
+        hasher.update(b'f' + obj.hex().encode() + b';')
+    elif type(obj) is str:
+        data = obj.encode('utf-8', 'surrogatepass')
+        hasher.update(b's' + struct.pack('<Q', len(data)) + data)
+    elif type(obj) is bytes:
+        hasher.update(b'b' + struct.pack('<Q', len(obj)) + obj)
+    elif type(obj) in (tuple, list):
+        hasher.update((b't' if type(obj) is tuple else b'l') + struct.pack('<Q', len(obj)))
+        for item in obj:
+            _feed(hasher, item)
+    elif type(obj) is dict:
+        hasher.update(b'd' + struct.pack('<Q', len(obj)))
+        for part in sorted(_encode(k) + _encode(v) for (k, v) in obj.items()):
+            hasher.update(part)
+    elif type(obj) in (set, frozenset):
+        hasher.update(b'S' + struct.pack('<Q', len(obj)))
+        for part in sorted(_encode(item) for item in obj):
+            hasher.update(part)
+    else:
+        cls = type(obj)
+        data = pickle.dumps(obj, protocol=4)
+        hasher.update(f"o{cls.__module__}.{cls.__qualname__};".encode() + struct.pack('<Q', len(data)) + data)
+
+
+class PersistentCache:
+    """The on-disk store behind a function decorated with `memoize_to`."""
+
+    def __init__(
+            self,
+            xdir: XDir,
+            maxsize: Optional[int] = None,
+            maxbytes: Optional[int] = None,
+            ttl: Optional[float] = None,
+            codec: Optional[Union[str, Codec]] = None,
+            flush_every: int = 100,
+            flush_interval: float = 30):
+        if flush_every < 1:
+            raise ValueError(f"invalid flush_every '{flush_every}'")
+        self.xdir = xdir
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.codec = codec
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.pending = 0
+        self.flushed = time.monotonic()
+        self.hits = self.misses = self.evictions = 0
+        self.entries: dict[str, dict] = {}
+        self.removed: set[str] = set()
+        self.dirty = False
+        self.load_manifest()
+
+    @staticmethod
+    def subpath(key: str) -> str:
+        return f"{key}.pickle"
+
+    def _read_entries(self) -> dict[str, dict]:
+        if self.xdir.exists(MANIFEST):
+            return self.xdir.load_json(MANIFEST)['entries']
+        return {}
+
+    def load_manifest(self) -> None:
+        self.entries = self._read_entries()
+        self.currbytes = sum(e['size'] for e in self.entries.values())
+
+    def save_manifest(self) -> None:
+        """
+        Writes out the manifest, first merging in any entries added by other processes sharing 
+        the same directory (less those we've removed since our last save).
+        """
+        with self.xdir.lock('manifest'):
+            entries = self._read_entries()
+            for key in self.removed:
+                entries.pop(key, None)
+            entries.update(self.entries)
+            self.xdir.save_json(MANIFEST, {'entries': entries}, indent=None)
+        self.entries = entries
+        self.currbytes = sum(e['size'] for e in entries.values())
+        self.removed = set()
+        self.dirty = False
+        self.pending = 0
+        self.flushed = time.monotonic()
+
+    def flush(self) -> None:
+        if self.dirty:
+            self.save_manifest()
+
+    def is_expired(self, entry: dict, now: float) -> bool:
+        return self.ttl is not None and now - entry['created'] >= self.ttl
+
+    def get(self, key: str, default: Any) -> Any:
+        entry = self.entries.get(key)
+        now = time.time()
+        if entry is None or self.is_expired(entry, now):
+            if entry is not None:
+                self.discard(key)
+            self.misses += 1
+            return default
+        try:
+            value = self.xdir.load_pickle(self.subpath(key))
+        except FileNotFoundError:
+            # Someone cleaned up behind our back
+            self.discard(key)
+            self.misses += 1
+            return default
+        entry['accessed'] = now
+        self.dirty = True
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        subpath = self.subpath(key)
+        self.xdir.save_pickle(subpath, value, self.codec)
+        now = time.time()
+        size = os.path.getsize(self.xdir.fullpath(subpath))
+        if key in self.entries:
+            self.currbytes -= self.entries[key]['size']
+        self.entries[key] = {'size': size, 'created': now, 'accessed': now}
+        self.currbytes += size
+        self.dirty = True
+        self.pending += 1
+        if self.evict() or self.pending >= self.flush_every or time.monotonic() - self.flushed >= self.flush_interval:
+            self.save_manifest()
+
+    def discard(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.currbytes -= entry['size']
+        self.removed.add(key)
+        try:
+            os.unlink(self.xdir.fullpath(self.subpath(key)))
+        except FileNotFoundError:
+            pass
+        self.dirty = True
+
+    def is_over(self, scale: float = 1) -> bool:
+        over_size = self.maxsize is not None and len(self.entries) > self.maxsize * scale
+        over_bytes = self.maxbytes is not None and self.currbytes > self.maxbytes * scale
+        return over_size or over_bytes
+
+    def evict(self) -> int:
+        """
+        If we're over the :maxsize or :maxbytes bounds, evicts least-recently-used entries until we're
+        down to :LOWWATER of them.  Returns the number of entries evicted.
+        """
+        if not self.is_over():
+            return 0
+        count = 0
+        for key in sorted(self.entries, key=lambda k: self.entries[k]['accessed']):
+            if not self.is_over(LOWWATER):
+                break
+            self.discard(key)
+            count += 1
+        self.evictions += count
+        return count
+
+    def cleanup(self, grace: float = 3600) -> None:
+        """
+        Drops expired entries, and manifest entries whose files have gone missing; and deletes any
+        orphaned entry files (as left behind by a crash between storing a result and recording it in
+        the manifest) which are older than :grace seconds.
+        """
+        now = time.time()
+        for key in [k for (k, e) in self.entries.items() if self.is_expired(e, now)]:
+            self.discard(key)
+        present = set()
+        for name in self.xdir.get_files():
+            key, ext = os.path.splitext(name)
+            if ext != '.pickle':
+                continue
+            if key in self.entries:
+                present.add(key)
+            elif now - os.path.getmtime(self.xdir.fullpath(name)) > grace:
+                os.unlink(self.xdir.fullpath(name))
+        for key in set(self.entries) - present:
+            self.discard(key)
+        self.evict()
+        self.flush()
+
+    def clear(self) -> None:
+        for key in list(self.entries):
+            self.discard(key)
+        self.hits = self.misses = self.evictions = 0
+        self.save_manifest()
+
+    def info(self) -> PersistInfo:
+        return PersistInfo(self.hits, self.misses, self.evictions, len(self.entries), self.currbytes)
+
+
+def memoize_to(
+        xdir: Union[XDir, str],
+        name: Optional[str] = None,
+        maxsize: Optional[int] = None,
+        maxbytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        codec: Optional[Union[str, Codec]] = None,
+        flush_every: int = 100,
+        flush_interval: float = 30) -> Callable:
+    """
+    Memoizes the decorated function to disk, under a subdirectory of :xdir named after the function
+    (or after :name, if given - which should be changed whenever the function's behavior does).
+    The wrapper exposes `cache_info()`, `cache_clear()`, `cache_cleanup()` and `cache_flush()`.
+    """
+    if isinstance(xdir, str):
+        xdir = XDir(xdir, vivify=True)
+
+    def decorator(function: Callable) -> Callable:
+        subdir = xdir.subdir(name or f"{function.__module__}.{function.__qualname__}", vivify=True)
+        cache = PersistentCache(
+            subdir, maxsize=maxsize, maxbytes=maxbytes, ttl=ttl, codec=codec,
+            flush_every=flush_every, flush_interval=flush_interval
+        )
+        keyer = make_keyer(function)
+        missing = object()
+        atexit.register(cache.flush)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            key = stable_digest(keyer(args, kwargs))
+            value = cache.get(key, missing)
+            if value is missing:
+                value = function(*args, **kwargs)
+                cache.put(key, value)
+            return value
+
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_cleanup = cache.cleanup
+        wrapper.cache_flush = cache.flush
+        return wrapper
+    return decorator
+
+persistent_memoize = memoize_to
@@ -0,0 +1,151 @@
+from typing import Iterator, Optional
+
+"""
+Provides `TimingRegistry`, a collection of per-function timing statistics as gathered by the
+`@timed(collect=registry)` decorator (see `caixa.decorators.bench`).
+
+Each `TimingStats` keeps a count, total, min and max, plus a `LogHistogram` from which percentiles
+can be estimated.  The histogram is log-linear in the manner of HDR histograms: values below 2**PRECISION
+get a bucket each, and above that each power-of-two range is split into 2**(PRECISION - 1) equal buckets.
+So memory is fixed (under a thousand counters, for any 64-bit value) and the relative error of any
+estimated percentile is bounded by about 2**-(PRECISION - 1), or some 3 percent.
+
+Recording a sample involves no allocation and no locking - so under heavy contention between threads
+an occasional sample may go missing, which is the price we pay for being cheap enough to leave on
+in production.
+"""
+
+PRECISION = 5
+_LINEAR = 1 << PRECISION
+_HALF = 1 << (PRECISION - 1)
+_NBUCKETS = _LINEAR + (64 - PRECISION) * _HALF
+
+
+def bucket_index(value: int) -> int:
+    if value < _LINEAR:
+        return value
+    shift = value.bit_length() - PRECISION
+    return _LINEAR + (shift - 1) * _HALF + (value >> shift) - _HALF
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    """Returns the (inclusive) range of values which map to the bucket at the given :index."""
+    if index < _LINEAR:
+        return (index, index)
+    shift, offset = divmod(index - _LINEAR, _HALF)
+    mantissa = _HALF + offset
+    return (mantissa << (shift + 1), ((mantissa + 1) << (shift + 1)) - 1)
+
+
+class LogHistogram:
+    """A fixed-size, log-linear histogram of non-negative integer values."""
+
+    __slots__ = ('counts', 'count')
+
+    def __init__(self):
+        self.counts = [0] * _NBUCKETS
+        self.count = 0
+
+    def record(self, value: int) -> None:
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+
+    def merge(self, other: 'LogHistogram') -> None:
+        self.counts = [a + b for (a, b) in zip(self.counts, other.counts)]
+        self.count += other.count
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Returns an estimate of the :q-th percentile (for q between 0 and 100), or None if empty."""
+        if not 0 <= q <= 100:
+            raise ValueError(f"invalid percentile '{q}'")
+        if self.count == 0:
+            return None
+        rank = max(1, q * self.count / 100)
+        seen = 0
+        for (index, n) in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                lo, hi = bucket_bounds(index)
+                return (lo + hi) / 2
+        raise RuntimeError("invalid state")
+
+
+class TimingStats:
+    """Aggregated timings (in nanoseconds) for a single function."""
+
+    __slots__ = ('name', 'count', 'total', 'min', 'max', 'histo')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self.histo = LogHistogram()
+
+    def record(self, delta: int) -> None:
+        self.count += 1
+        self.total += delta
+        if self.min is None or delta < self.min:
+            self.min = delta
+        if self.max is None or delta > self.max:
+            self.max = delta
+        self.histo.record(delta)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, q: float) -> Optional[float]:
+        return self.histo.percentile(q)
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max, 'mean': self.mean,
+            'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99)
+        }
+
+    def describe(self) -> str:
+        if not self.count:
+            return f"{self.name}: no samples"
+        micros = {k: v / 1000 for (k, v) in self.summary().items() if k not in ('count', 'total')}
+        terms = ", ".join(f"{k}={v:.1f}" for (k, v) in micros.items())
+        return f"{self.name}: count={self.count}, {terms} (usec)"
+
+
+class TimingRegistry:
+    """A named collection of `TimingStats`, created on first use."""
+
+    def __init__(self):
+        self._stats: dict[str, TimingStats] = {}
+
+    def stats(self, name: str) -> TimingStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats.setdefault(name, TimingStats(name))
+        return stats
+
+    def __getitem__(self, name: str) -> TimingStats:
+        return self._stats[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stats
+
+    def __iter__(self) -> Iterator[TimingStats]:
+        return iter(list(self._stats.values()))
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def clear(self) -> None:
+        self._stats.clear()
+
+    def summary(self) -> dict[str, dict]:
+        return {stats.name: stats.summary() for stats in self}
+
+    def describe(self) -> Iterator[str]:
+        for stats in sorted(self, key=lambda s: -s.total):
+            yield stats.describe()
+
+
+# A default registry, used by `@timed(collect=True)`
+REGISTRY = TimingRegistry()
@@ -1,6 +1,132 @@
-from typing import Any
+"""
+Provides the `Flyweight` metaclass, along with the registries in which it keeps the instances of each
+flyweight class.  The kind of registry is chosen per class, via keyword arguments in the class statement:
+
+    class Color(metaclass=Flyweight): ...                              # 'strong' (the default)
+    class Token(str, metaclass=Flyweight, registry='weak'): ...
+    class Cell(metaclass=Flyweight, registry='lru', maxsize=10000): ...
+
+  - 'strong' registries hold on to every instance ever created (in the module-level REG dict), as
+    flyweights always have.
+  - 'weak' registries hold weak references only, so that instances no longer in use elsewhere can be
+    garbage collected.  This requires instances to support weak references - which is the case for
+    ordinary classes and subclasses of `str`, but not for subclasses of `int`, `tuple` and the like.
+  - 'lru' registries hold on to the :maxsize most recently used instances, evicting the rest.
+
+Subclasses inherit each of the registry settings of their parent which they don't give themselves (except
+that :maxsize is only inherited by subclasses having an 'lru' registry), but get a registry of their own.
+
+Unless :lock=False is given, creation of new instances is guarded by a per-class lock (with the registry
+checked a second time once the lock is held), so that two threads constructing the same flyweight can't
+end up with different instances.  Lookups of existing instances never take the lock.  Hit, miss and
+eviction counts are available via `flyweight_info()` on the class; note that these are only approximate
+when the class is used from several threads at once.
+"""
+from collections import OrderedDict, namedtuple
+from functools import partial
+from threading import RLock
+from weakref import WeakValueDictionary
+from typing import Any, Callable, Optional
 
 REG: dict[type, dict[tuple, Any]] = {}
+
+MODES = ('strong', 'weak', 'lru')
+
+
+class FlyweightInfo(namedtuple('FlyweightInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])):
+    __slots__ = ()
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+
+class FlyweightRegistry:
+    """A registry backed by a plain dict, holding on to every instance."""
+
+    maxsize: Optional[int] = None
+
+    def __init__(self, data: Optional[dict] = None):
+        self.data = {} if data is None else data
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def lookup(self, key: tuple) -> Any:
+        """Returns the instance registered under :key (counting a hit), or None (counting a miss)."""
+        instance = self.data.get(key)
+        if instance is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return instance
+
+    def create(self, key: tuple, factory: Callable[[], Any]) -> Any:
+        """Returns the instance registered under :key, if there is one by now, or registers a new one from :factory."""
+        instance = self.data.get(key)
+        if instance is None:
+            instance = self.data[key] = factory()
+        return instance
+
+    def clear(self) -> None:
+        self.data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> FlyweightInfo:
+        return FlyweightInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self))
+
+
+class WeakFlyweightRegistry(FlyweightRegistry):
+    """A registry holding weak references only, from which instances disappear once they're no longer in use."""
+
+    def __init__(self):
+        super().__init__(WeakValueDictionary())
+
+
+class LRUFlyweightRegistry(FlyweightRegistry):
+    """A registry holding on to the :maxsize most recently used instances."""
+
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError(f"invalid maxsize '{maxsize}'")
+        super().__init__(OrderedDict())
+        self.maxsize = maxsize
+
+    def lookup(self, key: tuple) -> Any:
+        instance = super().lookup(key)
+        if instance is not None:
+            try:
+                self.data.move_to_end(key)
+            except KeyError:
+                # Evicted by another thread in the meantime, which is fine: we still have the instance
+                pass
+        return instance
+
+    def create(self, key: tuple, factory: Callable[[], Any]) -> Any:
+        instance = super().create(key, factory)
+        data = self.data
+        while len(data) > self.maxsize:
+            data.popitem(last=False)
+            self.evictions += 1
+        return instance
+
+
+def make_registry(cls: type, mode: str, maxsize: Optional[int]) -> FlyweightRegistry:
+    if mode not in MODES:
+        raise ValueError(f"invalid registry mode '{mode}' - must be one of {list(MODES)}")
+    if (mode == 'lru') != (maxsize is not None):
+        raise ValueError(f"invalid maxsize '{maxsize}' - required for (and only for) registry mode 'lru'")
+    if mode == 'weak':
+        if not cls.__weakrefoffset__:
+            raise TypeError(f"invalid registry mode '{mode}' - instances of {cls.__name__} don't support weak references")
+        return WeakFlyweightRegistry()
+    if mode == 'lru':
+        return LRUFlyweightRegistry(maxsize)
+    return FlyweightRegistry(REG.setdefault(cls, {}))
+
+
 class Flyweight(type):
     """A simple flyweight mixin that works in the narrow use case in which the constructor is 
     called with positional arguments only.  That is, it memoizes only on the list of `args` passed, 
@@ -14,13 +140,48 @@ class Flyweight(type):
     arguments, for example.
 
     But for the narrow use case above, it does seem to work.
-    See the test suite for sample usage."""
+    See the module docstring for the choice of registries, and the test suite for sample usage."""
+
+    def __new__(mcls, name: str, bases: tuple, namespace: dict, **kwargs) -> type:
+        return super().__new__(mcls, name, bases, namespace)
+
+    def __init__(
+            cls,
+            name: str,
+            bases: tuple,
+            namespace: dict,
+            registry: Optional[str] = None,
+            maxsize: Optional[int] = None,
+            lock: Optional[bool] = None):
+        super().__init__(name, bases, namespace)
+        # Settings not given explicitly are inherited (via plain attribute lookup) from the parent class, if any
+        parent_registry, parent_maxsize, parent_lock = getattr(cls, '_flyweight_settings', ('strong', None, True))
+        if registry is None:
+            registry = parent_registry
+        if maxsize is None and registry == 'lru':
+            maxsize = parent_maxsize
+        settings = (registry, maxsize, parent_lock if lock is None else lock)
+        cls._flyweight_settings = settings
+        cls._flyweight_registry = make_registry(cls, registry, maxsize)
+        cls._flyweight_lock = RLock() if settings[2] else None
+
     def __call__(cls, *args, **kwargs) -> Any:
-        if cls not in REG:
-            REG[cls] = {}
-        pk = tuple(args) 
-        instance: Any = REG[cls].get(pk)
+        pk = tuple(args)
+        registry = cls._flyweight_registry
+        instance: Any = registry.lookup(pk)
         if instance is None:
-            instance = REG[cls][pk] = type.__call__(cls, *args, **kwargs)
+            factory = partial(type.__call__, cls, *args, **kwargs)
+            lock = cls._flyweight_lock
+            if lock is None:
+                return registry.create(pk, factory)
+            with lock:
+                instance = registry.create(pk, factory)
         return instance
 
+    def flyweight_info(cls) -> FlyweightInfo:
+        """Returns the hit, miss and eviction counts (and size) of the registry for this class."""
+        return cls._flyweight_registry.info()
+
+    def flyweight_clear(cls) -> None:
+        """Empties the registry for this class (and resets its counts)."""
+        cls._flyweight_registry.clear()
@@ -33,11 +33,38 @@ DEFAULTOPTIONS = {'allow-snorkeling': True, 'rescue-after': 10}
 
 That's it, and most of the time, it should be all you need.
 
+For functions which resolve their options on every call (e.g. per-record transforms), the defaults can
+instead be wrapped in an `OptionsSchema` once, up front:
+
+```
+DEFAULTSCHEMA = OptionsSchema(DEFAULTOPTIONS)
+
+    def rescue_person(self, instructor: str, options: dict[str,any]): 
+        niceopts = DEFAULTSCHEMA.resolve(options)
+```
+
+which returns a read-only mapping layering the updates over the defaults, rather than a fresh deep copy
+of the whole defaults dict.  Immutable values (which is typically all of them) are shared rather than
+copied, so when no updates are given, resolving costs next to nothing.
+
+Where the resolved options need to be hashable - e.g. to be passed to a function memoized with
+`caixa.decorators.memoize` - use `DEFAULTSCHEMA.freeze(options)` instead.  This returns a `FrozenOptions`
+(in which lists are turned into tuples, and sets into frozensets), interned so that equal sets of options
+resolved against the same schema give the very same object, for as long as it's in use.
+
 TODO: enforce type compliance on values.
 """
 
+from collections import abc
 from copy import deepcopy
-from typing import Any
+from weakref import WeakValueDictionary
+from enum import Enum
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping, Optional, Union
+
+# Types whose instances are immutable (provided, for tuples and frozensets, that their members are too)
+IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes, range, Enum)
+_SCALARS = frozenset(IMMUTABLE_TYPES[:-1])
 
 def update_strict(targetdict: dict, otherdict: dict, forcedeep: bool = True) -> None: 
     """Merges dicts while enforcing constraints (and deepness).
@@ -59,13 +86,202 @@ def assert_valid_option_key(k: str) -> None:
     if len(k) == 0:
         raise ValueError(f"invalid option key '{k}' - cannot be the empty string") 
 
-def resolve_options(default_options: dict[str, Any], update_options: dict[str, Any]) -> dict[str, Any]:
+def resolve_options(
+        default_options: Union[dict[str, Any], 'OptionsSchema'],
+        update_options: dict[str, Any]) -> Union[dict[str, Any], 'ResolvedOptions']:
     """
     Returns a new options dict, with the :default_options and :update_options dicts safely merged.
+    If the :default_options are given as an `OptionsSchema`, we instead return the (read-only)
+    `ResolvedOptions` mapping given by its `resolve`.
     """
+    if isinstance(default_options, OptionsSchema):
+        return default_options.resolve(update_options)
     if update_options is None:
         update_options = {}
     newoptions = deepcopy(default_options)
     update_strict(newoptions, update_options)
     return newoptions 
 
+
+def is_immutable(value: Any) -> bool:
+    """Returns True if the given :value can safely be shared (rather than copied) between option dicts."""
+    if type(value) in _SCALARS:
+        return True
+    if isinstance(value, (tuple, frozenset)):
+        return all(map(is_immutable, value))
+    return isinstance(value, IMMUTABLE_TYPES)
+
+def freeze(value: Any) -> Any:
+    """Returns an immutable, hashable equivalent of the given :value (or raises TypeError if there isn't one)."""
+    if type(value) in _SCALARS:
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(map(freeze, value))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(map(freeze, value))
+    try:
+        hash(value)
+    except TypeError:
+        raise TypeError(f"invalid option value '{value}' - can't be frozen") from None
+    return value
+
+def _typed(value: Any) -> tuple:
+    """Returns a key for the given (frozen) :value which, unlike the value itself, compares unequal to values of other types."""
+    if type(value) is tuple:
+        return (tuple, tuple(map(_typed, value)))
+    if type(value) is frozenset:
+        return (frozenset, frozenset(map(_typed, value)))
+    return (type(value), value)
+
+
+class OptionsSchema:
+    """
+    A set of default options, validated and analyzed once so that options can be resolved against them
+    cheaply, many times over.  The defaults are deep-copied on construction, so later changes to the dict
+    passed in have no effect.
+    """
+
+    def __init__(self, default_options: dict[str, Any]):
+        for k in default_options:
+            assert_valid_option_key(k)
+        defaults = deepcopy(default_options)
+        self.defaults: Mapping[str, Any] = MappingProxyType(defaults)
+        self.keys = frozenset(defaults)
+        self.mutable = frozenset(k for (k, v) in defaults.items() if not is_immutable(v))
+        # With no mutable defaults, resolving no updates always gives the same result
+        self._bare = None if self.mutable else ResolvedOptions(self, {})
+        self._frozen_defaults: Optional[dict[str, Any]] = None
+        self._frozen_bare: Optional[FrozenOptions] = None
+        self._interned: WeakValueDictionary = WeakValueDictionary()
+
+    def __repr__(self) -> str:
+        return f"OptionsSchema({dict(self.defaults)})"
+
+    def assert_valid(self, update_options: dict[str, Any]) -> None:
+        """Raises ValueError (exactly as `update_strict` would) if any of the update keys are invalid."""
+        if not self.keys.issuperset(update_options):
+            for k in update_options:
+                assert_valid_option_key(k)
+                if k not in self.keys:
+                    raise ValueError(f"invalid option key '{k}' - not recognized")
+
+    def resolve(self, update_options: Optional[dict[str, Any]] = None) -> 'ResolvedOptions':
+        """
+        Returns a read-only mapping of the defaults with the :update_options applied - with the same
+        validation and (for mutable values) deep-copying as `resolve_options`, but without copying any
+        immutable values.
+        """
+        if not update_options:
+            if self._bare is not None:
+                return self._bare
+            update_options = {}
+        self.assert_valid(update_options)
+        overlay = {k: deepcopy(self.defaults[k]) for k in self.mutable if k not in update_options}
+        for (k, v) in update_options.items():
+            overlay[k] = v if is_immutable(v) else deepcopy(v)
+        return ResolvedOptions(self, overlay)
+
+    def freeze(self, update_options: Optional[dict[str, Any]] = None) -> 'FrozenOptions':
+        """
+        Returns the (interned) `FrozenOptions` for the defaults with the :update_options applied.  Values
+        are validated as for `resolve`, and frozen (see `freeze`) rather than copied.
+        """
+        if self._frozen_defaults is None:
+            self._frozen_defaults = {k: freeze(v) for (k, v) in self.defaults.items()}
+        if not update_options:
+            if self._frozen_bare is None:
+                self._frozen_bare = self._intern(tuple(self._frozen_defaults.values()))
+            return self._frozen_bare
+        self.assert_valid(update_options)
+        values = tuple(
+            freeze(update_options[k]) if k in update_options else v
+            for (k, v) in self._frozen_defaults.items()
+        )
+        return self._intern(values)
+
+    def _intern(self, values: tuple) -> 'FrozenOptions':
+        # Values like 0, 0.0 and False are equal (and hash alike), so we have to key on their types too
+        key = tuple(map(_typed, values))
+        options = self._interned.get(key)
+        if options is None:
+            options = self._interned.setdefault(key, FrozenOptions(self, values, key))
+        return options
+
+
+class ResolvedOptions(abc.Mapping):
+    """
+    The result of `OptionsSchema.resolve`: a read-only view of the schema's defaults, overlaid with
+    whichever values were given as updates (or had to be copied).
+    """
+
+    __slots__ = ('schema', '_overlay')
+
+    def __init__(self, schema: OptionsSchema, overlay: dict[str, Any]):
+        self.schema = schema
+        self._overlay = overlay
+
+    def __getitem__(self, k: str) -> Any:
+        overlay = self._overlay
+        return overlay[k] if k in overlay else self.schema.defaults[k]
+
+    def __contains__(self, k: object) -> bool:
+        return k in self.schema.keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.schema.defaults)
+
+    def __len__(self) -> int:
+        return len(self.schema.keys)
+
+    def __repr__(self) -> str:
+        return f"ResolvedOptions({dict(self)})"
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns a plain (and independent) dict of the resolved options, as `resolve_options` would."""
+        return deepcopy(dict(self))
+
+    def freeze(self) -> 'FrozenOptions':
+        """Returns the (interned) `FrozenOptions` equivalent to these ones."""
+        return self.schema.freeze(self._overlay)
+
+
+class FrozenOptions(ResolvedOptions):
+    """
+    The result of `OptionsSchema.freeze`: an immutable, hashable (and interned) set of resolved options.
+    Its hash is computed once, up front, so it makes for a cheap cache key.
+    """
+
+    __slots__ = ('_key', '_hash', '__weakref__')
+
+    def __init__(self, schema: OptionsSchema, values: tuple, key: tuple):
+        setattr_ = object.__setattr__
+        setattr_(self, 'schema', schema)
+        setattr_(self, '_overlay', dict(zip(schema.defaults, values)))
+        setattr_(self, '_key', key)
+        setattr_(self, '_hash', hash(key))
+
+    def __getitem__(self, k: str) -> Any:
+        return self._overlay[k]
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"invalid usage - {type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"invalid usage - {type(self).__name__} is immutable")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if isinstance(other, FrozenOptions):
+            # Compared on the (type-tagged) keys which they hash on, so as to keep equality consistent
+            # with the hash - plus the option names, if they come from different schemas.
+            if self._hash != other._hash or self._key != other._key:
+                return False
+            return other.schema is self.schema or list(self._overlay) == list(other._overlay)
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        return f"FrozenOptions({dict(self)})"
@@ -1 +1,4 @@
-from .tagged import TaggedProfiler
+from .tagged import TaggedProfiler, TaggedProfilerSummary, PartialSummary
+from .batched import BatchedTaggedProfiler, columnar
+from .index import RunIndex, RecordSample
+from .incremental import IncrementalProfiler, WindowStats
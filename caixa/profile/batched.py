@@ -0,0 +1,163 @@
+"""
+Provides `BatchedTaggedProfiler`, a drop-in replacement for `TaggedProfiler` whose `profile` method gives
+the same `TaggedProfilerSummary`, but gets there much faster on large record streams.
+
+Rather than walking over every (tag, key, value) combination in Python and allocating a status object
+for every hit, records are taken in chunks, transposed into columns, and each tag predicate is mapped
+over a whole column at once.  Hits are kept as one byte per record per tag (in a preallocated
+`bytearray` for each chunk), with the flags for successive columns OR'd together in a single step,
+so that nothing gets allocated per hit.
+
+Tag predicates can be given as:
+
+  - plain callables on a single value (as for `TaggedProfiler`);
+  - compiled regexes, which are taken to match a value if `search` does;
+  - callables marked with `@columnar`, which are given a whole column (a tuple of values) and return
+    a sequence of truthy / falsy flags, one per value - for instance via NumPy string operations
+    such as `numpy.char.isdigit`.
+
+If NumPy is installed it is also used to combine the flags; otherwise we fall back to big-integer
+arithmetic, which is nearly as quick.
+"""
+import re
+from itertools import compress, islice
+from operator import itemgetter
+from typing import Iterator, Callable, Any, Optional, Union
+from caixa.trace import traced
+from .tagged import TaggedProfiler, TaggedProfilerSummary
+from .index import RunIndex, RecordSample, RETAIN
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_CHUNKSIZE = 10000
+
+TagSpec = Union[Callable, re.Pattern]
+
+
+def columnar(function: Callable) -> Callable:
+    """Marks a tag predicate as taking a whole column of values at once."""
+    function.columnar = True
+    return function
+
+
+def _compile(spec: TagSpec) -> tuple[Callable, bool]:
+    """Returns a (predicate, is_columnar) pair for the given tag :spec."""
+    if isinstance(spec, re.Pattern):
+        return (spec.search, False)
+    if callable(spec):
+        return (spec, getattr(spec, 'columnar', False))
+    raise ValueError(f"invalid tag predicate '{spec}'")
+
+def _flags(predicate: Callable, is_columnar: bool, column: tuple) -> bytes:
+    """Evaluates :predicate over the given :column, returning one 0/1 byte per value."""
+    if is_columnar:
+        mask = predicate(column)
+        if numpy is not None and isinstance(mask, numpy.ndarray):
+            return mask.astype(bool).tobytes()
+        return bytes(map(bool, mask))
+    return bytes(map(bool, map(predicate, column)))
+
+def _union(a: bytearray, b: bytes) -> bytearray:
+    """Returns the bytewise OR of two equal-length 0/1 flag arrays."""
+    if numpy is not None:
+        return bytearray(numpy.bitwise_or(numpy.frombuffer(a, numpy.uint8), numpy.frombuffer(b, numpy.uint8)).tobytes())
+    n = len(a)
+    return bytearray((int.from_bytes(a, 'little') | int.from_bytes(b, 'little')).to_bytes(n, 'little'))
+
+
+def transpose(chunk: list[dict]) -> Iterator[tuple[Optional[list[int]], tuple]]:
+    """
+    Yields (rows, column) pairs for the values in the given :chunk of records, key by key.  Where every
+    record has the same keys (by far the most common case) this is done at C speed, and :rows is None
+    (meaning the column lines up with the chunk); otherwise :rows gives the chunk position of each value.
+    """
+    keys = tuple(chunk[0])
+    first = chunk[0].keys()
+    if keys and all(r.keys() == first for r in chunk):
+        if len(keys) == 1:
+            yield (None, tuple(map(itemgetter(keys[0]), chunk)))
+        else:
+            for column in zip(*map(itemgetter(*keys), chunk)):
+                yield (None, column)
+        return
+    columns: dict[str, tuple[list, list]] = {}
+    for (i, r) in enumerate(chunk):
+        for (k, v) in r.items():
+            entry = columns.get(k)
+            if entry is None:
+                entry = columns[k] = ([], [])
+            entry[0].append(i)
+            entry[1].append(v)
+    for (rows, values) in columns.values():
+        yield (rows, tuple(values))
+
+
+class BatchedTaggedProfiler(TaggedProfiler):
+    """A `TaggedProfiler` with a chunked, column-at-a-time `profile` method (see the module docstring)."""
+
+    def __init__(self, tagmap: dict[str, TagSpec], chunksize: int = DEFAULT_CHUNKSIZE):
+        if chunksize < 1:
+            raise ValueError(f"invalid chunksize '{chunksize}'")
+        super().__init__(tagmap)
+        self.chunksize = chunksize
+        self._compiled = {tag: _compile(spec) for (tag, spec) in tagmap.items()}
+
+    def eval_chunk(self, chunk: list[dict]) -> dict[str, bytearray]:
+        """Returns, for each tag, a bytearray flagging the records in the :chunk for which the tag hit."""
+        n = len(chunk)
+        hits = {tag: bytearray(n) for tag in self._compiled}
+        if not n:
+            return hits
+        for (rows, column) in transpose(chunk):
+            for (tag, (predicate, is_columnar)) in self._compiled.items():
+                flags = _flags(predicate, is_columnar, column)
+                if rows is None:
+                    hits[tag] = _union(hits[tag], flags)
+                else:
+                    marks = hits[tag]
+                    for i in compress(rows, flags):
+                        marks[i] = 1
+        return hits
+
+    @traced('profile.BatchedTaggedProfiler.profile')
+    def profile(
+            self,
+            recs: Iterator[dict],
+            index: bool = False,
+            deep: bool = False,
+            retain: Optional[int] = RETAIN,
+            reservoir: bool = False) -> TaggedProfilerSummary:
+        """Gives the same summary as `TaggedProfiler.profile`, as computed chunk by chunk."""
+        labels = list(self.tagmap.keys())
+        _total = 0
+        _histo: dict[str, int] = {k: 0 for k in labels}
+        temp_index: dict[str, RunIndex] = {k: RunIndex() for k in labels}
+        temp_cache = RecordSample(retain, reservoir) if deep else None
+        recs = iter(recs)
+        base = 0
+        while True:
+            chunk = list(islice(recs, self.chunksize))
+            if not chunk:
+                break
+            n = len(chunk)
+            hits = self.eval_chunk(chunk)
+            anyhit = bytearray(n)
+            for (tag, flags) in hits.items():
+                _histo[tag] += flags.count(1)
+                temp_index[tag].add_flags(flags, base)
+                anyhit = _union(anyhit, flags)
+            _total += anyhit.count(1)
+            if deep:
+                for i in compress(range(n), anyhit):
+                    temp_cache.offer(base + i, chunk[i])
+            base += n
+        _index: Optional[dict[str, RunIndex]] = None
+        _cache: Optional[dict[int, Any]] = None
+        if temp_index:
+            _index = temp_index
+        if deep:
+            _cache = temp_cache.cache()
+        return TaggedProfilerSummary(_total, _histo, _index, _cache)
@@ -0,0 +1,209 @@
+"""
+Provides `IncrementalProfiler`, which profiles a record stream as it goes (rather than all at once, as
+`TaggedProfiler.profile` does), so that running stats are available at any point during a long ingest:
+
+    profiler = IncrementalProfiler(TaggedProfiler(tagmap), window=10000, period=60)
+    for r in stream:
+        profiler.feed(r)
+        if ...:
+            log(profiler.snapshot().histo, profiler.window().histo, profiler.recent().histo)
+
+A `snapshot` gives the same `TaggedProfilerSummary` as `profile` would for the records fed in so far.
+By default it only copies the counts (which is cheap, whatever the size of the stream) - the index and
+cache are copied only on request.
+
+With a :window size, the profiler also keeps histograms for the last :window records, and with a
+:period (in seconds) for the records fed in over roughly that many seconds (to within the width of
+one of its :buckets).  Either way memory use is bounded, so these can be left on for live streams.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Callable, Optional
+from .tagged import TaggedProfiler, TaggedProfilerSummary
+from .index import RunIndex, RecordSample, RETAIN
+
+DEFAULT_BUCKETS = 60
+
+
+@dataclass
+class WindowStats:
+    size: int    # the number of records in the window
+    total: int   # how many of them got any hits
+    histo: dict
+
+
+class CountWindow:
+    """Per-tag hit counts over the last :size records, each of which is given as a bitmask of tags hit."""
+
+    def __init__(self, size: int, ntags: int):
+        if size < 1:
+            raise ValueError(f"invalid window size '{size}'")
+        self.masks: deque = deque(maxlen=size)
+        self.counts = [0] * ntags
+        self.total = 0
+
+    def push(self, mask: int) -> None:
+        masks = self.masks
+        if len(masks) == masks.maxlen:
+            self._count(masks[0], -1)
+        masks.append(mask)
+        self._count(mask, 1)
+
+    def _count(self, mask: int, delta: int) -> None:
+        if mask:
+            self.total += delta
+            j = 0
+            while mask:
+                if mask & 1:
+                    self.counts[j] += delta
+                mask >>= 1
+                j += 1
+
+    def stats(self, labels: list[str]) -> WindowStats:
+        return WindowStats(len(self.masks), self.total, dict(zip(labels, self.counts)))
+
+
+class TimeWindow:
+    """Per-tag hit counts over the last :period seconds, kept in a ring of :buckets equal time slices."""
+
+    def __init__(self, period: float, ntags: int, buckets: int = DEFAULT_BUCKETS, clock: Callable = time.monotonic):
+        if period <= 0:
+            raise ValueError(f"invalid period '{period}'")
+        if buckets < 1:
+            raise ValueError(f"invalid bucket count '{buckets}'")
+        self.width = period / buckets
+        self.clock = clock
+        self.ntags = ntags
+        # Each slot holds [tick, size, total, counts], where tick identifies the time slice it belongs to
+        self.slots = [[-1, 0, 0, [0] * ntags] for _ in range(buckets)]
+
+    def _slot(self, tick: int) -> list:
+        slot = self.slots[tick % len(self.slots)]
+        if slot[0] != tick:
+            slot[0], slot[1], slot[2], slot[3] = tick, 0, 0, [0] * self.ntags
+        return slot
+
+    def push(self, mask: int) -> None:
+        slot = self._slot(int(self.clock() / self.width))
+        slot[1] += 1
+        if mask:
+            slot[2] += 1
+            counts = slot[3]
+            j = 0
+            while mask:
+                if mask & 1:
+                    counts[j] += 1
+                mask >>= 1
+                j += 1
+
+    def stats(self, labels: list[str]) -> WindowStats:
+        tick = int(self.clock() / self.width)
+        oldest = tick - len(self.slots) + 1
+        size = total = 0
+        counts = [0] * self.ntags
+        for (t, n, hits, c) in self.slots:
+            if oldest <= t <= tick:
+                size += n
+                total += hits
+                counts = [a + b for (a, b) in zip(counts, c)]
+        return WindowStats(size, total, dict(zip(labels, counts)))
+
+
+class IncrementalProfiler:
+    """Accumulates a tag profile one record (or batch) at a time, as described in the module docstring."""
+
+    def __init__(
+            self,
+            profiler: TaggedProfiler,
+            deep: bool = False,
+            retain: Optional[int] = RETAIN,
+            reservoir: bool = False,
+            window: Optional[int] = None,
+            period: Optional[float] = None,
+            buckets: int = DEFAULT_BUCKETS,
+            clock: Callable = time.monotonic):
+        self.profiler = profiler
+        self.labels = list(profiler.tagmap.keys())
+        self.predicates = list(profiler.tagmap.values())
+        self.size = 0
+        self.total = 0
+        self.counts = [0] * len(self.labels)
+        self.index = [RunIndex() for _ in self.labels]
+        self.cache = RecordSample(retain, reservoir) if deep else None
+        self.counter = CountWindow(window, len(self.labels)) if window is not None else None
+        self.timer = TimeWindow(period, len(self.labels), buckets, clock) if period is not None else None
+
+    def _mask(self, r: dict) -> int:
+        mask = 0
+        values = r.values()
+        for (j, f) in enumerate(self.predicates):
+            if any(map(f, values)):
+                mask |= 1 << j
+        return mask
+
+    def _record(self, r: dict, mask: int) -> None:
+        offset = self.size
+        self.size += 1
+        if mask:
+            self.total += 1
+            if self.cache is not None:
+                self.cache.offer(offset, r)
+            j, m = 0, mask
+            while m:
+                if m & 1:
+                    self.counts[j] += 1
+                    self.index[j].add(offset)
+                m >>= 1
+                j += 1
+        if self.counter is not None:
+            self.counter.push(mask)
+        if self.timer is not None:
+            self.timer.push(mask)
+
+    def feed(self, r: dict) -> None:
+        if hasattr(self.profiler, 'eval_chunk'):
+            # Tags for the batched engine may be regexes or columnar predicates, which it knows how to apply
+            return self.feed_many([r])
+        self._record(r, self._mask(r))
+
+    def feed_many(self, recs: Iterable[dict]) -> None:
+        """Feeds in a batch of records - via the column-at-a-time engine, if the profiler has one."""
+        eval_chunk = getattr(self.profiler, 'eval_chunk', None)
+        if eval_chunk is None:
+            for r in recs:
+                self.feed(r)
+            return
+        chunk = list(recs)
+        if not chunk:
+            return
+        flagmap = eval_chunk(chunk)
+        hits = [flagmap[tag] for tag in self.labels]
+        for (i, r) in enumerate(chunk):
+            mask = 0
+            for (j, flags) in enumerate(hits):
+                if flags[i]:
+                    mask |= 1 << j
+            self._record(r, mask)
+
+    def snapshot(self, index: bool = False, deep: bool = False) -> TaggedProfilerSummary:
+        """
+        Returns the summary of everything fed in so far.  The index (a copy of each tag's `RunIndex`) and
+        the cache of retained records are only included if :index and :deep (respectively) are set.
+        """
+        _histo = dict(zip(self.labels, self.counts))
+        _index = {k: v.copy() for (k, v) in zip(self.labels, self.index)} if index and self.labels else None
+        _cache = self.cache.cache() if deep and self.cache is not None else None
+        return TaggedProfilerSummary(self.total, _histo, _index, _cache)
+
+    def window(self) -> WindowStats:
+        """Returns the histogram over the last :window records fed in."""
+        if self.counter is None:
+            raise RuntimeError("invalid state - no count window was configured")
+        return self.counter.stats(self.labels)
+
+    def recent(self) -> WindowStats:
+        """Returns the histogram over the records fed in during the last :period seconds (or so)."""
+        if self.timer is None:
+            raise RuntimeError("invalid state - no time window was configured")
+        return self.timer.stats(self.labels)
@@ -0,0 +1,236 @@
+"""
+Provides the compact structures used for indexing and caching in profiler summaries:
+
+  - `RunIndex`, a sorted set of record offsets stored as run-lengths in a pair of `array('Q')` columns -
+    so a tag hitting a contiguous stretch of a million records costs 16 bytes, rather than a list of a
+    million ints.  Supports the usual set operations (so that e.g. the records tagged A but not B are
+    just `index['A'] - index['B']`), and packs down to bytes for storage.
+
+  - `RecordSample`, which retains (some of) the records offered to it - either all of them, the first
+    :limit of them, or a uniform reservoir sample of :limit of them.  The profilers retain at most
+    RETAIN records by default; keeping all of them has to be asked for explicitly, with retain=None.
+"""
+import random
+import struct
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, Optional, Callable, Union, Any
+
+# The default limit on the number of records retained by the profilers in :deep mode
+RETAIN = 1000
+
+_HEADER = struct.Struct('<4sQ')
+_MAGIC = b'RIX2'
+# The original format, with 32-bit offsets (which we can still read)
+_HEADER_V1 = struct.Struct('<4sI')
+_MAGIC_V1 = b'RIDX'
+
+
+class RunIndex:
+    """A sorted set of non-negative integer offsets, stored as (start, length) runs."""
+
+    __slots__ = ('starts', 'lengths', '_count')
+
+    def __init__(self, offsets: Optional[Iterable[int]] = None):
+        self.starts = array('Q')
+        self.lengths = array('Q')
+        self._count = 0
+        if offsets is not None:
+            self.extend(offsets)
+
+    @property
+    def end(self) -> int:
+        """One past the largest offset in the index (or 0, if empty)."""
+        return self.starts[-1] + self.lengths[-1] if self.starts else 0
+
+    def add(self, offset: int) -> None:
+        """Adds an :offset, which must be no smaller than any already present (repeats of the last are ignored)."""
+        end = self.end
+        if offset == end and self.starts:
+            self.lengths[-1] += 1
+        elif offset >= end:
+            self.starts.append(offset)
+            self.lengths.append(1)
+        elif offset == end - 1:
+            return
+        else:
+            raise ValueError(f"invalid offset '{offset}' - offsets must be added in increasing order")
+        self._count += 1
+
+    def extend(self, offsets: Iterable[int]) -> None:
+        for offset in offsets:
+            self.add(offset)
+
+    def add_run(self, start: int, length: int) -> None:
+        """Appends the run [start, start + length), which must begin at or after the current end."""
+        if length <= 0:
+            return
+        end = self.end
+        if start < end:
+            raise ValueError(f"invalid run start '{start}' - runs must be added in increasing order")
+        if start == end and self.starts:
+            self.lengths[-1] += length
+        else:
+            self.starts.append(start)
+            self.lengths.append(length)
+        self._count += length
+
+    def add_flags(self, flags: Union[bytes, bytearray], base: int = 0) -> None:
+        """Appends the offsets (shifted by :base) of the nonzero bytes in :flags, a buffer of 0/1 flags."""
+        n = len(flags)
+        i = flags.find(1)
+        while i != -1:
+            j = flags.find(0, i)
+            if j == -1:
+                j = n
+            self.add_run(base + i, j - i)
+            i = flags.find(1, j) if j < n else -1
+
+    def append(self, other: 'RunIndex', shift: int = 0) -> None:
+        """Appends the runs of :other (shifted along by :shift), which must lie beyond our own."""
+        for (start, length) in zip(other.starts, other.lengths):
+            self.add_run(start + shift, length)
+
+    def runs(self) -> Iterator[tuple[int, int]]:
+        return zip(self.starts, self.lengths)
+
+    def copy(self) -> 'RunIndex':
+        other = RunIndex()
+        other.starts = array('Q', self.starts)
+        other.lengths = array('Q', self.lengths)
+        other._count = self._count
+        return other
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[int]:
+        for (start, length) in zip(self.starts, self.lengths):
+            yield from range(start, start + length)
+
+    def __contains__(self, offset: int) -> bool:
+        i = bisect_right(self.starts, offset) - 1
+        return i >= 0 and offset < self.starts[i] + self.lengths[i]
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, RunIndex):
+            return NotImplemented
+        return self.starts == other.starts and self.lengths == other.lengths
+
+    def __repr__(self) -> str:
+        return f"RunIndex(size={self._count}, runs={len(self.starts)})"
+
+    def tolist(self) -> list[int]:
+        return list(self)
+
+    #
+    # Set operations
+    #
+
+    def __and__(self, other: 'RunIndex') -> 'RunIndex':
+        return _combine(self, other, lambda a, b: a and b)
+
+    def __or__(self, other: 'RunIndex') -> 'RunIndex':
+        return _combine(self, other, lambda a, b: a or b)
+
+    def __sub__(self, other: 'RunIndex') -> 'RunIndex':
+        return _combine(self, other, lambda a, b: a and not b)
+
+    def __xor__(self, other: 'RunIndex') -> 'RunIndex':
+        return _combine(self, other, lambda a, b: a != b)
+
+    #
+    # Serialization
+    #
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(_MAGIC, len(self.starts)) + _le(self.starts).tobytes() + _le(self.lengths).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'RunIndex':
+        magic = data[:4]
+        if magic == _MAGIC:
+            header, typecode = _HEADER, 'Q'
+        elif magic == _MAGIC_V1:
+            header, typecode = _HEADER_V1, 'I'
+        else:
+            raise ValueError("invalid RunIndex data")
+        _, nruns = header.unpack_from(data)
+        starts, lengths = array(typecode), array(typecode)
+        width = starts.itemsize
+        lo = header.size
+        starts.frombytes(data[lo:lo + nruns * width])
+        lengths.frombytes(data[lo + nruns * width:lo + 2 * nruns * width])
+        index = cls()
+        index.starts = array('Q', _le(starts))
+        index.lengths = array('Q', _le(lengths))
+        index._count = sum(index.lengths)
+        return index
+
+    def __getstate__(self) -> bytes:
+        return self.to_bytes()
+
+    def __setstate__(self, state: bytes) -> None:
+        other = RunIndex.from_bytes(state)
+        self.starts, self.lengths, self._count = other.starts, other.lengths, other._count
+
+
+def _le(values: array) -> array:
+    """Swaps the given array to (or from) little-endian byte order, if need be."""
+    if struct.pack('=I', 1) == struct.pack('<I', 1):
+        return values
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped
+
+def _combine(a: RunIndex, b: RunIndex, keep: Callable[[bool, bool], bool]) -> RunIndex:
+    """Sweeps over the run boundaries of :a and :b, keeping the stretches in between for which :keep holds."""
+    points = sorted(set(a.starts) | set(b.starts) | {s + n for (s, n) in a.runs()} | {s + n for (s, n) in b.runs()})
+    out = RunIndex()
+    ia = ib = 0
+    na, nb = len(a.starts), len(b.starts)
+    for (lo, hi) in zip(points, points[1:]):
+        while ia < na and a.starts[ia] + a.lengths[ia] <= lo:
+            ia += 1
+        while ib < nb and b.starts[ib] + b.lengths[ib] <= lo:
+            ib += 1
+        in_a = ia < na and a.starts[ia] <= lo
+        in_b = ib < nb and b.starts[ib] <= lo
+        if keep(in_a, in_b):
+            out.add_run(lo, hi - lo)
+    return out
+
+
+class RecordSample:
+    """
+    Retains records offered to it along with their offsets: all of them if no :limit is given, or else
+    either the first :limit of them or (if :reservoir is set) a uniform random sample of :limit of them.
+    """
+
+    def __init__(self, limit: Optional[int] = None, reservoir: bool = False, seed: Optional[int] = None):
+        if limit is not None and limit < 0:
+            raise ValueError(f"invalid limit '{limit}'")
+        if reservoir and limit is None:
+            raise ValueError("reservoir sampling requires a limit")
+        self.limit = limit
+        self.reservoir = reservoir
+        self.seen = 0
+        self.records: dict[int, Any] = {}
+        self._slots: list[int] = []
+        self._random = random.Random(seed)
+
+    def offer(self, offset: int, r: Any) -> None:
+        self.seen += 1
+        if self.limit is None or len(self.records) < self.limit:
+            self.records[offset] = r
+            self._slots.append(offset)
+        elif self.reservoir:
+            j = self._random.randrange(self.seen)
+            if j < self.limit:
+                del self.records[self._slots[j]]
+                self._slots[j] = offset
+                self.records[offset] = r
+
+    def cache(self) -> dict[int, Any]:
+        """The retained records, keyed on offset (in offset order)."""
+        return {i: self.records[i] for i in sorted(self.records)}
@@ -1,7 +1,11 @@
 """Provides the simple`TaggedProfiler` class useful for dict profiling. """
-from collections import defaultdict
-from typing import Iterator, Callable, Any, Optional
+from functools import partial
+from typing import Iterable, Iterator, Callable, Any, Optional, Union
 from dataclasses import dataclass
+from caixa.trace import traced
+from caixa.util.pool import ordered_map
+from caixa.xdir import XDir
+from .index import RunIndex, RecordSample, RETAIN
 
 
 @dataclass
@@ -16,7 +20,7 @@ class TaggedProfilerRecordStatus:
 class TaggedProfilerSummary:
     total: int
     histo: dict 
-    index: Optional[dict]
+    index: Optional[dict[str, RunIndex]]
     cache: Optional[dict]
 
     def describe(self) -> Iterator[str]:
@@ -29,7 +33,80 @@ class TaggedProfilerSummary:
                 yield f"label = '{label}, size = {len(nums)}:"
                 if self.cache is not None:
                     for n in nums:
-                        yield f"cache[{n}] = {self.cache[n]}"
+                        if n in self.cache:
+                            yield f"cache[{n}] = {self.cache[n]}"
+
+    def save(self, xdir: XDir, subpath: str) -> None:
+        """Saves the summary as a pickle (in which the index takes up just a few bytes per run of offsets)."""
+        xdir.save_pickle(subpath, self)
+
+    @staticmethod
+    def load(xdir: XDir, subpath: str) -> 'TaggedProfilerSummary':
+        summary = xdir.load_pickle(subpath)
+        if not isinstance(summary, TaggedProfilerSummary):
+            raise ValueError(f"invalid summary at subpath = '{subpath}'")
+        return summary
+
+@dataclass
+class PartialSummary:
+    """
+    The profile of one shard of a record stream - which, unlike a `TaggedProfilerSummary`, also knows
+    the :size of its shard (i.e. how many records it saw), so that it can be merged with the profiles of
+    the shards which follow it.  Merging is associative, with offsets in the later shard shifted along
+    by the size of the earlier one, so shards can be combined in any grouping (but not in any order).
+    """
+    size: int
+    total: int
+    histo: dict
+    index: Optional[dict[str, RunIndex]]
+    cache: Optional[dict]
+
+    @classmethod
+    def empty(cls, labels: Iterable[str], deep: bool = False) -> 'PartialSummary':
+        labels = list(labels)
+        return cls(0, 0, {k: 0 for k in labels}, {k: RunIndex() for k in labels} if labels else None, {} if deep else None)
+
+    def update(self, other: 'PartialSummary') -> None:
+        """Appends the profile of the :other shard to this one, in place."""
+        shift = self.size
+        self.total += other.total
+        for (k, n) in other.histo.items():
+            self.histo[k] = self.histo.get(k, 0) + n
+        if other.index is not None:
+            if self.index is None:
+                self.index = {}
+            for (k, offsets) in other.index.items():
+                self.index.setdefault(k, RunIndex()).append(offsets, shift)
+        if other.cache is not None:
+            if self.cache is None:
+                self.cache = {}
+            self.cache.update((i + shift, r) for (i, r) in other.cache.items())
+        self.size += other.size
+
+    def merge(self, other: 'PartialSummary') -> 'PartialSummary':
+        """Returns the profile of this shard followed by the :other."""
+        merged = PartialSummary(0, 0, {}, None, None)
+        merged.update(self)
+        merged.update(other)
+        return merged
+
+    def summary(self) -> TaggedProfilerSummary:
+        index = None if self.index is None else {k: v.copy() for (k, v) in self.index.items()}
+        cache = None if self.cache is None else dict(self.cache)
+        return TaggedProfilerSummary(self.total, dict(self.histo), index, cache)
+
+
+class _Counted:
+    """Wraps an iterable of records, counting them (in :size) as they go by."""
+
+    def __init__(self, recs: Iterable[dict]):
+        self.recs = recs
+        self.size = 0
+
+    def __iter__(self) -> Iterator[dict]:
+        for r in self.recs:
+            self.size += 1
+            yield r
 
 
 class TaggedProfiler:
@@ -49,24 +126,84 @@ class TaggedProfiler:
             for (tag, k, v) in self.eval_dict(r):
                 yield TaggedProfilerRecordStatus(i, tag, k, v, r if deep else None)
 
-    def profile(self, recs: Iterator[dict], index: bool = False, deep: bool = False) -> TaggedProfilerSummary:
+    @traced('profile.TaggedProfiler.profile')
+    def profile(
+            self,
+            recs: Iterator[dict],
+            index: bool = False,
+            deep: bool = False,
+            retain: Optional[int] = RETAIN,
+            reservoir: bool = False) -> TaggedProfilerSummary:
         """Provides the most useful summary counts you'll likely want from the incoming record sequence.
-        Optional :index and :deep flags allow us to return special indexing and cachinc structs which we'll describe later."""
+        Optional :index and :deep flags allow us to return special indexing and cachinc structs which we'll describe later.
+
+        The index maps each tag onto a `RunIndex` of the offsets of the records it hit.  With :deep set, at most
+        :retain of the records which got any hits are kept in the cache (the first ones, or a uniform sample of
+        them if :reservoir is set).  Keeping all of them needs an explicit retain=None."""
         # We use underscores for all "recording" structures.
         # Non-nunderscore names for input variables and flags.
         labels = list(self.tagmap.keys())
-        temp_cache: dict[int, Any] = {}
-        temp_index: dict[str, Any] = {k: defaultdict(int) for k in labels}
+        temp_index: dict[str, RunIndex] = {k: RunIndex() for k in labels}
+        temp_cache = RecordSample(retain, reservoir) if deep else None
+        _total = 0
+        last = -1
         for status in self.evaluate(recs, deep): 
-            temp_cache[status.offset] = status.r if deep else 1
-            temp_index[status.tag][status.offset] += 1
-        _total = len(temp_cache)
+            temp_index[status.tag].add(status.offset)
+            if status.offset != last:
+                last = status.offset
+                _total += 1
+                if deep:
+                    temp_cache.offer(status.offset, status.r)
         _histo: dict[str, int] = {k: len(v) for (k, v) in temp_index.items()}
-        _index: Optional[dict[str, list]] = None
+        _index: Optional[dict[str, RunIndex]] = None
         _cache: Optional[dict[int, Any]] = None
         if temp_index:
-            _index = {k: list(v.keys()) for (k, v) in temp_index.items()}
+            _index = temp_index
         if deep: 
-            _cache = temp_cache
+            _cache = temp_cache.cache()
         return TaggedProfilerSummary(_total, _histo, _index, _cache)
 
+    def profile_partial(
+            self,
+            recs: Iterable[dict],
+            deep: bool = False,
+            retain: Optional[int] = RETAIN,
+            reservoir: bool = False) -> PartialSummary:
+        """Profiles the given shard of records, returning a `PartialSummary` that can be merged with others."""
+        # The summary's total only counts records which got hits, so the shard size is counted separately
+        counted = _Counted(recs)
+        summary = self.profile(counted, deep=deep, retain=retain, reservoir=reservoir)
+        return PartialSummary(counted.size, summary.total, summary.histo, summary.index, summary.cache)
+
+    def profile_parallel(
+            self,
+            shards: Iterable[Union[Iterable[dict], Callable]],
+            workers: Optional[int] = None,
+            deep: bool = False,
+            executor: str = 'process',
+            retain: Optional[int] = RETAIN) -> TaggedProfilerSummary:
+        """
+        Profiles a stream split into :shards across a pool of :workers, giving the same summary as `profile`
+        would for the shards chained together (in order).  Each shard is either a sequence of records or
+        a zero-argument callable returning one - the latter letting shards be loaded in the workers
+        themselves, e.g. `functools.partial(xdir.load_block, 'recs', i)`.
+
+        In 'process' mode (the default) the profiler (and hence its tag predicates) and each of the shards
+        need to be picklable - so predicates have to be module-level functions rather than lambdas.
+        Note that a :retain limit on records kept in :deep mode applies to each shard separately.
+        """
+        merged = PartialSummary.empty(self.tagmap.keys(), deep)
+        function = partial(_profile_shard, self, deep=deep, retain=retain)
+        for part in ordered_map(function, shards, workers, executor=executor):
+            merged.update(part)
+        return merged.summary()
+
+
+def _profile_shard(
+        profiler: TaggedProfiler,
+        shard: Union[Iterable[dict], Callable],
+        deep: bool = False,
+        retain: Optional[int] = RETAIN) -> PartialSummary:
+    recs = shard() if callable(shard) else shard
+    return profiler.profile_partial(recs, deep, retain)
+
@@ -5,3 +5,5 @@ from .util import has_upper
 from .util import has_lower
 from .util import is_integer_like
 from .util import has_non 
+from .batch import basic_shape_many, is_blank_many, is_empty_many, is_integer_like_many
+from .occurrence import OccurrenceIndex, LineIndex
@@ -0,0 +1,119 @@
+import operator
+from itertools import repeat
+from typing import Iterable, Any
+from .util import PAT, SHAPEBOOK, delim_pattern, basic_shape
+
+"""
+Batch versions of the string predicates in `caixa.text.util`, for profiling whole columns of values at a
+time.  Each `*_many` function takes a sequence of strings (or a 1-d NumPy array of them) and returns a
+NumPy array of booleans (or, in the case of `basic_shape_many`, of integer shape codes) - or a plain list,
+if NumPy isn't installed.  Results always agree with those of the corresponding single-string function.
+
+Per-value work is pushed down to C wherever possible: regexes are compiled once and mapped directly over
+the column (so there's no Python function call per value), and where the input is a NumPy string array,
+the `numpy.char` operations are used for those predicates which they can express exactly.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The shapes returned by `basic_shape` (None being for non-string values), indexed by shape code.
+SHAPES = (None, 'empty', 'blank', 'malformed', 'multiword', 'dashy', 'plain')
+SHAPE_CODES = {name: code for (code, name) in enumerate(SHAPES)}
+
+# Maps names of patterns in the SHAPEBOOK (as returned by `first`) onto shape codes
+_FIRSTCODES = {
+    None: SHAPE_CODES['plain'], 'blank': SHAPE_CODES['blank'], 'ltws': SHAPE_CODES['malformed'],
+    'multiword': SHAPE_CODES['multiword'], 'dashy': SHAPE_CODES['dashy'], 'dashes': SHAPE_CODES['malformed'],
+}
+
+
+def _is_strarray(strings: Any) -> bool:
+    return numpy is not None and isinstance(strings, numpy.ndarray) and strings.dtype.kind == 'U'
+
+def _values(strings: Iterable[Any]) -> list:
+    if numpy is not None and isinstance(strings, numpy.ndarray):
+        return strings.tolist()
+    return strings if isinstance(strings, list) else list(strings)
+
+def _assert_strings(values: list) -> None:
+    if not all(map(isinstance, values, repeat(str))):
+        raise TypeError("invalid input - not a string")
+
+def _booleans(flags: Iterable[bool], n: int) -> Any:
+    if numpy is not None:
+        return numpy.fromiter(flags, dtype=bool, count=n)
+    return list(flags)
+
+def _matches(pattern: Any, strings: Iterable[str]) -> Any:
+    values = _values(strings)
+    return _booleans(map(bool, map(pattern.match, values)), len(values))
+
+
+def is_blank_many(strings: Iterable[str]) -> Any:
+    if _is_strarray(strings):
+        return numpy.char.isspace(strings)
+    return _matches(PAT['is-blank'], strings)
+
+def is_empty_many(strings: Iterable[str]) -> Any:
+    if _is_strarray(strings):
+        return numpy.char.str_len(strings) == 0
+    values = _values(strings)
+    _assert_strings(values)
+    return _booleans(map(operator.not_, values), len(values))
+
+def is_alpha_many(strings: Iterable[str]) -> Any:
+    if _is_strarray(strings):
+        return numpy.char.isalpha(strings)
+    values = _values(strings)
+    _assert_strings(values)
+    return _booleans(map(str.isalpha, values), len(values))
+
+def is_integer_like_many(strings: Iterable[str]) -> Any:
+    return _matches(PAT['is-integer-like'], strings)
+
+def is_alphanumeric_many(strings: Iterable[str]) -> Any:
+    return _matches(PAT['is-alphanumeric'], strings)
+
+def is_delim_many(strings: Iterable[str], separator: str) -> Any:
+    return _matches(delim_pattern(separator), strings)
+
+def has_ltws_many(strings: Iterable[str]) -> Any:
+    return _matches(SHAPEBOOK['ltws'], strings)
+
+def has_upper_many(strings: Iterable[str]) -> Any:
+    if _is_strarray(strings):
+        return (numpy.char.str_len(strings) > 0) & ~numpy.char.islower(strings)
+    values = _values(strings)
+    _assert_strings(values)
+    return _booleans((s != '' and not s.islower() for s in values), len(values))
+
+def has_lower_many(strings: Iterable[str]) -> Any:
+    if _is_strarray(strings):
+        return (numpy.char.str_len(strings) > 0) & ~numpy.char.isupper(strings)
+    values = _values(strings)
+    _assert_strings(values)
+    return _booleans((s != '' and not s.isupper() for s in values), len(values))
+
+def basic_shape_many(strings: Iterable[Any]) -> Any:
+    """
+    Returns the code (an index into SHAPES) of the `basic_shape` of each of the given values, as an array
+    of unsigned bytes.  Unlike the other functions here (but like `basic_shape`) non-string values are
+    allowed, and get the code for None.
+    """
+    values = _values(strings)
+    if all(map(isinstance, values, repeat(str))):
+        firsts = SHAPEBOOK.first_many(values)
+        empty = SHAPE_CODES['empty']
+        codes = [_FIRSTCODES[name] if s else empty for (s, name) in zip(values, firsts)]
+    else:
+        codes = [SHAPE_CODES[basic_shape(s)] for s in values]
+    if numpy is not None:
+        return numpy.array(codes, dtype=numpy.uint8)
+    return codes
+
+def shape_names(codes: Iterable[int]) -> list:
+    """Maps the codes returned by `basic_shape_many` back onto shape names."""
+    return [SHAPES[code] for code in codes]
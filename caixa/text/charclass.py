@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+from typing import Callable, Optional
+
+"""
+Compiles per-character predicates (`str.isalpha`, `caixa.text.util.is_blank` and the like) into regex
+character classes, so that questions like "does this string contain any non-alpha characters?" can be
+answered with a single `search` - at C speed - rather than a Python-level call per character.
+
+The trick is to evaluate the predicate once for each of the 256 Latin-1 code points, and build a class
+matching the ones which fail it, plus everything beyond Latin-1:
+
+    [\\x00-\\x40\\x5b-\\x60 ... \\u0100-\\U0010ffff]
+
+A search then stops at the first character which either definitely fails the predicate, or which we
+have to check by hand.  So strings in Latin-1 (by far the most common case) are dealt with in one call,
+and other strings fall back to calling the predicate only on their non-Latin-1 characters.
+
+This is only valid for predicates which look at nothing but the single character they're given, so it's
+limited to those which have been registered (via `register_charclass`) as being of that kind.
+"""
+
+_REGISTRY: set = {
+    str.isalpha, str.isalnum, str.isdecimal, str.isdigit, str.isnumeric, str.isspace,
+    str.isupper, str.islower, str.isprintable, str.isascii, str.isidentifier,
+}
+
+
+def register_charclass(*functions: Callable) -> None:
+    """Declares the given :functions to be pure per-character predicates, eligible for compilation."""
+    _REGISTRY.update(functions)
+
+def is_charclass(function: Callable) -> bool:
+    try:
+        return function in _REGISTRY
+    except TypeError:
+        # Unhashable callables can't be registered
+        return False
+
+
+def _escape(code: int) -> str:
+    return f"\\x{code:02x}"
+
+@lru_cache(maxsize=None)
+def _compile(function: Callable) -> re.Pattern:
+    failing = [code for code in range(256) if not function(chr(code))]
+    terms = []
+    i = 0
+    while i < len(failing):
+        j = i
+        while j + 1 < len(failing) and failing[j + 1] == failing[j] + 1:
+            j += 1
+        terms.append(_escape(failing[i]) if i == j else f"{_escape(failing[i])}-{_escape(failing[j])}")
+        i = j + 1
+    terms.append("\\u0100-\\U0010ffff")
+    return re.compile(f"[{''.join(terms)}]")
+
+def charclass_pattern(function: Callable) -> Optional[re.Pattern]:
+    """
+    Returns the (cached) pattern matching every Latin-1 character which fails the given :function, and
+    every character beyond Latin-1 - or None, if the :function hasn't been registered as a per-character
+    predicate.
+    """
+    return _compile(function) if is_charclass(function) else None
+
+
+def compile_has_non(function: Callable) -> Optional[Callable[[str], bool]]:
+    """
+    Returns a compiled equivalent of `has_non(function)`, i.e. a function which returns True if any
+    character in its input fails :function - or None if :function can't be compiled.
+    """
+    pattern = charclass_pattern(function)
+    if pattern is None:
+        return None
+    search = pattern.search
+
+    def has_non(string: str) -> bool:
+        pos = 0
+        while True:
+            m = search(string, pos)
+            if m is None:
+                return False
+            c = m.group()
+            if c <= '\xff' or not function(c):
+                return True
+            pos = m.end()
+    return has_non
@@ -0,0 +1,121 @@
+import re
+from array import array
+from bisect import bisect_right
+from typing import Optional, Union, Any
+
+"""
+Provides `OccurrenceIndex` and `LineIndex`, which record the offsets of every (non-overlapping) occurrence
+of a substring - or of every line separator - in a text, so that finding the N-th occurrence or the span
+of the N-th line takes constant time, rather than a scan from the start of the text (as with the functions
+`find_occurrence` and `find_line_occurrence`).
+
+The text can be a str, or anything bytes-like which the `re` module can search - in particular an mmap'd
+file, which then gets indexed without ever being read into memory as a whole.  The index is built in one
+pass, with offsets kept in an `array`, and can be extended as the text grows (e.g. for a log file still
+being appended to) by calling `update` again - in which case only the new part of the text gets scanned.
+
+    index = LineIndex.build(text)
+    start, end = index.span(1000)
+    line = index.line(text, 1000)
+"""
+
+Text = Union[str, bytes, bytearray, memoryview, Any]
+
+
+class OccurrenceIndex:
+
+    def __init__(self, sub: Union[str, bytes]):
+        if len(sub) == 0:
+            raise ValueError("invalid usage - substring must be non-empty")
+        self.sub = sub
+        self.offsets = array('q')
+        self.length = 0
+        self._regex = re.compile(re.escape(sub))
+        self._scanpos = 0
+
+    @classmethod
+    def build(cls, text: Text, sub: Union[str, bytes]) -> 'OccurrenceIndex':
+        index = cls(sub)
+        index.update(text)
+        return index
+
+    def update(self, text: Text, end: Optional[int] = None) -> int:
+        """
+        Indexes the part of :text (up to :end, if given) beyond what's been indexed already - which means the
+        whole of it, the first time around.  The text is assumed to have grown only by being appended to.
+        Returns the number of new occurrences found.
+        """
+        end = len(text) if end is None else end
+        if end < self.length:
+            raise ValueError(f"invalid end '{end}' - text has already been indexed up to offset {self.length}")
+        before = len(self.offsets)
+        self.offsets.extend(map(re.Match.start, self._regex.finditer(text, self._scanpos, end)))
+        self.length = end
+        # An occurrence straddling the end may yet be completed; but it can't overlap one we've found already
+        lastend = self.offsets[-1] + len(self.sub) if self.offsets else 0
+        self._scanpos = max(lastend, end - len(self.sub) + 1)
+        return len(self.offsets) - before
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def find(self, position: int) -> int:
+        """Returns the offset of the :position-th occurrence (counting from 0), or -1 if there isn't one."""
+        if position < 0:
+            raise ValueError("invalid usage - position must be >= 0")
+        return self.offsets[position] if position < len(self.offsets) else -1
+
+    def rank(self, offset: int) -> int:
+        """Returns the number of occurrences starting before the given :offset."""
+        return bisect_right(self.offsets, offset - 1)
+
+
+class LineIndex(OccurrenceIndex):
+    """
+    An index of the lines of a text, as delimited by a :separator (a newline, by default - in which case
+    we use either "\\n" or b"\\n", depending on the type of text first indexed).  As with `str.split`,
+    a text with N separators has N + 1 lines, the last of which may be empty (or still being written).
+    """
+
+    def __init__(self, separator: Optional[Union[str, bytes]] = None):
+        self._deferred = separator is None
+        super().__init__("\n" if separator is None else separator)
+
+    @classmethod
+    def build(cls, text: Text, separator: Optional[Union[str, bytes]] = None) -> 'LineIndex':
+        index = cls(separator)
+        index.update(text)
+        return index
+
+    def update(self, text: Text, end: Optional[int] = None) -> int:
+        if self._deferred:
+            if not isinstance(text, str):
+                self.sub = b"\n"
+                self._regex = re.compile(b"\n")
+            self._deferred = False
+        return super().update(text, end)
+
+    @property
+    def count(self) -> int:
+        """The number of lines (counting the one after the last separator)."""
+        return len(self.offsets) + 1
+
+    def span(self, n: int) -> tuple[int, int]:
+        """Returns the (start, end) offsets of the :n-th line (counting from 0), not including its separator."""
+        offsets = self.offsets
+        if not 0 <= n <= len(offsets):
+            raise IndexError(f"invalid line number '{n}'")
+        start = offsets[n - 1] + len(self.sub) if n > 0 else 0
+        end = offsets[n] if n < len(offsets) else self.length
+        return (start, end)
+
+    def line(self, text: Text, n: int) -> Any:
+        """Returns the :n-th line of the given :text (which should be the one indexed)."""
+        start, end = self.span(n)
+        return text[start:end]
+
+    def line_of(self, offset: int) -> int:
+        """Returns the number of the line containing the given :offset."""
+        if not 0 <= offset <= self.length:
+            raise IndexError(f"invalid offset '{offset}'")
+        return bisect_right(self.offsets, offset - 1)
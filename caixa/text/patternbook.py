@@ -1,11 +1,42 @@
 import re
-from typing import Optional
+from typing import Iterable, Optional
+
+"""
+Provides `PatternBook`, a named collection of compiled regexes.
+
+Besides matching against any one pattern by name, a pattern book can `classify` a string against all of
+its patterns at once.  For this the patterns are combined into a single regex, in which each pattern
+appears as an optional lookahead wrapped in a named group:
+
+    (?:(?=(?P<_0>pattern0)))?(?:(?=(?P<_1>pattern1)))? ...
+
+so that one call to `match` tries every pattern at the start of the string, and the groups which took
+part in the match tell us which ones matched.  Similarly `first` finds the first pattern (in the order
+of the book) which matches, via a single alternation:
+
+    (?P<_0>pattern0)|(?P<_1>pattern1)| ...
+
+which is what you want when the patterns describe mutually exclusive categories in order of precedence.
+
+Patterns with different flags go into separate combined regexes; and those which can't be safely embedded
+in a larger regex (because they have named groups or backreferences, which would clash or be renumbered)
+are simply tried one at a time.
+"""
+
+# Constructs which refer to groups by name or number, and hence can't be embedded as-is.
+_GROUPREF = re.compile(r'\\[1-9]|\(\?P[=<]|\(\?\(')
+
+
+def _embeddable(pattern: re.Pattern) -> bool:
+    return isinstance(pattern.pattern, str) and not pattern.groupindex and not _GROUPREF.search(pattern.pattern)
 
 
 class PatternBook: 
 
     def __init__(self, lookup: dict[str, re.Pattern]):
         self.lookup = lookup
+        self._plan: Optional[list[tuple[Optional[re.Pattern], list[str], list[int]]]] = None
+        self._alternation: Optional[re.Pattern] = None
 
     # def match(self, name: str, string: str, pos: int = None, endpos: int = None) -> re.Match:
     def match(self, name: str, string: str) -> Optional[re.Match]:
@@ -17,6 +48,84 @@ class PatternBook:
     def is_match(self, name: str, string: str) -> bool: 
         return bool(self.match(name, string))
 
+    #
+    # Classification
+    #
+
+    def compile(self) -> None:
+        """
+        Builds the combined regexes used by `classify`.  This happens automatically on first use, but
+        needs to be called again if the underlying lookup dict is modified.
+        """
+        byflags: dict[int, list[str]] = {}
+        single: list[str] = []
+        for (name, pattern) in self.lookup.items():
+            if _embeddable(pattern):
+                byflags.setdefault(pattern.flags, []).append(name)
+            else:
+                single.append(name)
+        plan: list[tuple[Optional[re.Pattern], list[str], list[int]]] = []
+        for (flags, names) in byflags.items():
+            terms = (f"(?:(?=(?P<_{i}>{self.lookup[name].pattern})))?" for (i, name) in enumerate(names))
+            regex = re.compile("".join(terms), flags)
+            # Group numbers are 1-based, and the patterns may have (unnamed) groups of their own
+            slots = [regex.groupindex[f"_{i}"] - 1 for i in range(len(names))]
+            plan.append((regex, names, slots))
+        for name in single:
+            plan.append((None, [name], []))
+        self._plan = plan
+        self._rank = {name: i for (i, name) in enumerate(self.lookup)}
+        self._alternation = None
+        if not single and len(byflags) == 1:
+            names = list(self.lookup)
+            terms = (f"(?P<_{i}>{self.lookup[name].pattern})" for (i, name) in enumerate(names))
+            self._alternation = re.compile("|".join(terms), next(iter(byflags)))
+            self._altnames = {f"_{i}": name for (i, name) in enumerate(names)}
+
+    def classify(self, string: str) -> list[str]:
+        """Returns the names of all the patterns which match the given :string (in book order)."""
+        if self._plan is None:
+            self.compile()
+        found = []
+        for (regex, names, slots) in self._plan:
+            if regex is None:
+                if self.lookup[names[0]].match(string):
+                    found.append(names[0])
+            else:
+                groups = regex.match(string).groups()
+                found.extend(name for (name, j) in zip(names, slots) if groups[j] is not None)
+        if len(self._plan) > 1:
+            found.sort(key=self._rank.__getitem__)
+        return found
+
+    def first(self, string: str) -> Optional[str]:
+        """Returns the name of the first pattern (in book order) which matches the given :string, if any."""
+        if self._plan is None:
+            self.compile()
+        if self._alternation is not None:
+            m = self._alternation.match(string)
+            # The outermost group is the last to close, so `lastgroup` is the one we wrapped the pattern in
+            return self._altnames[m.lastgroup] if m else None
+        for (name, pattern) in self.lookup.items():
+            if pattern.match(string):
+                return name
+        return None
+
+    def first_many(self, strings: Iterable[str]) -> list[Optional[str]]:
+        """Finds the `first` matching pattern for each of the given :strings in turn."""
+        if self._plan is None:
+            self.compile()
+        if self._alternation is not None:
+            altnames = self._altnames
+            return [altnames[m.lastgroup] if m else None for m in map(self._alternation.match, strings)]
+        first = self.first
+        return [first(s) for s in strings]
+
+    def classify_many(self, strings: Iterable[str]) -> list[list[str]]:
+        """Classifies each of the given :strings (e.g. a column of values) in turn."""
+        classify = self.classify
+        return [classify(s) for s in strings]
+
     #
     # The following methods provide a partial facade pattern to the underlying dict struct.
     #
@@ -30,4 +139,3 @@ class PatternBook:
     def __contains__(self, name: str) -> int:
         return name in self.lookup 
 
-
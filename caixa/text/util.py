@@ -1,6 +1,8 @@
 import re
+from functools import lru_cache
 from typing import Iterator, Callable, Optional
 from .patternbook import PatternBook
+from .charclass import register_charclass, compile_has_non
 
 """
 Helper functions for string validation + profiling.
@@ -20,13 +22,32 @@ PAT['is-integer-like'] = re.compile('^[+-]{0,1}\d+$')
 PAT['is-alphanumeric'] = re.compile('^[A-Za-z0-9]+$')
 PATBOOK = PatternBook(PAT)
 
+# The shapes recognized by `basic_shape` (other than 'empty' and 'plain'), in order of precedence - so that
+# they can all be tried in a single pass.  Both 'ltws' (leading or trailing whitespace) and 'dashes' (dashes
+# other than single inner ones) come out as 'malformed'.
+SHAPEBOOK = PatternBook({
+    'blank': PAT['is-blank'],
+    'ltws': re.compile(r'^(\s|.*\s+$)'),
+    'multiword': re.compile('^[^ ]* '),
+    'dashy': re.compile(r'^([^\s\-]+\-)+([^\s\-]+)$'),
+    'dashes': re.compile('^[^-]*-'),
+})
+SHAPENAMES = {'ltws': 'malformed', 'dashes': 'malformed'}
+
 def assert_valid_separator(separator: str) -> None:
     if separator is None:
         raise ValueError("need a separator string")
     if len(separator) != 1:
         raise ValueError("invalid separator string '{string}'")
 
-# TODO: memoize patterns; allow for varations of form based on options
+@lru_cache(maxsize=None)
+def delim_pattern(separator: str) -> re.Pattern:
+    """Returns the (cached) pattern used by `is_delim` for the given :separator."""
+    assert_valid_separator(separator)
+    qsep = f"\\{separator}" if separator in ("\\", '-') else separator
+    return re.compile(f"^([^\\s{qsep}]+{qsep})+([^\\s{qsep}]+)$")
+
+# TODO: allow for varations of form based on options
 def is_delim(string: str, separator: str) -> bool:
     """
     Returns True if the given :string is (naively) delimited by the given separator character.
@@ -38,10 +59,7 @@ def is_delim(string: str, separator: str) -> bool:
     For example, if our sep string is the hyphen it will return True for the string "foo-bar" 
     but False for "foobar", "foo-", "-bar" as well as "foo--bar".  
     """
-    assert_valid_separator(separator)
-    qsep = f"\\{separator}" if separator in ("\\", '-') else separator
-    pat = re.compile(f"^([^\s{qsep}]+{qsep})+([^\s{qsep}]+)$")
-    return bool(pat.match(string))
+    return bool(delim_pattern(separator).match(string))
 
 def is_blank(s: str) -> bool:
     """
@@ -53,7 +71,7 @@ def has_ltws(s: str) -> bool:
     """
     Returns True if the string consists leading or trailing whitespace characters, False otherwise. 
     """
-    return PATBOOK.is_match('has-whitespace-left', s) or PATBOOK.is_match('has-whitespace-right', s)
+    return SHAPEBOOK.is_match('ltws', s)
 
 def is_empty(s: str) -> bool:
     """
@@ -72,7 +90,9 @@ def is_alpha(s: str) -> bool:
     Returns True if the string consists of one or more alphabetical characters, True otherwise. 
     In other words, equivalent to `str.isalpha()`.
     """
-    return PATBOOK.is_match('is-alpha', s)
+    if isinstance(s, str):
+        return s.isalpha()
+    raise TypeError("invalid input - not a string")
 
 def is_integer_like(s: str) -> bool:
     return PATBOOK.is_match('is-integer-like', s)
@@ -96,7 +116,7 @@ def has_lower(s: str) -> bool:
         return len(s) > 0 and not s.isupper()
     raise TypeError("invalid input - not a string")
 
-def has_non(function: Callable) -> Callable:
+def has_non(function: Callable, compiled: bool = True) -> Callable:
     """
     A convenient operator that takes a function (presumed to have the same signature as all of
     the other functions in this section), and returns the logical "converse" - that is, a function 
@@ -106,15 +126,29 @@ def has_non(function: Callable) -> Callable:
     of Greek cheracters - then `has_non(is_greek)` would return a callable which returns True if the
     given string contains any non-Greek characters.
 
-    Note the function thus produced may be quite inefficient.  But in a pinch it can be useful to
+    Where :function is a known per-character predicate (a `str.is*` method, or one of the functions in
+    this module) the check gets compiled down to a single regex search (see `caixa.text.charclass`), so
+    it runs at C speed.  Otherwise (or if :compiled is False) the function thus produced may be quite
+    inefficient, as it calls :function on each character in turn.  But in a pinch it can be useful to
     whip out "converse" forms of validating functions in this way.
     """
+    fast = compile_has_non(function) if compiled else None
+    if fast is not None:
+        def compiled_wrapped(string: str) -> bool:
+            if isinstance(string, str):
+                return fast(string)
+            raise ValueError("invalid input - not a string")
+        return compiled_wrapped
+
     def wrapped(string: str) -> bool:
         if isinstance(string, str):
             return any(not function(_) for _ in string) 
         raise ValueError("invalid input - not a string")
     return wrapped
 
+# All of the above look at nothing but the string they're given, so they're fine to use on single characters
+register_charclass(is_blank, is_empty, is_alpha, is_integer_like, is_alphanumeric, has_upper, has_lower)
+
 def basic_shape(string: str) -> str:
     """
     Looks at a string and tries to determine it's basic "shape" for downstream processing.
@@ -124,17 +158,10 @@ def basic_shape(string: str) -> str:
         return None
     if len(string) == 0:
         return 'empty'
-    if is_blank(string):
-        return 'blank'
-    if has_ltws(string):
-        return 'malformed'
-    if ' ' in string:
-        return 'multiword'
-    if is_delim(string, '-'):
-        return 'dashy'
-    if '-' in string:  # contains '--' or leading/trailing '-'
-        return 'malformed'
-    return 'plain'
+    shape = SHAPEBOOK.first(string)
+    if shape is None:
+        return 'plain'
+    return SHAPENAMES.get(shape, shape)
 
 _wordpat = re.compile('\S+')
 def extract_words(string: str) -> Iterator[str]: 
@@ -144,6 +171,9 @@ def find_occurrence(string: str, sub: str, position: int, start: Optional[int] =
     """
     Similar to `str.find`, but finds the offset of the `position-th` occurrence of `sub` in `string`. 
     If it can't be found, returns -1.
+
+    Note that each call scans the string from the start; for repeated lookups in the same text, build an
+    `caixa.text.OccurrenceIndex` (or a `LineIndex`) instead.
     """
     if len(sub) == 0:
         return 0
@@ -0,0 +1 @@
+from .core import Tracer, Span, FlatEntry, TRACER, enable, disable, span, traced
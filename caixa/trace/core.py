@@ -0,0 +1,227 @@
+"""
+Provides a lightweight span-based tracer, for finding out where the time goes inside caixa-based pipelines.
+
+A span is a named, timed section of code - opened either as a context manager or via a decorator:
+
+    from caixa.trace import TRACER, span, traced
+
+    @traced('load')
+    def load(path): ...
+
+    with span('batch', size=len(recs)):
+        load(path)
+
+Spans opened while another span is active (in the same thread or asyncio task - the current span is
+tracked with a `contextvars.ContextVar`) are recorded as its children, so that each span knows both
+its total and its "self" time.  Finished spans can be exported as a Chrome trace-event file (viewable
+in chrome://tracing or Perfetto), or summarized as a flat profile.
+
+Tracing is off by default, in which case opening a span costs a single attribute check.  When on,
+a :sample rate below 1 means only that fraction of top-level spans (together with everything nested
+under them) get recorded.  Several caixa components (XDir I/O, `TaggedProfiler.profile`, and cache
+misses in `memoize`) emit spans of their own whenever tracing is enabled.
+"""
+import os
+import json
+import time
+import random
+import inspect
+import threading
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Iterator, Optional, Any
+
+DEFAULT_MAXSPANS = 1000000
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'parent', 'start', 'end', 'child_ns', 'tid')
+
+    def __init__(self, name: str, attrs: dict, parent: Optional['Span']):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.tid = threading.get_ident()
+        self.child_ns = 0
+        self.start = self.end = 0
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    @property
+    def self_ns(self) -> int:
+        return self.duration - self.child_ns
+
+
+# Marks a context in which the top-level span was not sampled (so neither are its descendants)
+_UNSAMPLED: Any = object()
+
+_current: ContextVar = ContextVar('caixa_trace_span', default=None)
+
+
+class _NullContext:
+    """What `Tracer.span` returns when there's nothing to record."""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+_NULL = _NullContext()
+
+
+class _SpanContext:
+    __slots__ = ('tracer', 'span', 'token')
+
+    def __init__(self, tracer: 'Tracer', span: Optional[Span], token: Any):
+        self.tracer = tracer
+        self.span = span
+        self.token = token
+
+    def __enter__(self) -> Optional[Span]:
+        if self.span is not None:
+            self.span.start = time.perf_counter_ns()
+        return self.span
+
+    def __exit__(self, *exc) -> None:
+        span = self.span
+        if span is not None:
+            span.end = time.perf_counter_ns()
+        _current.reset(self.token)
+        if span is not None:
+            self.tracer._finish(span)
+
+
+@dataclass
+class FlatEntry:
+    name: str
+    count: int
+    total_ns: int
+    self_ns: int
+
+    def describe(self) -> str:
+        return f"{self.name}: count={self.count}, total={self.total_ns / 1e6:.3f} ms, self={self.self_ns / 1e6:.3f} ms"
+
+
+class Tracer:
+
+    def __init__(self, enabled: bool = False, sample: float = 1.0, maxspans: int = DEFAULT_MAXSPANS):
+        self.enabled = enabled
+        self.sample = sample
+        self.spans: deque = deque(maxlen=maxspans)
+        self.origin = time.perf_counter_ns()
+
+    def enable(self, sample: float = 1.0) -> None:
+        if not 0 < sample <= 1:
+            raise ValueError(f"invalid sample rate '{sample}'")
+        self.sample = sample
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def clear(self) -> None:
+        self.spans.clear()
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name: str, **attrs) -> Any:
+        """Returns a context manager which records a span with the given :name (and optional :attrs)."""
+        if not self.enabled:
+            return _NULL
+        parent = _current.get()
+        if parent is _UNSAMPLED:
+            return _NULL
+        if parent is None and self.sample < 1 and random.random() >= self.sample:
+            return _SpanContext(self, None, _current.set(_UNSAMPLED))
+        span = Span(name, attrs, parent)
+        return _SpanContext(self, span, _current.set(span))
+
+    def _finish(self, span: Span) -> None:
+        parent = span.parent
+        if parent is not None:
+            parent.child_ns += span.duration
+        self.spans.append(span)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """A decorator which wraps each call to the decorated function in a span."""
+        def decorator(function: Callable) -> Callable:
+            label = name or function.__qualname__
+            if inspect.iscoroutinefunction(function):
+                @wraps(function)
+                async def awrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await function(*args, **kwargs)
+                    with self.span(label):
+                        return await function(*args, **kwargs)
+                return awrapper
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.span(label):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    #
+    # Reporting
+    #
+
+    def flat_profile(self) -> list[FlatEntry]:
+        """Aggregates the recorded spans by name, in decreasing order of self time."""
+        entries: dict[str, FlatEntry] = {}
+        for span in list(self.spans):
+            entry = entries.get(span.name)
+            if entry is None:
+                entry = entries[span.name] = FlatEntry(span.name, 0, 0, 0)
+            entry.count += 1
+            entry.total_ns += span.duration
+            entry.self_ns += span.self_ns
+        return sorted(entries.values(), key=lambda e: -e.self_ns)
+
+    def describe(self) -> Iterator[str]:
+        for entry in self.flat_profile():
+            yield entry.describe()
+
+    def chrome_events(self) -> list[dict]:
+        pid = os.getpid()
+        events = []
+        for span in list(self.spans):
+            event = {
+                'name': span.name, 'cat': 'caixa', 'ph': 'X', 'pid': pid, 'tid': span.tid,
+                'ts': (span.start - self.origin) / 1000, 'dur': span.duration / 1000,
+            }
+            if span.attrs:
+                event['args'] = {k: _jsonable(v) for (k, v) in span.attrs.items()}
+            events.append(event)
+        return events
+
+    def export_chrome(self, path: str) -> None:
+        """Writes the recorded spans to :path in the Chrome trace-event JSON format."""
+        with open(path, "w") as f:
+            json.dump({'traceEvents': self.chrome_events(), 'displayTimeUnit': 'ms'}, f)
+
+
+def _jsonable(value: Any) -> Any:
+    return value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+
+
+# The default tracer, used by the module-level helpers below (and by caixa's own components).
+TRACER = Tracer()
+
+def enable(sample: float = 1.0) -> None:
+    TRACER.enable(sample)
+
+def disable() -> None:
+    TRACER.disable()
+
+def span(name: str, **attrs) -> Any:
+    return TRACER.span(name, **attrs)
+
+def traced(name: Optional[str] = None) -> Callable:
+    return TRACER.traced(name)
@@ -1,4 +1,5 @@
-from typing import Any, Optional
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
 
 def croplist(array: list[Any], depth: int = 3, maxlen: Optional[int] = None) -> str:
     """
@@ -38,3 +39,20 @@ def croplist(array: list[Any], depth: int = 3, maxlen: Optional[int] = None) ->
 # for backward compatibility
 list2cropped = croplist
 
+
+def batched(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """
+    Yields successive lists of :size elements from the given iterable (the last of which may
+    be shorter), consuming it lazily.  For example:
+
+        >>> list(batched(range(5), 2))
+        [[0, 1], [2, 3], [4]]
+    """
+    if size < 1:
+        raise ValueError(f"invalid batch size = {size}")
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -1,17 +1,199 @@
-from zlib import crc32
+import os
+import mmap
+import zlib
+import hashlib
+from dataclasses import dataclass, field
+from functools import partial
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+from .pool import ordered_map
+
+"""
+Helpers for comparing files (and trees of files), without ever holding more than a chunk of any one file
+in memory.
+
+Files of different sizes are reported as different straight away, without reading either of them.
+Otherwise there are two ways of comparing them:
+
+  - 'bytes' mode reads both files chunk by chunk, stopping at the first chunk which differs;
+  - 'hash' mode computes a checksum of each, which is what you want when one side is compared against
+    many others, or the checksums are to be kept for later.
+
+Checksums can be any of 'crc32', 'adler32' (both from zlib, returning ints) or any algorithm supported
+by `hashlib`, e.g. 'blake2b' or 'sha256' (returning hex digests).  Files are streamed through the hash in
+chunks read into a single reusable buffer - or, with :use_mmap, hashed straight out of a memory map.
+Since zlib and hashlib both release the GIL while hashing, `compare_many`, `checksum_many` and
+`compare_trees` get real parallelism out of a thread pool.
+"""
+
+CHUNKSIZE = 1 << 20
+ZLIB_CHECKSUMS = {'crc32': zlib.crc32, 'adler32': zlib.adler32}
+MODES = ('bytes', 'hash')
+
+Checksum = Union[int, str]
+
+
+def assert_valid_algorithm(algorithm: str) -> None:
+    if algorithm not in ZLIB_CHECKSUMS and algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"invalid checksum algorithm '{algorithm}'")
+
+def iter_chunks(filepath: str, chunksize: int = CHUNKSIZE) -> Iterator[memoryview]:
+    """
+    Yields the contents of the file at :filepath in chunks of (up to) :chunksize bytes.  Note that the chunks
+    are views onto a single buffer, which is overwritten by each successive chunk.
+    """
+    buffer = bytearray(chunksize)
+    view = memoryview(buffer)
+    with open(filepath, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                return
+            yield view[:n]
+
+def file_checksum(filepath: str, algorithm: str = 'crc32', chunksize: int = CHUNKSIZE, use_mmap: bool = False) -> Checksum:
+    """Returns the checksum of the file at :filepath, as computed by the given :algorithm."""
+    assert_valid_algorithm(algorithm)
+    if use_mmap and os.path.getsize(filepath) > 0:
+        with open(filepath, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _checksum([mm], algorithm)
+    return _checksum(iter_chunks(filepath, chunksize), algorithm)
+
+def _checksum(chunks: Iterable, algorithm: str) -> Checksum:
+    update = ZLIB_CHECKSUMS.get(algorithm)
+    if update is not None:
+        value = 1 if algorithm == 'adler32' else 0
+        for chunk in chunks:
+            value = update(chunk, value)
+        return value
+    hasher = hashlib.new(algorithm)
+    for chunk in chunks:
+        hasher.update(chunk)
+    return hasher.hexdigest()
 
 def pairwise_crc32(filepath1: str, filepath2: str) -> tuple[int, int]:
     """Given two file paths, we return the CRC32 checksums on each."""
-    with open(filepath1, "rb") as f1, open(filepath2, "rb") as f2:
-        bytes1 = f1.read()
-        bytes2 = f2.read()
-        check1 = crc32(bytes1)
-        check2 = crc32(bytes2)
-        return (check1, check2)
-
-def compare_files_crc32(filepath1: str, filepath2: str) -> bool: 
-    """Returns True if the files under each respective path appear to be identical 
+    return (file_checksum(filepath1, 'crc32'), file_checksum(filepath2, 'crc32'))
+
+def compare_files_crc32(filepath1: str, filepath2: str) -> bool:
+    """Returns True if the files under each respective path appear to be identical
     (in the sense of having equal CRC32 checksums), False otherwise."""
-    (check1, check2) = pairwise_crc32(filepath1, filepath2) 
-    return check1 == check2
+    return compare_files(filepath1, filepath2, mode='hash', algorithm='crc32')
+
+def compare_bytes(filepath1: str, filepath2: str, chunksize: int = CHUNKSIZE) -> bool:
+    """Returns True if the two files have identical contents, reading no further than the first difference."""
+    buffer1, buffer2 = bytearray(chunksize), bytearray(chunksize)
+    with open(filepath1, "rb", buffering=0) as f1, open(filepath2, "rb", buffering=0) as f2:
+        while True:
+            n1, n2 = _readfull(f1, buffer1), _readfull(f2, buffer2)
+            if n1 != n2:
+                return False
+            if n1 < chunksize:
+                return buffer1[:n1] == buffer2[:n2]
+            # Comparing whole bytearrays is a memcmp (whereas comparing memoryviews goes item by item)
+            if buffer1 != buffer2:
+                return False
+
+def _readfull(f: BinaryIO, buffer: bytearray) -> int:
+    """Reads into :buffer until it's full or we hit EOF (since a raw `readinto` may come up short), returning the count."""
+    view = memoryview(buffer)
+    total = 0
+    while total < len(buffer):
+        n = f.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+def compare_files(
+        filepath1: str,
+        filepath2: str,
+        mode: str = 'bytes',
+        algorithm: str = 'crc32',
+        chunksize: int = CHUNKSIZE,
+        shallow: bool = False) -> bool:
+    """
+    Returns True if the two files appear to be identical, according to the given :mode (see the module
+    docstring).  In any mode, files of different sizes are different; and with :shallow set, files with
+    the same size and modification time are taken to be the same (in the manner of `filecmp.cmp`).
+    """
+    if mode not in MODES:
+        raise ValueError(f"invalid mode '{mode}' - must be one of {list(MODES)}")
+    stat1, stat2 = os.stat(filepath1), os.stat(filepath2)
+    if (stat1.st_dev, stat1.st_ino) == (stat2.st_dev, stat2.st_ino):
+        return True
+    if stat1.st_size != stat2.st_size:
+        return False
+    if shallow and stat1.st_mtime_ns == stat2.st_mtime_ns:
+        return True
+    if mode == 'bytes':
+        return compare_bytes(filepath1, filepath2, chunksize)
+    return file_checksum(filepath1, algorithm, chunksize) == file_checksum(filepath2, algorithm, chunksize)
+
+def compare_many(
+        pairs: Iterable[tuple[str, str]],
+        workers: Optional[int] = None,
+        **kwargs) -> Iterator[bool]:
+    """Yields the result of `compare_files` (given the :kwargs) for each of the :pairs, in order, via a thread pool."""
+    function = partial(_compare_pair, **kwargs)
+    yield from ordered_map(function, pairs, workers)
+
+def _compare_pair(pair: tuple[str, str], **kwargs) -> bool:
+    return compare_files(pair[0], pair[1], **kwargs)
+
+def checksum_many(
+        filepaths: Iterable[str],
+        algorithm: str = 'crc32',
+        workers: Optional[int] = None,
+        chunksize: int = CHUNKSIZE,
+        use_mmap: bool = False) -> Iterator[Checksum]:
+    """Yields the checksum of each of the files at the given :filepaths, in order, via a thread pool."""
+    assert_valid_algorithm(algorithm)
+    function = partial(file_checksum, algorithm=algorithm, chunksize=chunksize, use_mmap=use_mmap)
+    yield from ordered_map(function, filepaths, workers)
+
+
+@dataclass
+class TreeDiff:
+    """The result of `compare_trees`, in terms of paths relative to the roots of the two trees."""
+    left_only: list[str] = field(default_factory=list)
+    right_only: list[str] = field(default_factory=list)
+    same: list[str] = field(default_factory=list)
+    different: list[str] = field(default_factory=list)
+
+    @property
+    def identical(self) -> bool:
+        return not (self.left_only or self.right_only or self.different)
+
+
+def walk_files(dirpath: str) -> Iterator[str]:
+    """Yields the paths (relative to :dirpath) of all the files in the tree under :dirpath, in sorted order."""
+    for (root, dirs, files) in os.walk(dirpath):
+        dirs.sort()
+        for name in sorted(files):
+            yield os.path.relpath(os.path.join(root, name), dirpath)
 
+def compare_trees(
+        dirpath1: str,
+        dirpath2: str,
+        algorithm: str = 'blake2b',
+        workers: Optional[int] = None,
+        chunksize: int = CHUNKSIZE) -> TreeDiff:
+    """
+    Compares the files in the trees under :dirpath1 and :dirpath2.  Files present on both sides are
+    compared by size, and those whose sizes agree are then checksummed (both sides) on a thread pool.
+    """
+    left, right = set(walk_files(dirpath1)), set(walk_files(dirpath2))
+    diff = TreeDiff(left_only=sorted(left - right), right_only=sorted(right - left))
+    candidates = []
+    for relpath in sorted(left & right):
+        path1, path2 = os.path.join(dirpath1, relpath), os.path.join(dirpath2, relpath)
+        if os.path.getsize(path1) != os.path.getsize(path2):
+            diff.different.append(relpath)
+        else:
+            candidates.append((relpath, path1, path2))
+    paths = [p for (_, path1, path2) in candidates for p in (path1, path2)]
+    checksums = iter(checksum_many(paths, algorithm, workers, chunksize))
+    for (relpath, _, _) in candidates:
+        (diff.same if next(checksums) == next(checksums) else diff.different).append(relpath)
+    diff.different.sort()
+    return diff
@@ -0,0 +1,54 @@
+"""
+Helpers for running a function over a sequence of inputs on a worker pool, while still consuming
+the results as an ordinary (ordered) stream.
+"""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Executor
+from typing import Callable, Iterable, Iterator, Optional, Any
+
+EXECUTORS: dict[str, type] = {'thread': ThreadPoolExecutor, 'process': ProcessPoolExecutor}
+
+def make_executor(executor: str, workers: Optional[int] = None) -> Executor:
+    if executor not in EXECUTORS:
+        raise ValueError(f"invalid executor '{executor}' - must be one of {list(EXECUTORS)}")
+    return EXECUTORS[executor](max_workers=workers)
+
+def ordered_map(
+        function: Callable, 
+        items: Iterable[Any], 
+        workers: Optional[int] = None, 
+        prefetch: Optional[int] = None, 
+        executor: str = 'thread') -> Iterator[Any]:
+    """
+    Like the builtin `map`, except that calls to :function are run on a pool of :workers threads 
+    or processes (depending on :executor), with at most :prefetch calls in flight at any time.
+    Results are yielded in the order of the incoming :items, regardless of the order in which they
+    complete.  So the consumer sees a plain stream, while the pool keeps a bounded window of work
+    going ahead of it.
+
+    If :workers is not given we use one per CPU, and :prefetch defaults to twice the number of
+    workers.  Note that in 'process' mode both :function and each of the :items need to be picklable.
+
+    If the consumer stops early, any calls which haven't yet started are cancelled.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if prefetch is None:
+        prefetch = 2 * workers
+    if workers < 1:
+        raise ValueError(f"invalid workers count '{workers}'")
+    if prefetch < 1:
+        raise ValueError(f"invalid prefetch count '{prefetch}'")
+    with make_executor(executor, workers) as pool:
+        pending: deque = deque()
+        try:
+            for item in items:
+                pending.append(pool.submit(function, item))
+                if len(pending) >= prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
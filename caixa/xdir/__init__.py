@@ -1 +1,4 @@
 from .core import XDir
+from .segment import BlockSegment
+from .codec import Codec
+from .manifest import Manifest, ManifestDiff
@@ -0,0 +1,157 @@
+"""
+Helpers for writing files atomically, and for coordinating multiple writer processes in one directory.
+
+Everything written through `atomic_path` first goes to a hidden temp file alongside the final path,
+which is (optionally) fsync'd and then renamed into place.  Since the rename is atomic, a reader will
+only ever see either the previous version of the file or the complete new one - never a torn file,
+even if the writer crashes partway through.
+
+Fsync'ing every file is the safe default, but it can dominate the cost of writing many small files.
+A `WriteBatch` amortizes this: files written under a batch are held back as temp files until the batch
+is committed, at which point they are all synced and renamed together, followed by a single fsync of
+the directory.
+
+Finally, `FileLock` provides a simple advisory lock (via `fcntl.flock`) which cooperating processes
+can use to serialize critical sections, such as claiming the next free block position.  Claims are made
+with hidden marker files, and those left behind by producers which died can be swept up (by age) with
+`XDir.sweep_claims`.
+"""
+import os
+import fcntl
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+def fsync_path(path: str, directory: bool = False) -> None:
+    flags = os.O_RDONLY | (os.O_DIRECTORY if directory else 0)
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def temp_path_for(path: str) -> str:
+    """Returns a (hidden, unique) temp path in the same directory as the given :path."""
+    dirname, basename = os.path.split(path)
+    token = os.urandom(4).hex()
+    return os.path.join(dirname, f".{basename}.{os.getpid()}.{token}.tmp")
+
+
+class WriteBatch:
+    """A set of temp files waiting to be synced and renamed into place together."""
+
+    def __init__(self, fsync: bool = True):
+        self.fsync = fsync
+        self._pending: list[tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, temppath: str, path: str) -> None:
+        self._pending.append((temppath, path))
+
+    def commit(self) -> None:
+        """
+        Syncs the pending files and renames them into place.  If this fails partway through, the temp files
+        not yet renamed are removed, so that nothing is leaked (though the batch is then only partly committed).
+        """
+        pending = self._pending
+        done = 0
+        dirnames = set()
+        try:
+            if self.fsync:
+                for temppath, _ in pending:
+                    fsync_path(temppath)
+            for temppath, path in pending:
+                os.replace(temppath, path)
+                done += 1
+                dirnames.add(os.path.dirname(path) or '.')
+        except BaseException:
+            del pending[:done]
+            self.abort()
+            raise
+        self._pending = []
+        if self.fsync:
+            for dirname in dirnames:
+                fsync_path(dirname, directory=True)
+
+    def abort(self) -> None:
+        pending, self._pending = self._pending, []
+        for temppath, _ in pending:
+            _unlink_quietly(temppath)
+
+
+@contextmanager
+def atomic_path(path: str, fsync: bool = True, batch: Optional[WriteBatch] = None) -> Iterator[str]:
+    """
+    A context manager yielding a temp path to be written to in place of the given :path.  If the block
+    exits normally the temp file is renamed over :path (after being fsync'd, if :fsync is set); if it
+    raises, the temp file is removed.  If a :batch is given, the sync and rename are deferred until the
+    batch is committed.
+
+        with atomic_path("/data/foo.json") as temppath:
+            write_something_to(temppath)
+    """
+    temppath = temp_path_for(path)
+    # Create the file up front (respecting the umask) so that writers which expect it to exist will work
+    os.close(os.open(temppath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+    try:
+        yield temppath
+    except BaseException:
+        _unlink_quietly(temppath)
+        raise
+    if batch is not None:
+        batch.add(temppath, path)
+        return
+    if fsync:
+        fsync_path(temppath)
+    os.replace(temppath, path)
+    if fsync:
+        fsync_path(os.path.dirname(path) or '.', directory=True)
+
+def _unlink_quietly(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+class FileLock:
+    """
+    An advisory, exclusive, inter-process lock on the given :path (which is created if need be).
+    Usable as a context manager.  Note that the lock is not reentrant.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if self._fd is not None:
+            raise RuntimeError(f"invalid usage - lock on '{self.path}' already held")
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            raise RuntimeError(f"invalid usage - lock on '{self.path}' not held")
+        fd, self._fd = self._fd, None
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
@@ -0,0 +1,150 @@
+"""
+Provides the class Codec, which describes how a Python object gets turned into bytes (and back again)
+when stored via `XDir.save_pickle`, `XDir.save_block` and friends.
+
+A codec is made up of a serializer:
+
+    pickle  - the standard pickle format (at the default protocol)
+    pickle5 - pickle protocol 5, with large buffers (bytearrays, numpy arrays, etc) written out-of-band
+    marshal - the `marshal` format, which is fast but only handles plain builtin types
+
+optionally followed by a compressor from the standard library (zlib, lzma or bz2), with an optional
+compression level.  In string form these are written as e.g. 'pickle', 'pickle5+zlib' or 'marshal+lzma:6'.
+
+Encoded payloads start with a small header recording the serializer and compressor used, so that
+readers never need to be told what codec was used for a given file or block:
+
+    b'CX' + <serializer id> + <compressor id>
+
+Data without this header is assumed to be a plain pickle (as written by earlier versions), which can
+never be confused with the above since pickles (at protocol 2 and above) always start with b'\\x80'.
+
+In the out-of-band case, the (uncompressed) body is laid out as:
+
+    <nbufs: u32> <mainlen: u64> <buflen: u64> * nbufs <main pickle> <buffer> * nbufs
+
+so that on load the buffers can be handed to `pickle.loads` as slices of the incoming data.  When that
+data is a view onto an mmap (as with `BlockSegment.raw_block`) the buffers are never copied at all.
+"""
+import bz2
+import lzma
+import zlib
+import pickle
+import marshal
+import struct
+from dataclasses import dataclass
+from typing import Optional, Union, Any
+
+MAGIC = b'CX'
+SERIALIZERS = ('pickle', 'pickle5', 'marshal')
+COMPRESSORS: dict[str, Any] = {'zlib': zlib, 'lzma': lzma, 'bz2': bz2}
+_COMPRESSOR_IDS = (None, 'zlib', 'lzma', 'bz2')
+
+
+@dataclass(frozen=True)
+class Codec:
+    serializer: str = 'pickle'
+    compressor: Optional[str] = None
+    level: Optional[int] = None
+
+    def __post_init__(self):
+        if self.serializer not in SERIALIZERS:
+            raise ValueError(f"invalid serializer '{self.serializer}' - must be one of {SERIALIZERS}")
+        if self.compressor is not None and self.compressor not in COMPRESSORS:
+            raise ValueError(f"invalid compressor '{self.compressor}' - must be one of {list(COMPRESSORS)}")
+        if self.level is not None and self.compressor is None:
+            raise ValueError("invalid usage - compression level given without a compressor")
+
+    def __str__(self) -> str:
+        spec = self.serializer
+        if self.compressor is not None:
+            spec += f"+{self.compressor}"
+        if self.level is not None:
+            spec += f":{self.level}"
+        return spec
+
+    @classmethod
+    def parse(cls, spec: Union[str, 'Codec']) -> 'Codec':
+        """Returns a Codec from a spec string like 'pickle5+zlib:9' (or the given Codec itself)."""
+        if isinstance(spec, Codec):
+            return spec
+        if not isinstance(spec, str):
+            raise TypeError(f"invalid codec spec '{spec}' - expected a str or Codec instance")
+        serializer, _, compression = spec.partition('+')
+        compressor, _, level = compression.partition(':')
+        return cls(serializer, compressor or None, int(level) if level else None)
+
+    @property
+    def header(self) -> bytes:
+        sid = SERIALIZERS.index(self.serializer)
+        cid = _COMPRESSOR_IDS.index(self.compressor)
+        return MAGIC + bytes([sid, cid])
+
+    def encode(self, obj: Any) -> bytes:
+        if self.serializer == 'pickle':
+            body = pickle.dumps(obj)
+        elif self.serializer == 'pickle5':
+            body = _dumps_oob(obj)
+        else:
+            body = marshal.dumps(obj)
+        if self.compressor is not None:
+            body = _compress(self.compressor, body, self.level)
+        return self.header + body
+
+
+def _compress(compressor: str, data: bytes, level: Optional[int]) -> bytes:
+    module = COMPRESSORS[compressor]
+    if level is None:
+        return module.compress(data)
+    if compressor == 'lzma':
+        return module.compress(data, preset=level)
+    return module.compress(data, level)
+
+def _dumps_oob(obj: Any) -> bytes:
+    buffers: list[memoryview] = []
+
+    def callback(buf: pickle.PickleBuffer) -> bool:
+        try:
+            buffers.append(buf.raw())
+        except BufferError:
+            # Non-contiguous buffers just get serialized in-band
+            return True
+        return False
+
+    main = pickle.dumps(obj, protocol=5, buffer_callback=callback)
+    lengths = [len(main)] + [b.nbytes for b in buffers]
+    frame = struct.pack(f"<I{len(lengths)}Q", len(buffers), *lengths)
+    return b''.join([frame, main, *buffers])
+
+def _loads_oob(data: memoryview) -> Any:
+    (nbufs,) = struct.unpack_from("<I", data)
+    lengths = struct.unpack_from(f"<{nbufs + 1}Q", data, 4)
+    start = 4 + 8 * len(lengths)
+    slices = []
+    for length in lengths:
+        slices.append(data[start:start + length])
+        start += length
+    return pickle.loads(slices[0], buffers=slices[1:])
+
+def decode(data: Union[bytes, memoryview]) -> Any:
+    """Decodes the given bytes-like :data according to its header (or as a plain pickle if it has none)."""
+    view = memoryview(data)
+    if bytes(view[:2]) != MAGIC:
+        return pickle.loads(view)
+    if len(view) < 4 or view[2] >= len(SERIALIZERS) or view[3] >= len(_COMPRESSOR_IDS):
+        raise ValueError("invalid codec header")
+    serializer, compressor = SERIALIZERS[view[2]], _COMPRESSOR_IDS[view[3]]
+    body = view[4:]
+    if compressor is not None:
+        body = memoryview(COMPRESSORS[compressor].decompress(body))
+    if serializer == 'pickle':
+        return pickle.loads(body)
+    if serializer == 'pickle5':
+        return _loads_oob(body)
+    return marshal.loads(body)
+
+def encode(obj: Any, codec: Optional[Union[str, Codec]] = None) -> bytes:
+    """Encodes :obj with the given :codec, or as a plain (header-less) pickle if no codec is given."""
+    if codec is None:
+        return pickle.dumps(obj)
+    return Codec.parse(codec).encode(obj)
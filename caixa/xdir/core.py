@@ -1,20 +1,44 @@
 import os
 import re
-import pickle
+import csv
+import json
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Iterator, Optional, Any
+from functools import partial, lru_cache
+from itertools import chain
+from typing import Iterator, Optional, Union, TextIO, Any
 import ioany
+from caixa.util.array import batched
+from caixa.util.pool import ordered_map
+from caixa.trace import traced
+from .segment import BlockSegment, load_extent
+from .index import ItemIndex, claim_marker, parse_claim
+from .codec import Codec, encode, decode
+from .atomic import atomic_path, WriteBatch, FileLock
+from .manifest import Manifest, ManifestDiff
+
+# Buffer size for the streaming readers and writers
+CHUNKSIZE = 1 << 20
+
+# The age (in seconds) beyond which `sweep_claims` considers a claim to have been abandoned
+STALE_CLAIM = 3600
+
+# Where `update_manifest` keeps the manifest (hidden, so it doesn't show up in the manifest itself)
+MANIFEST = '.manifest.pickle'
+
+@lru_cache(maxsize=None)
+def _itemregex(label: str, ext: str) -> re.Pattern:
+    return re.compile(f"{re.escape(label)}-(\\S+)\\.{re.escape(ext)}")
 
 @dataclass
 class ItemPat:
     label: str
     ext: str
 
-    # TODO: memoize this regex construction. 
-    # Definitely should not be recompiling it for every search!
     @property
     def _regex(self) -> re.Pattern: 
-        return re.compile(f"{self.label}-(\S+)\.{self.ext}")
+        return _itemregex(self.label, self.ext)
 
     def match(self, subpath: str) -> Optional[re.Match]: 
         return self._regex.match(subpath)
@@ -37,8 +61,22 @@ class ItemAttr:
 class XDir:
     """An object representing a directory in a POSIX-like file system."""
 
-    def __init__(self, path: str, vivify: bool = False, verify: bool = True):
+    def __init__(
+            self, 
+            path: str, 
+            vivify: bool = False, 
+            verify: bool = True, 
+            codec: Optional[Union[str, Codec]] = None,
+            fsync: bool = True):
         self._path = path
+        self._fsync = fsync
+        self._batch: Optional[WriteBatch] = None
+        self._batched: list[str] = []
+        self._claims: set[str] = set()
+        self._codecs: dict[Optional[str], Optional[Codec]] = {None: None}
+        self.set_codec(codec)
+        self._segments: dict[str, BlockSegment] = {}
+        self._items: Optional[ItemIndex] = None
         if vivify:
             self.vivify()
         else:
@@ -142,14 +180,14 @@ class XDir:
         # print(f"XDIR.subdir: dirname = {dirname}, vivify = {vivify}")
         fullpath = self.fullpath(dirname)
         if os.path.isdir(fullpath):
-            return XDir(fullpath)
+            return XDir(fullpath, codec=self.codec_for(), fsync=self._fsync)
         if strict:
             raise RuntimeError(f"invalid state - couldn't find subdir '{dirname}' under expected location")
         if vivify:
             if os.path.exists(fullpath):
                 raise ValueError(f"can't vivify subdir '{dirname}' under {self} - a non-directory object already exists at that location")
             os.mkdir(fullpath)
-            return XDir(fullpath)
+            return XDir(fullpath, codec=self.codec_for(), fsync=self._fsync)
         # If we get here it means we didn't find the subdir under the expected location.
         # So we return None and let the calling context decide what to do about it.
         return None
@@ -157,13 +195,36 @@ class XDir:
     #
     # Item recognition
     #
+    # Lookups go through a cached index of the item files in this directory (see `caixa.xdir.index`),
+    # which is rebuilt only when the directory's mtime changes behind our back.
+    #
+
+    @property
+    def item_index(self) -> ItemIndex:
+        if self._items is None:
+            self._items = ItemIndex(self.path)
+        return self._items
+
+    def _saved(self, subpath: str) -> None:
+        """Lets the item index know about a file we've just written (and drops our claim on it, if any)."""
+        if self._claims:
+            marker = claim_marker(subpath)
+            if marker in self._claims:
+                self._release(marker)
+        if self._items is not None:
+            self._items.add(subpath)
 
     def find_items(self, label: str, ext: str) -> Iterator[ItemAttr]:
-        itempat = ItemPat(label, ext)
-        for subpath in self.get_files():
-            offset = itempat.offset(subpath)
-            if offset is not None:
-                yield ItemAttr(offset, subpath)
+        for (offset, subpath) in self.item_index.items(label, ext):
+            yield ItemAttr(offset, subpath)
+
+    def max_offset(self, label: str, ext: str = 'pickle') -> Optional[int]:
+        """Returns the highest offset among the items for the given :label and :ext, or None if there are none."""
+        return self.item_index.max_offset(label, ext)
+
+    def next_position(self, label: str, ext: str = 'pickle') -> int:
+        """Returns the position just past the highest existing item for the given :label and :ext."""
+        return self.item_index.next_position(label, ext)
 
     def item_path(self, label: str, ext: str, position: int) -> str:
         if position not in range(0, 1000000):
@@ -171,23 +232,138 @@ class XDir:
         fmtpos = "%.6d" % position
         return f"{label}-{fmtpos}.{ext}"
 
+    #
+    # Atomic writes and locking
+    #
+    # All of the save_* methods write to a temp file which is fsync'd (unless the instance was created
+    # with fsync=False) and then renamed into place, so readers never see partially written files.
+    # See `caixa.xdir.atomic` for details.
+    #
+
+    @contextmanager
+    def atomic(self, subpath: str) -> Iterator[str]:
+        """
+        A context manager yielding a temp path to write to in place of the given :subpath, which
+        is moved into place when the block exits (or when the current write batch is committed).
+        """
+        with atomic_path(self.fullpath(subpath), fsync=self._fsync, batch=self._batch) as temppath:
+            yield temppath
+        if self._batch is not None:
+            self._batched.append(subpath)
+        else:
+            self._saved(subpath)
+
+    @contextmanager
+    def write_batch(self) -> Iterator[WriteBatch]:
+        """
+        A context manager under which saves are held back as temp files, and then all synced and
+        renamed into place together when the block exits - so that we pay for one directory fsync
+        per batch rather than per file.  If the block raises, none of the batched files are kept.
+        Nested batches simply join the outermost one.
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = WriteBatch(fsync=self._fsync)
+        try:
+            yield self._batch
+            self._batch.commit()
+        except BaseException:
+            self._batch.abort()
+            raise
+        finally:
+            subpaths, self._batched, self._batch = self._batched, [], None
+        for subpath in subpaths:
+            self._saved(subpath)
+
+    def lock(self, name: str) -> FileLock:
+        """Returns an (advisory, inter-process) lock for the given :name, for use as a context manager."""
+        return FileLock(self.fullpath(f".{name}.lock"))
+
+    def claim_position(self, label: str, ext: str = 'pickle', stale_after: Optional[float] = None) -> int:
+        """
+        Claims the next free position for the given :label and :ext, in a way that's safe across
+        any number of cooperating processes.  A hidden marker file reserves the position until an
+        item is saved there (via `save_block`, for pickles) or the claim is released.  Positions 
+        claimed by a producer that then died will show up as gaps in the sequence.  If :stale_after
+        is given, claims older than that many seconds are first swept up (as by `sweep_claims`).
+
+        Blocks under a label backed by a segment can't be claimed this way (their positions live in the
+        segment, not in item files); use the segment's `append_block` instead.
+        """
+        with self.lock(label):
+            if ext == 'pickle' and self.segment(label) is not None:
+                raise ValueError(f"can't claim positions under label '{label}' - it's backed by a block segment (use append_block)")
+            if stale_after is not None:
+                self._sweep_claims(label, ext, stale_after)
+            self.item_index.invalidate()
+            position = self.item_index.next_position(label, ext)
+            marker = claim_marker(self.item_path(label, ext, position))
+            os.close(os.open(self.fullpath(marker), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+            self._claims.add(marker)
+            self.item_index.add(marker)
+        return position
+
+    def sweep_claims(self, label: str, ext: str = 'pickle', stale_after: float = STALE_CLAIM) -> list[int]:
+        """
+        Removes the claim markers for the given :label and :ext which are older than :stale_after seconds
+        (other than our own), as left behind by producers which died before saving, and returns their
+        positions.  Abandoned claims at the end of the sequence are thereby freed up for reuse; those
+        further back remain gaps, but no longer accumulate.
+        """
+        with self.lock(label):
+            return self._sweep_claims(label, ext, stale_after)
+
+    def _sweep_claims(self, label: str, ext: str, stale_after: float) -> list[int]:
+        cutoff = time.time() - stale_after
+        swept = []
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                parsed = parse_claim(entry.name)
+                if parsed is None or parsed[:2] != (label, ext) or entry.name in self._claims:
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        swept.append(parsed[2])
+                except FileNotFoundError:
+                    pass
+        if swept:
+            self.item_index.invalidate()
+        return sorted(swept)
+
+    def release_position(self, label: str, position: int, ext: str = 'pickle') -> None:
+        self._release(claim_marker(self.item_path(label, ext, position)))
+
+    def _release(self, marker: str) -> None:
+        self._claims.discard(marker)
+        try:
+            os.unlink(self.fullpath(marker))
+        except FileNotFoundError:
+            pass
+        if self._items is not None:
+            self._items.discard(marker)
+
     #
     # The next 3 methods are basically congruent (up to the slurp method).
     #
 
+    @traced('xdir.load_json')
     def load_json(self, subpath: str) -> object:
         path = self.fullpath(subpath)
-        if self.exists(path):
+        if os.path.exists(path):
             return ioany.load_json(path)
         raise ValueError(f"can't find JSON file at path = '{path}'")
 
+    @traced('xdir.save_json')
     def save_json(self, subpath: str, obj: Any, sort_keys: bool = True, indent: int = 4):
-        path = self.fullpath(subpath)
-        ioany.save_json(path, obj, sort_keys, indent)
+        with self.atomic(subpath) as path:
+            ioany.save_json(path, obj, sort_keys, indent)
 
+    @traced('xdir.load_yaml')
     def load_yaml(self, subpath: str) -> object:
         path = self.fullpath(subpath)
-        if self.exists(path):
+        if os.path.exists(path):
             return ioany.load_yaml(path)
         raise ValueError(f"can't find YAML file at path = '{path}'")
 
@@ -198,55 +374,259 @@ class XDir:
         path = self.fullpath(subpath)
         return ioany.load_any(path)
 
-    def save_recs(self, subpath: str, stream: Iterator[dict]):
-        path = self.fullpath(subpath)
-        return ioany.save_csv(path, stream)
+    @traced('xdir.save_recs')
+    def save_recs(
+            self,
+            subpath: str,
+            stream: Iterator[dict],
+            flush_every: int = 10000,
+            encoding: str = 'utf-8',
+            fieldnames: Optional[list[str]] = None,
+            extrasaction: str = 'raise') -> int:
+        """
+        Writes the given :stream of records to a CSV file, flushing every :flush_every rows.  The stream is
+        consumed incrementally, so it can be arbitrarily long.  Returns the number of records written.
 
+        Since the header row has to be written before we've seen all the records, it's taken from the given
+        :fieldnames, or else from the keys of the first record.  Keys missing from a record are written as
+        empty fields; keys not in the header raise ValueError (in which case nothing gets saved), unless
+        :extrasaction is 'ignore' - exactly as for `csv.DictWriter`.
+        """
+        stream = iter(stream)
+        first = next(stream, None)
+        count = 0
+        with self.atomic(subpath) as path, open(path, "w", newline='', encoding=encoding, buffering=CHUNKSIZE) as f:
+            if first is not None or fieldnames is not None:
+                header = list(first.keys()) if fieldnames is None else fieldnames
+                writer = csv.DictWriter(f, fieldnames=header, extrasaction=extrasaction)
+                writer.writeheader()
+                recs = stream if first is None else chain([first], stream)
+                for batch in batched(recs, flush_every):
+                    writer.writerows(batch)
+                    f.flush()
+                    count += len(batch)
+        return count
+
+    @traced('xdir.slurp_csv')
     def slurp_csv(self, subpath: str) -> list[dict]:
         path = self.fullpath(subpath)
-        if self.exists(path):
+        if os.path.exists(path):
             return list(ioany.read_csv(path).rows())
         raise ValueError(f"can't find CSV file at path = '{path}'")
 
+    @traced('xdir.save_lines')
     def save_lines(self, subpath: str, lines: list[str], encoding: str = 'utf-8'):
-        path = self.fullpath(subpath)
-        return ioany.save_lines(path, lines, encoding)
+        with self.atomic(subpath) as path:
+            return ioany.save_lines(path, lines, encoding)
 
+    @traced('xdir.load_lines')
     def load_lines(self, subpath: str, encoding: str = 'utf-8') -> list[str]:
         path = self.fullpath(subpath)
         return ioany.load_lines(path, encoding)
 
+    #
+    # Streaming record I/O
+    #
+    # Unlike `slurp_csv` and `load_lines` the methods below never hold more than one chunk (plus at 
+    # most one batch) of a file in memory.  Where a :batch size is given, records are yielded as lists 
+    # of that many records (the last one possibly shorter) rather than one at a time.
+    #
+
+    def _open_existing(self, subpath: str, kind: str, encoding: str, newline: Optional[str] = None) -> TextIO:
+        path = self.fullpath(subpath)
+        if not os.path.isfile(path):
+            raise ValueError(f"can't find {kind} file at path = '{path}'")
+        return open(path, "r", encoding=encoding, newline=newline, buffering=CHUNKSIZE)
+
+    def iter_lines(self, subpath: str, encoding: str = 'utf-8', batch: Optional[int] = None) -> Iterator[Any]:
+        """Yields the lines of the file at :subpath, with trailing newlines removed."""
+        def lines() -> Iterator[str]:
+            with self._open_existing(subpath, 'text', encoding) as f:
+                for line in f:
+                    yield line.rstrip('\n')
+        return _maybe_batched(lines(), batch)
+
+    def iter_csv(self, subpath: str, encoding: str = 'utf-8', batch: Optional[int] = None) -> Iterator[Any]:
+        """Yields the rows of the CSV file at :subpath as dicts keyed on the header row."""
+        def rows() -> Iterator[dict]:
+            with self._open_existing(subpath, 'CSV', encoding, newline='') as f:
+                yield from csv.DictReader(f)
+        return _maybe_batched(rows(), batch)
+
+    def iter_jsonl(self, subpath: str, encoding: str = 'utf-8', batch: Optional[int] = None) -> Iterator[Any]:
+        """Yields the objects in the JSON-lines file at :subpath (skipping any blank lines)."""
+        def objects() -> Iterator[Any]:
+            with self._open_existing(subpath, 'JSON-lines', encoding) as f:
+                for line in f:
+                    if not line.isspace():
+                        yield json.loads(line)
+        return _maybe_batched(objects(), batch)
+
+    @traced('xdir.append_jsonl')
+    def append_jsonl(self, subpath: str, stream: Iterator[Any], flush_every: int = 10000, encoding: str = 'utf-8') -> int:
+        """
+        Appends each object in the given :stream as a line of JSON to the file at :subpath (creating it if
+        need be), flushing every :flush_every lines.  Returns the number of objects written.
+        """
+        path = self.fullpath(subpath)
+        count = 0
+        with open(path, "a", encoding=encoding, buffering=CHUNKSIZE) as f:
+            for batch in batched(stream, flush_every):
+                f.writelines(json.dumps(obj) + "\n" for obj in batch)
+                f.flush()
+                count += len(batch)
+        self._saved(subpath)
+        return count
+
     #
     # Pickling
     #
+    # By default objects are written as plain pickles.  A codec (see `caixa.xdir.codec`) can be set
+    # for the whole directory, or for the blocks under a given label, via `set_codec`.  Either way,
+    # readers pick up the codec from the header of the data itself.
+    #
 
+    def set_codec(self, codec: Optional[Union[str, Codec]], label: Optional[str] = None) -> None:
+        """
+        Sets the codec used for saving blocks under the given :label (or for everything, if no
+        :label is given).  Passing a :codec of None reverts to the directory-wide default.
+        """
+        if codec is None and label is not None:
+            self._codecs.pop(label, None)
+        else:
+            self._codecs[label] = None if codec is None else Codec.parse(codec)
+
+    def codec_for(self, label: Optional[str] = None) -> Optional[Codec]:
+        return self._codecs.get(label, self._codecs[None])
+
+    @traced('xdir.load_pickle')
     def load_pickle(self, subpath: str) -> Any:
         fullpath = self.fullpath(subpath)
         with open(fullpath, "rb") as f:
-            return pickle.load(f)
+            return decode(f.read())
 
-    def save_pickle(self, subpath: str, data: Any) -> None:
-        fullpath = self.fullpath(subpath)
-        with open(fullpath, "wb") as f:
-            pickle.dump(data, f)
+    @traced('xdir.save_pickle')
+    def save_pickle(self, subpath: str, data: Any, codec: Optional[Union[str, Codec]] = None) -> None:
+        if codec is None:
+            codec = self.codec_for()
+        with self.atomic(subpath) as path, open(path, "wb") as f:
+            f.write(encode(data, codec))
 
     #
     # Block-oriented pickling
     #
+    # Blocks for a given label live either in a set of individual pickle files (the default layout),
+    # or in a single segment file if one has been created for that label via `segment(label, vivify=True)`.
+    # The load/save/read methods below dispatch on whichever layout is present.
+    #
 
     def block_path(self, label: str, position: int) -> str:
         return self.item_path(label, 'pickle', position)
 
+    def segment(self, label: str, vivify: bool = False) -> Optional[BlockSegment]:
+        """
+        Returns the block segment for the given :label, creating it if :vivify is set.
+        If no segment exists (and :vivify is not set) we return None.
+        """
+        seg = self._segments.get(label)
+        if seg is None:
+            if not vivify and not BlockSegment.exists(self.path, label):
+                return None
+            seg = self._segments[label] = BlockSegment(self.path, label, vivify=vivify)
+        return seg
+
+    def close(self) -> None:
+        """Releases any open segment files (and their memory maps)."""
+        for seg in self._segments.values():
+            seg.close()
+        self._segments = {}
+
+    @traced('xdir.load_block')
     def load_block(self, label: str, position: int) -> Any:
+        seg = self.segment(label)
+        if seg is not None:
+            return seg.load_block(position)
         subpath = self.block_path(label, position)
         return self.load_pickle(subpath)
 
+    @traced('xdir.save_block')
     def save_block(self, label: str, position: int, block: Any) -> None:
+        codec = self.codec_for(label)
+        seg = self.segment(label)
+        if seg is not None:
+            return seg.save_block(position, block, codec)
         subpath = self.block_path(label, position)
-        self.save_pickle(subpath, block)
+        self.save_pickle(subpath, block, codec)
+
+    def read_blocks(
+            self, 
+            label: str, 
+            workers: Optional[int] = None, 
+            prefetch: Optional[int] = None,
+            executor: str = 'thread') -> Iterator[list]:
+        """
+        Yields the blocks under the given :label in position order.
+
+        By default blocks are loaded one after the other on the calling thread.  If :workers is given,
+        loading (and unpickling) is farmed out to a pool of that many threads or processes (according
+        to :executor), with at most :prefetch blocks in flight ahead of the consumer.  Process mode lets
+        the unpickling of large blocks proceed on other cores, at the cost of shipping each block back
+        to the calling process.
+        """
+        seg = self.segment(label)
+        if workers is None:
+            if seg is not None:
+                yield from seg.read_blocks()
+            else:
+                for item in self.find_items(label, 'pickle'):
+                    yield self.load_pickle(item.subpath)
+            return
+        if seg is not None:
+            if executor == 'thread':
+                function, items = seg.load_block, seg.positions()
+            else:
+                function, items = partial(load_extent, seg.datapath), seg.extents()
+        else:
+            function = _load_pickle_path
+            items = (self.fullpath(item.subpath) for item in self.find_items(label, 'pickle'))
+        yield from ordered_map(function, items, workers, prefetch, executor)
+
+    #
+    # Change detection
+    #
+    # A manifest (see `caixa.xdir.manifest`) records the size, mtime, inode and checksum of every file
+    # in the tree, so that a rescan only needs to hash the files whose stat info has changed.
+    #
+
+    def load_manifest(self, subpath: str = MANIFEST) -> Optional[Manifest]:
+        """Returns the manifest saved under :subpath by the last `update_manifest`, or None if there isn't one."""
+        if not self.is_file(subpath):
+            return None
+        return Manifest.from_dict(self.load_pickle(subpath))
+
+    @traced('xdir.update_manifest')
+    def update_manifest(
+            self,
+            subpath: str = MANIFEST,
+            algorithm: Optional[str] = None,
+            workers: Optional[int] = None,
+            save: bool = True) -> ManifestDiff:
+        """
+        Rescans the tree under this directory against the manifest saved under :subpath (if any), hashing
+        new and changed files on a pool of :workers threads, and saves the updated manifest in its place
+        (unless :save is False).  Returns the files added, removed and modified since the last update,
+        along with any groups of files with duplicate content.
+        """
+        previous = self.load_manifest(subpath)
+        manifest, diff = Manifest.scan(self.path, previous, algorithm, workers)
+        if save:
+            self.save_pickle(subpath, manifest.to_dict())
+        return diff
+
 
-    def read_blocks(self, label: str) -> Iterator[list]:
-        items = self.find_items(label, 'pickle')
-        for item in items:
-            yield self.load_pickle(item.subpath)
+def _maybe_batched(items: Iterator[Any], batch: Optional[int]) -> Iterator[Any]:
+    return items if batch is None else batched(items, batch)
 
+def _load_pickle_path(path: str) -> Any:
+    with open(path, "rb") as f:
+        return decode(f.read())
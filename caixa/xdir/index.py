@@ -0,0 +1,141 @@
+"""
+Provides the class ItemIndex, an in-memory index of the "item" files in a directory - that is, 
+files named according to the `{label}-{offset}.{ext}` scheme used by `XDir.item_path`.
+
+The index is built with a single `os.scandir` pass and keeps, for each (label, ext) pair, the list
+of (offset, subpath) pairs sorted by offset.  It remembers the mtime of the directory as of its last
+build, and considers itself stale (so that the next query triggers a rescan) whenever the directory's
+mtime changes behind its back.  Saves made through `XDir` itself are folded in incrementally via `add`,
+so they don't cost us a rescan.
+
+Note that the mtime check is a heuristic: a change made by some other process in between one of
+our own saves and the subsequent `add` will go unnoticed until `invalidate` is called.
+"""
+import os
+import re
+from bisect import bisect_left
+from typing import Optional
+
+# The ext is everything after the first dot following the offset, so may itself contain dots (e.g. 'tar.gz').
+# Hidden files (our own claim markers, temp files and the like) are never items.
+ITEMPAT = re.compile(r"^(?P<label>[^.].*)-(?P<offset>\d+)\.(?P<ext>.+)$")
+CLAIMPAT = re.compile(r"^\.(?P<subpath>.+)\.claim$")
+
+def claim_marker(subpath: str) -> str:
+    """Returns the name of the hidden marker file used to claim the item at the given :subpath."""
+    return f".{subpath}.claim"
+
+def parse_item(subpath: str) -> Optional[tuple[str, str, int]]:
+    """Returns the triple (label, ext, offset) if the given :subpath looks like an item file, None otherwise."""
+    m = ITEMPAT.match(subpath)
+    if m is None:
+        return None
+    return (m.group('label'), m.group('ext'), int(m.group('offset')))
+
+def parse_claim(subpath: str) -> Optional[tuple[str, str, int]]:
+    """Like `parse_item`, but for the claim marker files created by `XDir.claim_position`."""
+    m = CLAIMPAT.match(subpath)
+    return parse_item(m.group('subpath')) if m else None
+
+
+class ItemIndex:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._groups: dict[tuple[str, str], list[tuple[int, str]]] = {}
+        self._claims: dict[tuple[str, str], set[int]] = {}
+        self._mtime: Optional[int] = None
+
+    def _stat_mtime(self) -> int:
+        return os.stat(self.path).st_mtime_ns
+
+    @property
+    def is_stale(self) -> bool:
+        return self._mtime is None or self._mtime != self._stat_mtime()
+
+    def invalidate(self) -> None:
+        self._mtime = None
+
+    def rebuild(self) -> None:
+        mtime = self._stat_mtime()
+        groups: dict[tuple[str, str], list[tuple[int, str]]] = {}
+        claims: dict[tuple[str, str], set[int]] = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                parsed = parse_item(entry.name)
+                if parsed is not None and entry.is_file():
+                    label, ext, offset = parsed
+                    groups.setdefault((label, ext), []).append((offset, entry.name))
+                    continue
+                parsed = parse_claim(entry.name)
+                if parsed is not None:
+                    label, ext, offset = parsed
+                    claims.setdefault((label, ext), set()).add(offset)
+        for pairs in groups.values():
+            pairs.sort()
+        self._groups = groups
+        self._claims = claims
+        self._mtime = mtime
+
+    def refresh(self) -> None:
+        """Rebuilds the index if (and only if) it's stale."""
+        if self.is_stale:
+            self.rebuild()
+
+    def add(self, subpath: str) -> None:
+        """
+        Folds a file which we've just written into the index, and re-syncs our recorded mtime 
+        (since the write itself will have bumped it).  If the index was already stale, we leave 
+        it that way so that the next query still does a full rescan.
+        """
+        if self._mtime is None:
+            return
+        claim = parse_claim(subpath)
+        if claim is not None:
+            label, ext, offset = claim
+            self._claims.setdefault((label, ext), set()).add(offset)
+        parsed = parse_item(subpath)
+        if parsed is not None:
+            label, ext, offset = parsed
+            pairs = self._groups.setdefault((label, ext), [])
+            pair = (offset, subpath)
+            i = bisect_left(pairs, pair)
+            if i == len(pairs) or pairs[i] != pair:
+                pairs.insert(i, pair)
+        self._mtime = self._stat_mtime()
+
+    def discard(self, subpath: str) -> None:
+        """The converse of `add`, for a claim marker (or item file) which we've just removed."""
+        if self._mtime is None:
+            return
+        claim = parse_claim(subpath)
+        if claim is not None:
+            label, ext, offset = claim
+            self._claims.get((label, ext), set()).discard(offset)
+        parsed = parse_item(subpath)
+        if parsed is not None:
+            label, ext, offset = parsed
+            pairs = self._groups.get((label, ext), [])
+            pair = (offset, subpath)
+            i = bisect_left(pairs, pair)
+            if i < len(pairs) and pairs[i] == pair:
+                del pairs[i]
+        self._mtime = self._stat_mtime()
+
+    def items(self, label: str, ext: str) -> list[tuple[int, str]]:
+        """Returns the (offset, subpath) pairs for :label and :ext, sorted by offset - as a copy, which callers may keep."""
+        self.refresh()
+        return list(self._groups.get((label, ext), ()))
+
+    def max_offset(self, label: str, ext: str) -> Optional[int]:
+        self.refresh()
+        pairs = self._groups.get((label, ext))
+        return pairs[-1][0] if pairs else None
+
+    def next_position(self, label: str, ext: str) -> int:
+        """Returns the position just past the highest existing (or claimed) item."""
+        offset = self.max_offset(label, ext)
+        claims = self._claims.get((label, ext))
+        if claims:
+            offset = max(claims) if offset is None else max(offset, max(claims))
+        return 0 if offset is None else offset + 1
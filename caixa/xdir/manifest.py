@@ -0,0 +1,195 @@
+"""
+Provides `Manifest`, a record of the (size, mtime_ns, inode, checksum) of every file in a directory tree,
+for detecting which files have changed between one scan of the tree and the next, and for finding files
+with duplicate content.
+
+A scan walks the tree with `os.scandir` and compares each file's stat info against the previous manifest
+(if any).  Only files which are new, or whose size, mtime or inode differ, get hashed - on a thread pool,
+via `caixa.util.pool.ordered_map` - and all the other checksums are carried over as they are.  So a
+rescan of a large, mostly unchanged tree costs about one `stat` per file.
+
+As with git's index, a file whose mtime is close to the time of the scan which recorded it can't be trusted
+to be unchanged just because its stat info is the same (it may have been written again within the resolution
+of the filesystem's clock), so such files are always rehashed on the next scan.
+
+Hidden files - including the locks, claim markers and temp files used by `XDir` itself, and the manifest
+file - are skipped by default.  Since the tree may well be changing while it's being scanned, files (and
+directories) which disappear partway through the scan are simply left out of the new manifest - so they
+show up as removed, if they were in the previous one.
+
+    manifest, diff = Manifest.scan(path)
+    ...
+    manifest, diff = Manifest.scan(path, previous=manifest)
+    print(diff.modified, diff.duplicates)
+"""
+import os
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Iterator, Optional
+from caixa.util.filediff import Checksum, assert_valid_algorithm, file_checksum
+from caixa.util.pool import ordered_map
+
+ALGORITHM = 'blake2b'
+
+# Files modified within this long before a scan get rehashed on the next one, as above
+RACY_NS = 2 * 10**9
+
+ManifestEntry = namedtuple('ManifestEntry', ['size', 'mtime_ns', 'inode', 'checksum'])
+
+
+@dataclass
+class ManifestDiff:
+    """The changes found by a scan, as sorted lists of paths (relative to the root of the tree)."""
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    duplicates: list[list[str]] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+def scan_tree(dirpath: str, hidden: bool = False) -> Iterator[tuple[str, os.stat_result]]:
+    """Yields the (relative path, stat info) of each regular file under :dirpath, without following symlinks."""
+    stack = [""]
+    while stack:
+        reldir = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(dirpath, reldir))
+        except FileNotFoundError:
+            if not reldir:
+                raise
+            continue
+        with entries:
+            for entry in entries:
+                if not hidden and entry.name.startswith('.'):
+                    continue
+                relpath = os.path.join(reldir, entry.name) if reldir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(relpath)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield (relpath, entry.stat(follow_symlinks=False))
+                except FileNotFoundError:
+                    continue
+
+def checksum_or_none(filepath: str, algorithm: str) -> Optional[Checksum]:
+    """Returns the checksum of the file at :filepath, or None if it no longer exists."""
+    try:
+        return file_checksum(filepath, algorithm)
+    except FileNotFoundError:
+        return None
+
+
+class Manifest:
+
+    def __init__(
+            self,
+            entries: Optional[dict[str, ManifestEntry]] = None,
+            algorithm: str = ALGORITHM,
+            scanned_ns: int = 0):
+        assert_valid_algorithm(algorithm)
+        self.entries = {} if entries is None else entries
+        self.algorithm = algorithm
+        self.scanned_ns = scanned_ns
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, relpath: str) -> bool:
+        return relpath in self.entries
+
+    def __getitem__(self, relpath: str) -> ManifestEntry:
+        return self.entries[relpath]
+
+    @classmethod
+    def scan(
+            cls,
+            dirpath: str,
+            previous: Optional['Manifest'] = None,
+            algorithm: Optional[str] = None,
+            workers: Optional[int] = None,
+            hidden: bool = False) -> tuple['Manifest', 'ManifestDiff']:
+        """
+        Scans the tree under :dirpath, returning a new manifest along with the differences from the
+        :previous one (against which everything counts as added, if there isn't one).  The :algorithm
+        defaults to that of the :previous manifest; if the two differ, every file gets rehashed (and files
+        count as modified if their stat info has changed).
+        """
+        if algorithm is None:
+            algorithm = previous.algorithm if previous is not None else ALGORITHM
+        assert_valid_algorithm(algorithm)
+        reusable = previous is not None and previous.algorithm == algorithm
+        before = previous.entries if previous is not None else {}
+        scanned_ns = time.time_ns()
+        entries: dict[str, ManifestEntry] = {}
+        pending: list[tuple[str, os.stat_result]] = []
+        for (relpath, st) in scan_tree(dirpath, hidden):
+            old = before.get(relpath)
+            if reusable and old is not None and _unchanged(old, st, previous.scanned_ns):
+                entries[relpath] = old
+            else:
+                pending.append((relpath, st))
+        paths = (os.path.join(dirpath, relpath) for (relpath, _) in pending)
+        checksums = ordered_map(partial(checksum_or_none, algorithm=algorithm), paths, workers)
+        for ((relpath, st), checksum) in zip(pending, checksums):
+            if checksum is not None:
+                entries[relpath] = ManifestEntry(st.st_size, st.st_mtime_ns, st.st_ino, checksum)
+        manifest = cls(entries, algorithm, scanned_ns)
+        diff = ManifestDiff(
+            added=sorted(entries.keys() - before.keys()),
+            removed=sorted(before.keys() - entries.keys()),
+            modified=sorted(
+                relpath for (relpath, _) in pending
+                if relpath in before and relpath in entries and _modified(before[relpath], entries[relpath], reusable)
+            ),
+            duplicates=manifest.duplicates()
+        )
+        return (manifest, diff)
+
+    def duplicates(self, min_size: int = 1) -> list[list[str]]:
+        """
+        Returns groups of paths (each sorted, and sorted by first path) of files with identical content -
+        ignoring files smaller than :min_size bytes, which by default means ignoring empty files.
+        """
+        groups: dict[tuple[int, Checksum], list[str]] = {}
+        for (relpath, entry) in self.entries.items():
+            if entry.size >= min_size:
+                groups.setdefault((entry.size, entry.checksum), []).append(relpath)
+        return sorted(sorted(paths) for paths in groups.values() if len(paths) > 1)
+
+    def by_checksum(self, checksum: Checksum) -> list[str]:
+        """Returns the (sorted) paths of the files with the given :checksum."""
+        return sorted(relpath for (relpath, entry) in self.entries.items() if entry.checksum == checksum)
+
+    #
+    # Serialization
+    #
+    # Entries are stored as plain tuples, which pickle far more compactly than named ones.
+    #
+
+    def to_dict(self) -> dict:
+        return {
+            'algorithm': self.algorithm,
+            'scanned_ns': self.scanned_ns,
+            'entries': {relpath: tuple(entry) for (relpath, entry) in self.entries.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Manifest':
+        entries = {relpath: ManifestEntry(*values) for (relpath, values) in data['entries'].items()}
+        return cls(entries, data['algorithm'], data['scanned_ns'])
+
+
+def _unchanged(entry: ManifestEntry, st: os.stat_result, scanned_ns: int) -> bool:
+    same = entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns and entry.inode == st.st_ino
+    return same and st.st_mtime_ns < scanned_ns - RACY_NS
+
+def _modified(old: ManifestEntry, new: ManifestEntry, comparable: bool) -> bool:
+    # Checksums from different algorithms can't be compared, so we fall back to comparing stat info
+    if comparable:
+        return old.checksum != new.checksum
+    return old[:3] != new[:3]
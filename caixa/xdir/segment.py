@@ -0,0 +1,236 @@
+"""
+Provides the class BlockSegment, an append-only, mmap-backed alternative to the one-pickle-file-per-block
+layout used by `XDir.save_block` and friends.
+
+A segment for a given label consists of two files living side by side in the directory:
+
+    {label}.seg - the data file, holding the serialized blocks back-to-back
+    {label}.idx - the index file, holding one (offset, length) pair of unsigned 64-bit ints per position
+
+So locating a block is a matter of reading slot `position` in the index (which we keep in memory as a
+compact `array('Q')`), after which the block bytes can be sliced directly out of the mmap'd data file.
+No directory listing is ever needed, and a label with hundreds of thousands of blocks costs us just
+two inodes.
+
+Slots that were never written are "holes", represented by a length of 0 (a serialized block can never
+be empty).  Rewriting a position appends the new bytes to the data file and repoints the index slot;
+the old bytes simply become dead space.
+
+Appends take an exclusive `flock` on the data file, so any number of processes can write to the same
+segment; `append_block` picks the next free position under that lock.
+
+Blocks are serialized as described in `caixa.xdir.codec`, so each block may have been written with
+a different codec; with the out-of-band 'pickle5' codec, large buffers are loaded straight out of the
+mmap without being copied.
+"""
+import os
+import mmap
+import fcntl
+import threading
+from array import array
+from typing import Iterator, Optional, Union, Any
+from caixa.trace import traced
+from .codec import Codec, encode, decode
+
+SLOTSIZE = 16  # bytes per index slot - that is, two 'Q' values
+
+
+def load_extent(datapath: str, extent: tuple[int, int]) -> Any:
+    """
+    Loads a single block given the path to its data file and its (offset, length) extent.
+    This needs no open segment object, so it can be shipped off to a worker process.
+    """
+    offset, length = extent
+    with open(datapath, "rb") as f:
+        f.seek(offset)
+        return decode(f.read(length))
+
+
+class BlockSegment:
+    """An append-only data file plus a compact offset index, read via mmap."""
+
+    def __init__(self, dirpath: str, label: str, vivify: bool = False):
+        self.label = label
+        self.datapath = os.path.join(dirpath, f"{label}.seg")
+        self.idxpath = os.path.join(dirpath, f"{label}.idx")
+        if vivify:
+            self.vivify()
+        else:
+            self.verify()
+        self._index = array('Q')
+        self._dataf: Optional[Any] = None
+        self._idxf: Optional[Any] = None
+        self._readf: Optional[Any] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped: int = 0
+        self._maplock = threading.Lock()
+        self.refresh()
+
+    def __str__(self) -> str:
+        return f"BlockSegment('{self.datapath}')"
+
+    def __len__(self) -> int:
+        """Returns the number of index slots (including holes)."""
+        return len(self._index) // 2
+
+    def __contains__(self, position: int) -> bool:
+        return self._slot(position) is not None
+
+    def __enter__(self) -> 'BlockSegment':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @classmethod
+    def exists(cls, dirpath: str, label: str) -> bool:
+        return os.path.isfile(os.path.join(dirpath, f"{label}.seg"))
+
+    def verify(self) -> None:
+        for path in (self.datapath, self.idxpath):
+            if not os.path.isfile(path):
+                raise ValueError(f"cannot verify segment file '{path}'")
+
+    def vivify(self) -> None:
+        for path in (self.datapath, self.idxpath):
+            if not os.path.isfile(path):
+                open(path, "ab").close()
+
+    def close(self) -> None:
+        for f in (self._dataf, self._idxf, self._readf):
+            if f is not None:
+                f.close()
+        self._dataf = self._idxf = self._readf = None
+        # Note that we don't explicitly close the mmap, since callers may still be
+        # holding memoryviews handed out by `raw_block`; it goes away with the last of them.
+        self._mmap = None
+        self._mapped = 0
+
+    def refresh(self) -> None:
+        """Reloads the in-memory index from disk, so as to pick up blocks appended by other writers.
+        A trailing partial slot (as left by a writer in mid-update) is ignored."""
+        with open(self.idxpath, "rb") as f:
+            raw = f.read()
+        index = array('Q')
+        index.frombytes(raw[:len(raw) - len(raw) % SLOTSIZE])
+        self._index = index
+
+    #
+    # Raw (bytes-level) access
+    #
+
+    def _slot(self, position: int) -> Optional[tuple[int, int]]:
+        if position < 0 or position >= len(self):
+            return None
+        offset, length = self._index[2 * position], self._index[2 * position + 1]
+        return (offset, length) if length else None
+
+    def _ensure_mapped(self, end: int) -> mmap.mmap:
+        # Blocks may be loaded from several threads at once (see `XDir.read_blocks`), so (re)mapping happens
+        # under a lock.  The unlocked fast path reads _mapped before _mmap, as they're assigned the other way
+        # around - so whenever it sees a size, it sees a map at least that big.
+        mapped = self._mapped
+        mm = self._mmap
+        if mm is not None and end <= mapped:
+            return mm
+        with self._maplock:
+            return self._remap(end)
+
+    def _remap(self, end: int) -> mmap.mmap:
+        if self._mmap is None or end > self._mapped:
+            if self._dataf is not None:
+                self._dataf.flush()
+            if self._readf is None:
+                self._readf = open(self.datapath, "rb")
+            size = os.fstat(self._readf.fileno()).st_size
+            if end > size:
+                raise RuntimeError(f"invalid state - index for {self} points past end of data file")
+            self._mmap = mmap.mmap(self._readf.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = size
+        return self._mmap
+
+    def positions(self) -> Iterator[int]:
+        """Yields every position currently holding a block, in increasing order."""
+        index = self._index
+        for position in range(len(self)):
+            if index[2 * position + 1]:
+                yield position
+
+    def extents(self) -> Iterator[tuple[int, int]]:
+        """Yields the (offset, length) extent of every block, in position order."""
+        for position in self.positions():
+            yield self._index[2 * position], self._index[2 * position + 1]
+
+    def raw_block(self, position: int) -> memoryview:
+        """Returns a zero-copy view onto the serialized bytes of the block at :position."""
+        slot = self._slot(position)
+        if slot is None:
+            raise ValueError(f"no block at position {position} in {self}")
+        offset, length = slot
+        buf = self._ensure_mapped(offset + length)
+        return memoryview(buf)[offset:offset + length]
+
+    def _open_for_append(self) -> None:
+        if self._dataf is None:
+            self._dataf = open(self.datapath, "ab")
+            self._idxf = open(self.idxpath, "r+b")
+
+    def append_raw(self, position: int, data: bytes) -> None:
+        """Appends the serialized :data to the data file and points slot :position at it.
+        Writing past the current end of the index leaves holes in between."""
+        if position < 0:
+            raise ValueError(f"invalid position '{position}'")
+        if not data:
+            raise ValueError("invalid usage - cannot store an empty block")
+        self._open_for_append()
+        fcntl.flock(self._dataf, fcntl.LOCK_EX)
+        try:
+            self._append_locked(position, data)
+        finally:
+            fcntl.flock(self._dataf, fcntl.LOCK_UN)
+
+    def append_next(self, data: bytes) -> int:
+        """Appends the serialized :data at the next free position (as seen by all writers), and returns that position."""
+        if not data:
+            raise ValueError("invalid usage - cannot store an empty block")
+        self._open_for_append()
+        fcntl.flock(self._dataf, fcntl.LOCK_EX)
+        try:
+            self.refresh()
+            position = len(self)
+            self._append_locked(position, data)
+        finally:
+            fcntl.flock(self._dataf, fcntl.LOCK_UN)
+        return position
+
+    def _append_locked(self, position: int, data: bytes) -> None:
+        offset = self._dataf.seek(0, os.SEEK_END)
+        self._dataf.write(data)
+        self._dataf.flush()
+        slot = array('Q', [offset, len(data)])
+        self._idxf.seek(position * SLOTSIZE)
+        self._idxf.write(slot.tobytes())
+        self._idxf.flush()
+        if position >= len(self):
+            self._index.extend([0] * 2 * (position + 1 - len(self)))
+        self._index[2 * position:2 * position + 2] = slot
+
+    #
+    # Block-level access
+    #
+
+    @traced('segment.load_block')
+    def load_block(self, position: int) -> Any:
+        return decode(self.raw_block(position))
+
+    @traced('segment.save_block')
+    def save_block(self, position: int, block: Any, codec: Optional[Union[str, Codec]] = None) -> None:
+        self.append_raw(position, encode(block, codec))
+
+    def append_block(self, block: Any, codec: Optional[Union[str, Codec]] = None) -> int:
+        return self.append_next(encode(block, codec))
+
+    def read_blocks(self) -> Iterator[Any]:
+        """Streams through the blocks in position order."""
+        for position in self.positions():
+            yield self.load_block(position)
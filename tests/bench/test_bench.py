@@ -0,0 +1,32 @@
+from caixa.bench import BenchSuite, BenchResult, compare, run_benchmark
+from caixa.xdir import XDir
+
+
+def test_run_benchmark():
+    result = run_benchmark(lambda: sum(range(100)), name='sum', trials=3, min_time=0.001)
+    assert result.name == 'sum'
+    assert len(result.times) == 3
+    assert result.loops >= 1
+    assert result.best <= result.median
+    assert result.ops_per_sec > 0
+
+
+def test_suite_roundtrip(tmp_path):
+    suite = BenchSuite('test')
+
+    @suite.bench(setup=lambda: list(range(100)))
+    def total(values):
+        sum(values)
+
+    results = suite.run(trials=2, min_time=0.001)
+    xdir = XDir(str(tmp_path))
+    suite.save(xdir, 'results.json', results)
+    loaded = suite.load(xdir, 'results.json')
+    assert loaded['total'].times == results['total'].times
+
+
+def test_compare():
+    base = {'a': BenchResult('a', 1, [1.0, 1.0, 1.0]), 'b': BenchResult('b', 1, [1.0]), 'c': BenchResult('c', 1, [1.0])}
+    current = {'a': BenchResult('a', 1, [1.5, 1.5, 1.5]), 'b': BenchResult('b', 1, [1.02]), 'd': BenchResult('d', 1, [1.0])}
+    status = {c.name: c.status for c in compare(current, base)}
+    assert status == {'a': 'regression', 'b': 'ok', 'c': 'missing', 'd': 'new'}
@@ -0,0 +1,134 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from caixa.decorators import memoize
+from caixa.decorators.memoize import MemoCache, _MISSING
+
+
+def test_keys():
+    calls = []
+
+    @memoize
+    def foo(a, b=2, *args, c=3, **kwargs):
+        calls.append(1)
+        return a + b + c + sum(args) + sum(kwargs.values())
+
+    assert foo(1) == foo(1, 2) == foo(a=1, b=2) == foo(1, c=3) == 6
+    assert len(calls) == 1
+    assert foo(1, x=1, y=2) == foo(1, y=2, x=1) == 9
+    assert len(calls) == 2
+    assert foo(1, c=4) == 7
+    assert foo.cache_info().hits == 4
+
+
+def test_lru():
+    @memoize(maxsize=2)
+    def square(x):
+        return x * x
+
+    for x in (1, 2, 1, 3, 2):
+        square(x)
+    info = square.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.currsize) == (1, 4, 2, 2)
+    square.cache_clear()
+    assert square.cache_info().currsize == 0
+
+
+def test_ttl():
+    now = [0.0]
+    cache = MemoCache(ttl=10, clock=lambda: now[0])
+    cache.put('k', 'v')
+    assert cache.get('k') == 'v'
+    now[0] = 11.0
+    assert cache.get('k') is _MISSING
+    assert cache.info().evictions == 1
+
+
+def test_ttl_sweep():
+    now = [0.0]
+    cache = MemoCache(ttl=10, clock=lambda: now[0])
+    for i in range(5):
+        now[0] = float(i)
+        cache.put(i, i)
+    # Refreshing an entry moves it to the back, along with its new expiry time
+    now[0] = 6.0
+    cache.put(0, 'zero')
+    now[0] = 13.5
+    cache.put(5, 5)
+    assert list(cache.data) == [4, 0, 5]
+    assert cache.info().evictions == 3
+    assert cache.get(0) == 'zero'
+
+
+def test_fallback_keys():
+    # Builtins such as `max` have no signature, so their keys come from the raw call - in which
+    # a keyword call mustn't collide with a positional one whose args happen to look the same
+    pmax = memoize(max)
+    assert pmax((), default=0) == 0
+    assert pmax(((),), (('default', 0),)) == (('default', 0),)
+    assert pmax(1, 2) == pmax(1, 2) == 2
+    assert pmax.cache_info().misses == 3
+
+
+def test_locked():
+    @memoize(lock=True)
+    def ident(x):
+        return [x]
+
+    assert ident(1) is ident(x=1)
+
+
+def test_unhashable():
+    with pytest.raises(TypeError):
+        memoize(len)([1])
+
+
+def test_async_coalescing():
+    calls = []
+
+    @memoize
+    async def fetch(x):
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    async def burst():
+        return await asyncio.gather(*[fetch(1) for _ in range(10)], fetch(2))
+
+    assert asyncio.run(burst()) == [2] * 10 + [4]
+    assert calls == [1, 2]
+    assert asyncio.run(fetch(x=1)) == 2
+    assert calls == [1, 2]
+
+
+def test_async_errors():
+    @memoize
+    async def fail(x):
+        await asyncio.sleep(0.01)
+        raise KeyError(x)
+
+    async def burst():
+        return await asyncio.gather(fail(1), fail(1), return_exceptions=True)
+
+    assert [type(e) for e in asyncio.run(burst())] == [KeyError, KeyError]
+
+
+def test_thread_coalescing():
+    calls = []
+    gate = threading.Event()
+
+    @memoize(coalesce=True)
+    def slow(x):
+        calls.append(x)
+        gate.wait(1)
+        return [x]
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(slow, 1) for _ in range(8)]
+        time.sleep(0.05)
+        gate.set()
+        results = [f.result() for f in futures]
+    assert calls == [1]
+    assert all(r is results[0] for r in results)
@@ -0,0 +1,64 @@
+import os
+from caixa.decorators import memoize_to
+from caixa.decorators.persist import stable_digest
+
+
+def test_stable_digest():
+    assert stable_digest({'a': 1, 'b': [1, 2.5]}) == stable_digest({'b': [1, 2.5], 'a': 1})
+    assert stable_digest((1, 'x')) != stable_digest([1, 'x'])
+    assert stable_digest(1) != stable_digest(True)
+    assert stable_digest({1, 2, 3}) == stable_digest({3, 2, 1})
+
+
+def test_persistence(tmp_path):
+    calls = []
+
+    def square(x, y=1):
+        calls.append(x)
+        return x * x * y
+
+    cached = memoize_to(str(tmp_path), name='square')(square)
+    assert cached(3) == cached(3, y=1) == 9
+    assert calls == [3]
+    cached.cache_flush()
+    # A fresh decorator over the same directory (as in a restarted job) sees the stored result
+    restarted = memoize_to(str(tmp_path), name='square')(square)
+    assert restarted(3) == 9
+    assert calls == [3]
+    assert restarted.cache_info().hits == 1
+
+
+def test_eviction(tmp_path):
+    cached = memoize_to(str(tmp_path), name='ident', maxsize=2)(lambda x: x)
+    for x in range(4):
+        cached(x)
+    info = cached.cache_info()
+    assert (info.currsize, info.evictions) == (2, 2)
+    assert len([f for f in os.listdir(tmp_path / 'ident') if f.endswith('.pickle')]) == 2
+    (tmp_path / 'ident' / 'orphan.pickle').write_bytes(b'')
+    cached.cache_cleanup(grace=0)
+    assert 'orphan.pickle' not in os.listdir(tmp_path / 'ident')
+    cached.cache_clear()
+    assert cached.cache_info().currsize == 0
+
+
+def test_batched_flush(tmp_path, monkeypatch):
+    from caixa.decorators.persist import PersistentCache
+    saves = []
+    save_manifest = PersistentCache.save_manifest
+    monkeypatch.setattr(PersistentCache, 'save_manifest', lambda self: saves.append(1) or save_manifest(self))
+    cached = memoize_to(str(tmp_path), name='ident', flush_every=10, flush_interval=3600)(lambda x: x)
+    for x in range(25):
+        cached(x)
+    assert len(saves) == 2
+    cached.cache_flush()
+    assert len(saves) == 3
+    restarted = memoize_to(str(tmp_path), name='ident')(lambda x: None)
+    assert restarted(24) == 24
+    # Evictions happen in batches (down to 90% of the bound), each followed by a flush
+    bounded = memoize_to(str(tmp_path), name='bounded', maxsize=10, flush_every=1000)(lambda x: x)
+    del saves[:]
+    for x in range(21):
+        bounded(x)
+    info = bounded.cache_info()
+    assert (info.currsize, info.evictions, len(saves)) == (9, 12, 6)
@@ -0,0 +1,39 @@
+import asyncio
+import random
+from caixa.decorators import timed, TimingRegistry
+from caixa.decorators.registry import LogHistogram, bucket_index, bucket_bounds
+
+
+def test_buckets():
+    for value in list(range(1000)) + [random.getrandbits(random.randint(1, 63)) for _ in range(1000)]:
+        lo, hi = bucket_bounds(bucket_index(value))
+        assert lo <= value <= hi
+        assert hi - lo <= value / 16
+
+
+def test_percentiles():
+    histo = LogHistogram()
+    for value in range(1, 10001):
+        histo.record(value)
+    assert abs(histo.percentile(50) - 5000) < 5000 * 0.04
+    assert abs(histo.percentile(99) - 9900) < 9900 * 0.04
+
+
+def test_collect():
+    registry = TimingRegistry()
+
+    @timed(collect=registry)
+    def double(x):
+        return 2 * x
+
+    @timed(collect=registry, name='coro')
+    async def triple(x):
+        return 3 * x
+
+    assert [double(x) for x in range(10)] == [2 * x for x in range(10)]
+    assert asyncio.run(triple(2)) == 6
+    stats = registry['test_collect.<locals>.double']
+    assert stats.count == 10
+    assert stats.min <= stats.percentile(50) <= stats.max * 1.04
+    assert registry['coro'].count == 1
+    assert len(list(registry.describe())) == 2
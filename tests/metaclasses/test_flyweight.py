@@ -0,0 +1,94 @@
+import gc
+import time
+import pytest
+from threading import Thread
+from caixa.metaclasses import Flyweight
+from caixa.metaclasses.flyweight import REG
+
+
+class Color(metaclass=Flyweight):
+    def __init__(self, name, rank=0):
+        self.name = name
+
+
+class Token(str, metaclass=Flyweight, registry='weak'):
+    pass
+
+
+class Cell(metaclass=Flyweight, registry='lru', maxsize=2):
+    def __init__(self, x):
+        self.x = x
+
+
+def test_strong():
+    assert Color('blue') is Color('blue')
+    assert Color('blue') is not Color('red')
+    assert REG[Color][('blue',)] is Color('blue')
+    info = Color.flyweight_info()
+    assert (info.hits, info.misses, info.currsize) == (3, 2, 2)
+    assert info.hit_rate == 0.6
+    Color.flyweight_clear()
+    assert Color.flyweight_info().currsize == 0
+
+
+def test_weak():
+    token = Token('abc')
+    assert token == 'abc' and Token('abc') is token
+    assert Token.flyweight_info().currsize == 1
+    del token
+    gc.collect()
+    assert Token.flyweight_info().currsize == 0
+    with pytest.raises(TypeError):
+        class Number(int, metaclass=Flyweight, registry='weak'):
+            pass
+
+
+def test_lru():
+    a = Cell(1)
+    Cell(2)
+    assert Cell(1) is a
+    Cell(3)
+    info = Cell.flyweight_info()
+    assert (info.evictions, info.maxsize, info.currsize) == (1, 2, 2)
+    assert Cell(1) is a
+    with pytest.raises(ValueError):
+        class Bad(metaclass=Flyweight, registry='lru'):
+            pass
+    with pytest.raises(ValueError):
+        class Worse(metaclass=Flyweight, registry='sideways'):
+            pass
+
+
+def test_subclass():
+    class SubCell(Cell):
+        pass
+    assert SubCell(1) is not Cell(1)
+    assert SubCell.flyweight_info().maxsize == 2
+
+    class BigCell(Cell, maxsize=10):
+        pass
+    assert BigCell.flyweight_info().maxsize == 10
+
+    class WeakCell(Cell, registry='weak'):
+        pass
+    assert WeakCell.flyweight_info().maxsize is None
+
+    class UnlockedCell(Cell, lock=False):
+        pass
+    assert UnlockedCell.flyweight_info().maxsize == 2
+    with pytest.raises(ValueError):
+        class BigColor(Color, maxsize=10):
+            pass
+
+
+def test_threads():
+    class Slow(metaclass=Flyweight):
+        def __init__(self, x):
+            time.sleep(0.01)
+    results = []
+    threads = [Thread(target=lambda: results.append(Slow(1))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 8 and all(r is results[0] for r in results)
@@ -0,0 +1,103 @@
+import pytest
+from caixa.options import OptionsSchema, resolve_options, is_immutable
+
+DEFAULTS = {'allow-snorkeling': True, 'rescue-after': 10, 'tags': ['a'], 'span': (1, 2)}
+
+
+def test_resolve():
+    schema = OptionsSchema(DEFAULTS)
+    assert schema.mutable == {'tags'}
+    options = schema.resolve({'rescue-after': 5})
+    assert dict(options) == {**DEFAULTS, 'rescue-after': 5}
+    assert options == resolve_options(DEFAULTS, {'rescue-after': 5})
+    assert resolve_options(schema, {'rescue-after': 5}) == options
+    assert len(options) == 4 and 'tags' in options and 'nope' not in options
+    with pytest.raises(TypeError):
+        options['rescue-after'] = 1
+    # Mutable values are copied, both from the defaults and the updates
+    options['tags'].append('b')
+    assert schema.resolve()['tags'] == ['a'] and DEFAULTS['tags'] == ['a']
+    tags = ['x']
+    assert schema.resolve({'tags': tags})['tags'] is not tags
+    # Immutable ones are shared
+    span = (3, 4)
+    assert schema.resolve({'span': span})['span'] is span
+    plain = options.to_dict()
+    assert type(plain) is dict and plain == dict(options)
+
+
+def test_shared_defaults():
+    schema = OptionsSchema({'a': 1, 'b': 'x'})
+    assert schema.resolve() is schema.resolve({})
+    assert schema.resolve(None) == {'a': 1, 'b': 'x'}
+
+
+def test_invalid():
+    schema = OptionsSchema(DEFAULTS)
+    for updates in ({'nope': 1}, {'': 1}, {1: 1}):
+        with pytest.raises(ValueError) as expected:
+            resolve_options(DEFAULTS, updates)
+        with pytest.raises(ValueError) as actual:
+            schema.resolve(updates)
+        assert str(actual.value) == str(expected.value)
+    with pytest.raises(ValueError):
+        OptionsSchema({'': 1})
+
+
+def test_is_immutable():
+    assert all(map(is_immutable, [None, 1, 1.5, 'x', b'x', (1, ('a',)), frozenset([1])]))
+    assert not any(map(is_immutable, [[], {}, set(), (1, [])]))
+
+
+def test_freeze():
+    schema = OptionsSchema(DEFAULTS)
+    frozen = schema.freeze({'rescue-after': 5})
+    assert frozen is schema.freeze({'rescue-after': 5, 'tags': ('a',)})
+    assert frozen is schema.resolve({'rescue-after': 5}).freeze()
+    assert frozen is not schema.freeze()
+    assert schema.freeze() is schema.freeze({'rescue-after': 10})
+    assert frozen['tags'] == ('a',) and frozen['rescue-after'] == 5
+    assert hash(frozen) == hash(schema.freeze({'rescue-after': 5}))
+    assert frozen == {**DEFAULTS, 'rescue-after': 5, 'tags': ('a',)}
+    assert frozen != schema.freeze()
+    assert {frozen: 1}[schema.freeze({'rescue-after': 5})] == 1
+    assert schema.freeze({'tags': ['x', ['y']]})['tags'] == ('x', ('y',))
+    with pytest.raises(AttributeError):
+        frozen._hash = 0
+    with pytest.raises(TypeError):
+        schema.freeze({'tags': [{}]})
+    with pytest.raises(ValueError):
+        schema.freeze({'nope': 1})
+
+
+def test_freeze_types():
+    schema = OptionsSchema({'flag': None, 'span': ()})
+    values = (0, False, 0.0)
+    frozen = [schema.freeze({'flag': v}) for v in values]
+    assert [type(f['flag']) for f in frozen] == [int, bool, float]
+    assert len(set(map(id, frozen))) == 3
+    assert frozen[0] != frozen[1] and frozen[1] != frozen[2]
+    assert schema.freeze({'flag': 0}) is frozen[0]
+    nested = [schema.freeze({'span': (v,)}) for v in values]
+    assert [type(f['span'][0]) for f in nested] == [int, bool, float]
+    # Likewise across schemas, where equal instances must still hash alike
+    (zero, false) = (OptionsSchema({'x': 0}).freeze(), OptionsSchema({'x': False}).freeze())
+    assert zero != false and zero == OptionsSchema({'x': 0}).freeze()
+    assert hash(zero) == hash(OptionsSchema({'x': 0}).freeze())
+    assert zero != OptionsSchema({'y': 0}).freeze()
+
+
+def test_memoize_frozen():
+    from caixa.decorators import memoize
+    schema = OptionsSchema({'scale': 1})
+    calls = []
+
+    @memoize
+    def transform(x, options):
+        calls.append(x)
+        return x * options['scale']
+
+    assert transform(2, schema.freeze({'scale': 3})) == 6
+    assert transform(2, schema.freeze({'scale': 3})) == 6
+    assert transform(2, schema.freeze()) == 2
+    assert calls == [2, 2]
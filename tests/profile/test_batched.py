@@ -0,0 +1,45 @@
+import re
+import random
+from caixa.profile import TaggedProfiler, BatchedTaggedProfiler, columnar
+from caixa.text.util import is_blank, is_integer_like
+
+TAGMAP = {'blank': is_blank, 'integer': is_integer_like, 'empty': lambda s: s == ''}
+VALUES = ['foo', '', '  ', '123', '-4', 'x y', ' 5 ']
+
+
+def make_records(n, ragged=False):
+    rng = random.Random(n)
+    keys = ['a', 'b', 'c']
+    recs = []
+    for _ in range(n):
+        chosen = rng.sample(keys, rng.randint(0, 3)) if ragged else keys
+        recs.append({k: rng.choice(VALUES) for k in chosen})
+    return recs
+
+
+def test_equivalence():
+    for ragged in (False, True):
+        recs = make_records(500, ragged)
+        for deep in (False, True):
+            expected = TaggedProfiler(TAGMAP).profile(recs, deep=deep)
+            for chunksize in (1, 7, 10000):
+                actual = BatchedTaggedProfiler(TAGMAP, chunksize=chunksize).profile(iter(recs), deep=deep)
+                assert actual == expected
+
+
+def test_pattern_and_columnar():
+    recs = make_records(100)
+
+    @columnar
+    def digits(column):
+        return [s.isdigit() for s in column]
+
+    batched = BatchedTaggedProfiler({'digits': digits, 'space': re.compile(r'\s')}).profile(recs)
+    plain = TaggedProfiler({'digits': str.isdigit, 'space': lambda s: re.search(r'\s', s)}).profile(recs)
+    assert batched == plain
+
+
+def test_empty():
+    summary = BatchedTaggedProfiler(TAGMAP).profile([])
+    assert summary.total == 0
+    assert summary.histo == {'blank': 0, 'integer': 0, 'empty': 0}
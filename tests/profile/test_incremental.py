@@ -0,0 +1,46 @@
+import pytest
+from caixa.profile import TaggedProfiler, BatchedTaggedProfiler, IncrementalProfiler, WindowStats
+
+VALUES = ['foo', '', '  ', '123', '-4', 'x y']
+RECORDS = [{'a': VALUES[i % 6], 'b': VALUES[(i * 5) % 6]} for i in range(200)]
+TAGMAP = {'empty': lambda s: s == '', 'digits': str.isdigit}
+
+
+def test_matches_profile():
+    expected = TaggedProfiler(TAGMAP).profile(RECORDS, deep=True)
+    for cls in (TaggedProfiler, BatchedTaggedProfiler):
+        profiler = IncrementalProfiler(cls(TAGMAP), deep=True)
+        profiler.feed_many(RECORDS[:70])
+        for r in RECORDS[70:]:
+            profiler.feed(r)
+        assert profiler.snapshot(index=True, deep=True) == expected
+        brief = profiler.snapshot()
+        assert brief.histo == expected.histo and brief.index is None and brief.cache is None
+
+
+def test_count_window():
+    profiler = IncrementalProfiler(TaggedProfiler(TAGMAP), window=12)
+    profiler.feed_many(RECORDS)
+    stats = profiler.window()
+    assert stats.size == 12
+    assert stats == _expected(RECORDS[-12:])
+    with pytest.raises(RuntimeError):
+        profiler.recent()
+
+
+def test_time_window():
+    now = [0.0]
+    profiler = IncrementalProfiler(TaggedProfiler(TAGMAP), period=10, buckets=10, clock=lambda: now[0])
+    for (i, r) in enumerate(RECORDS[:100]):
+        now[0] = i * 0.5
+        profiler.feed(r)
+    # At t = 49.5 the ring covers the slices starting at t = 40 and up, i.e. the last 20 records
+    assert profiler.recent() == _expected(RECORDS[80:100])
+    now[0] = 1000
+    assert profiler.recent().size == 0
+
+
+def _expected(recs):
+    # The window stats should be just what profiling the records in the window from scratch gives
+    summary = TaggedProfiler(TAGMAP).profile(recs)
+    return WindowStats(len(recs), summary.total, summary.histo)
@@ -0,0 +1,41 @@
+from functools import partial
+from caixa.profile import TaggedProfiler, BatchedTaggedProfiler, PartialSummary
+from caixa.text.util import is_blank, is_integer_like
+from caixa.xdir import XDir
+
+VALUES = ['foo', '', '  ', '123', '-4', 'x y', ' 5 ']
+RECORDS = [{'a': VALUES[i % 7], 'b': VALUES[(i * 3) % 7]} for i in range(300)]
+SHARDS = [RECORDS[:50], RECORDS[50:50], RECORDS[50:170], RECORDS[170:]]
+
+
+def is_empty(s):
+    return s == ''
+
+TAGMAP = {'blank': is_blank, 'integer': is_integer_like, 'empty': is_empty}
+
+
+def test_merge_associative():
+    profiler = TaggedProfiler(TAGMAP)
+    a, b, c = (profiler.profile_partial(shard, deep=True) for shard in (SHARDS[0], SHARDS[2], SHARDS[3]))
+    left = a.merge(b).merge(c)
+    right = a.merge(b.merge(c))
+    assert left == right
+    assert left.size == len(RECORDS)
+    assert left.summary() == profiler.profile(RECORDS, deep=True)
+    assert PartialSummary.empty(TAGMAP).merge(a) == a
+
+
+def test_parallel():
+    expected = TaggedProfiler(TAGMAP).profile(RECORDS)
+    for executor in ('thread', 'process'):
+        assert TaggedProfiler(TAGMAP).profile_parallel(SHARDS, workers=2, executor=executor) == expected
+        assert BatchedTaggedProfiler(TAGMAP).profile_parallel(SHARDS, workers=2, executor=executor) == expected
+
+
+def test_parallel_blocks(tmpdir):
+    xdir = XDir(str(tmpdir), vivify=True)
+    for (i, shard) in enumerate(SHARDS):
+        xdir.save_block('recs', i, shard)
+    shards = [partial(xdir.load_block, 'recs', i) for i in range(len(SHARDS))]
+    summary = TaggedProfiler(TAGMAP).profile_parallel(shards, workers=2, deep=True)
+    assert summary == TaggedProfiler(TAGMAP).profile(RECORDS, deep=True)
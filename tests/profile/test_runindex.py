@@ -0,0 +1,76 @@
+import pickle
+import random
+import struct
+from caixa.profile import TaggedProfiler, TaggedProfilerSummary, RunIndex, RecordSample
+from caixa.profile.index import RETAIN
+from caixa.xdir import XDir
+
+
+def random_offsets(rng, n=500):
+    return sorted(i for i in range(n) if rng.random() < 0.3 or (i // 50) % 3 == 0)
+
+
+def test_runs():
+    index = RunIndex([0, 1, 2, 2, 5, 6, 9])
+    assert list(index.runs()) == [(0, 3), (5, 2), (9, 1)]
+    assert len(index) == 6
+    assert 6 in index and 7 not in index and 10 not in index
+    index.add_flags(bytearray([0, 1, 1, 0, 1]), base=10)
+    assert index.tolist() == [0, 1, 2, 5, 6, 9, 11, 12, 14]
+
+
+def test_set_operations():
+    rng = random.Random(42)
+    for _ in range(20):
+        a, b = random_offsets(rng), random_offsets(rng)
+        x, y = RunIndex(a), RunIndex(b)
+        assert (x & y).tolist() == sorted(set(a) & set(b))
+        assert (x | y).tolist() == sorted(set(a) | set(b))
+        assert (x - y).tolist() == sorted(set(a) - set(b))
+        assert (x ^ y).tolist() == sorted(set(a) ^ set(b))
+
+
+def test_serialization():
+    index = RunIndex(random_offsets(random.Random(1)))
+    assert RunIndex.from_bytes(index.to_bytes()) == index
+    assert pickle.loads(pickle.dumps(index)) == index
+    assert len(pickle.loads(pickle.dumps(index))) == len(index)
+    # Data in the original format, with 32-bit offsets, can still be read
+    old = struct.pack('<4sI', b'RIDX', 2) + struct.pack('<2I', 3, 10) + struct.pack('<2I', 2, 1)
+    assert RunIndex.from_bytes(old).tolist() == [3, 4, 10]
+
+
+def test_large_offsets():
+    big = 2 ** 32 + 5
+    index = RunIndex([1, big, big + 1])
+    assert index.tolist() == [1, big, big + 1]
+    assert RunIndex.from_bytes(index.to_bytes()) == index
+
+
+def test_record_sample():
+    sample = RecordSample(limit=10)
+    for i in range(100):
+        sample.offer(i, i)
+    assert list(sample.cache()) == list(range(10))
+    sample = RecordSample(limit=10, reservoir=True, seed=7)
+    for i in range(100):
+        sample.offer(i, i)
+    cache = sample.cache()
+    assert len(cache) == 10 and list(cache) == sorted(cache)
+    assert cache != {i: i for i in range(10)}
+
+
+def test_summary(tmpdir):
+    recs = [{'a': str(i), 'b': 'x' if i % 3 else ''} for i in range(100)]
+    profiler = TaggedProfiler({'empty': lambda s: s == '', 'even': lambda s: s.isdigit() and int(s) % 2 == 0})
+    summary = profiler.profile(recs, deep=True, retain=5)
+    assert summary.total == 67
+    assert list(summary.cache) == [0, 2, 3, 4, 6]
+    many = [{'a': ''}] * (RETAIN + 10)
+    assert len(profiler.profile(many, deep=True).cache) == RETAIN
+    assert len(profiler.profile(many, deep=True, retain=None).cache) == RETAIN + 10
+    both = summary.index['empty'] & summary.index['even']
+    assert both.tolist() == list(range(0, 100, 6))
+    xdir = XDir(str(tmpdir), vivify=True)
+    summary.save(xdir, 'summary.pickle')
+    assert TaggedProfilerSummary.load(xdir, 'summary.pickle') == summary
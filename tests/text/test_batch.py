@@ -0,0 +1,46 @@
+import pytest
+from caixa.text import batch
+from caixa.text.util import (
+    basic_shape, is_blank, is_empty, is_alpha, is_integer_like, is_alphanumeric, is_delim,
+    has_ltws, has_upper, has_lower
+)
+
+STRINGS = ['foo', 'foo-bar', 'foo--bar', '-foo', 'foo bar', ' foo', 'foo ', '  ', '', '123', '-42', 'ABC', 'aB', 'é', '12\n', '1\n\t', 'abc\n', '²']
+
+PAIRS = [
+    (batch.is_blank_many, is_blank), (batch.is_empty_many, is_empty), (batch.is_alpha_many, is_alpha),
+    (batch.is_integer_like_many, is_integer_like), (batch.is_alphanumeric_many, is_alphanumeric),
+    (batch.has_ltws_many, has_ltws), (batch.has_upper_many, has_upper), (batch.has_lower_many, has_lower),
+]
+
+
+def test_agreement():
+    for (many, single) in PAIRS:
+        assert list(many(STRINGS)) == [single(s) for s in STRINGS]
+        assert list(many(iter(STRINGS))) == [single(s) for s in STRINGS]
+    assert list(batch.is_delim_many(STRINGS, '-')) == [is_delim(s, '-') for s in STRINGS]
+
+
+def test_shapes():
+    values = STRINGS + [None, 42]
+    codes = batch.basic_shape_many(values)
+    assert batch.shape_names(codes) == [basic_shape(s) for s in values]
+    assert batch.shape_names(batch.basic_shape_many(STRINGS)) == [basic_shape(s) for s in STRINGS]
+
+
+def test_numpy():
+    numpy = pytest.importorskip('numpy')
+    for dtype in (str, object):
+        array = numpy.array(STRINGS, dtype=dtype)
+        for (many, single) in PAIRS:
+            result = many(array)
+            assert result.dtype == bool
+            assert result.tolist() == [single(s) for s in STRINGS]
+        assert batch.shape_names(batch.basic_shape_many(array)) == [basic_shape(s) for s in STRINGS]
+
+
+def test_type_errors():
+    with pytest.raises(TypeError):
+        batch.is_empty_many(['a', None])
+    with pytest.raises(TypeError):
+        batch.is_integer_like_many(['1', 2])
@@ -0,0 +1,29 @@
+import pytest
+from caixa.text.charclass import charclass_pattern, register_charclass
+from caixa.text.util import has_non, is_alpha, is_blank, is_alphanumeric, has_upper
+
+STRINGS = ['', 'abc', 'abc1', 'ABC', 'a b', '  ', 'é', 'αβγ', 'αβ1', 'ab ', '日本', '日本-', 'x\U0001f600', '\xaa\xb5']
+FUNCTIONS = [str.isalpha, str.isdigit, str.isspace, str.isupper, str.isprintable, is_alpha, is_blank, is_alphanumeric, has_upper]
+
+
+def test_agreement():
+    for function in FUNCTIONS:
+        assert charclass_pattern(function) is not None
+        fast, slow = has_non(function), has_non(function, compiled=False)
+        for s in STRINGS:
+            assert fast(s) == slow(s), (function, s)
+
+
+def test_unregistered():
+    def is_vowel(c):
+        return c in 'aeiou'
+    assert charclass_pattern(is_vowel) is None
+    assert has_non(is_vowel)('aei') is False
+    register_charclass(is_vowel)
+    assert charclass_pattern(is_vowel) is not None
+    assert [has_non(is_vowel)(s) for s in ('aei', 'aeb', 'aé', '')] == [False, True, True, False]
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        has_non(str.isalpha)(42)
@@ -0,0 +1,57 @@
+import mmap
+import random
+import pytest
+from caixa.text import OccurrenceIndex, LineIndex
+from caixa.text.util import find_occurrence
+
+
+def test_occurrences():
+    rng = random.Random(3)
+    text = "".join(rng.choice("ab") for _ in range(500))
+    for sub in ("a", "ab", "aa", "aba"):
+        index = OccurrenceIndex.build(text, sub)
+        for position in range(len(index) + 2):
+            assert index.find(position) == find_occurrence(text, sub, position)
+
+
+def test_incremental():
+    rng = random.Random(4)
+    text = "".join(rng.choice("ab\n") for _ in range(1000))
+    for sub in ("\n", "ab", "aa", "a\nb"):
+        whole = OccurrenceIndex.build(text, sub)
+        index = OccurrenceIndex(sub)
+        end = 0
+        while end < len(text):
+            end = min(len(text), end + rng.randint(0, 7))
+            index.update(text[:end])
+        assert index.offsets == whole.offsets
+
+
+def test_lines(tmpdir):
+    lines = [f"line {i}" * (i % 5) for i in range(200)]
+    text = "\n".join(lines)
+    index = LineIndex.build(text)
+    assert index.count == len(lines)
+    for n in (0, 1, 57, 199):
+        assert index.line(text, n) == lines[n]
+        start, end = index.span(n)
+        assert index.line_of(start) == n and index.line_of(end) == n
+    with pytest.raises(IndexError):
+        index.span(200)
+    path = str(tmpdir.join('lines.txt'))
+    with open(path, 'wb') as f:
+        f.write(text.encode())
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        index = LineIndex.build(mm)
+        assert index.count == len(lines)
+        assert index.line(mm, 123) == lines[123].encode()
+
+
+def test_growing():
+    index = LineIndex()
+    text = "foo\nba"
+    index.update(text)
+    assert index.count == 2 and index.line(text, 1) == "ba"
+    text += "r\n\nbaz"
+    index.update(text)
+    assert [index.line(text, n) for n in range(index.count)] == ["foo", "bar", "", "baz"]
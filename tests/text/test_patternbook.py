@@ -0,0 +1,69 @@
+import re
+from caixa.text.patternbook import PatternBook
+from caixa.text.util import PAT, PATBOOK, basic_shape, has_ltws, is_alpha
+
+STRINGS = [
+    'foo', 'foo-bar', 'foo--bar', '-foo', 'foo bar', ' foo', 'foo ', '  ', '', '123', '-42', 'abc1', 'é',
+    '1\n\t', 'é\n \t', 'a\n', 'a\nb', 'a\tb', 'a-b\n', '\tfoo\n', 'foo\n-bar',
+]
+
+
+def test_classify():
+    for s in STRINGS:
+        expected = [name for (name, pattern) in PAT.items() if pattern.match(s)]
+        assert PATBOOK.classify(s) == expected
+    assert PATBOOK.classify_many(STRINGS) == [PATBOOK.classify(s) for s in STRINGS]
+
+
+def test_mixed_patterns():
+    book = PatternBook({
+        'upper': re.compile('[a-z]+$', re.IGNORECASE),
+        'double': re.compile(r'(\w)\1'),
+        'named': re.compile(r'(?P<x>\d)'),
+        'grouped': re.compile(r'(a|b)(c)'),
+        'lower': re.compile('[a-z]+$'),
+    })
+    assert book.classify('ABC') == ['upper']
+    assert book.classify('aac') == ['upper', 'double', 'lower']
+    assert book.classify('bc') == ['upper', 'grouped', 'lower']
+    assert book.classify('7') == ['named']
+    assert book.first('bc') == 'upper'
+    assert book.first('??') is None
+
+
+def test_first():
+    book = PatternBook({'digits': re.compile(r'\d+$'), 'word': re.compile(r'(\w)+$'), 'any': re.compile('.')})
+    assert [book.first(s) for s in ('12', 'ab', '-', '')] == ['digits', 'word', 'any', None]
+
+
+def _reference_shape(string):
+    # basic_shape as it was before the SHAPEBOOK, one check at a time
+    if len(string) == 0:
+        return 'empty'
+    if re.match(r'^\s+$', string):
+        return 'blank'
+    if re.match(r'^\s+', string) or re.match(r'^.*\s+$', string):
+        return 'malformed'
+    if ' ' in string:
+        return 'multiword'
+    if re.match(r'^([^\s\-]+\-)+([^\s\-]+)$', string):
+        return 'dashy'
+    if '-' in string:
+        return 'malformed'
+    return 'plain'
+
+
+def test_shapes():
+    shapes = [basic_shape(s) for s in STRINGS]
+    assert shapes == [
+        'plain', 'dashy', 'malformed', 'malformed', 'multiword', 'malformed', 'malformed',
+        'blank', 'empty', 'plain', 'malformed', 'plain', 'plain',
+        'malformed', 'malformed', 'malformed', 'plain', 'plain', 'malformed', 'malformed', 'malformed'
+    ]
+    assert shapes == [_reference_shape(s) for s in STRINGS]
+    assert [has_ltws(s) for s in (' a', 'a ', 'a', '  ', '', '1\n\t', 'a\nb')] == [True, True, False, True, False, True, False]
+
+
+def test_is_alpha():
+    for s in ('abcé', 'ab1', '', 'abc\n', '²', 'Ⅻ', 'ab_'):
+        assert is_alpha(s) == s.isalpha()
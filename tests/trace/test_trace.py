@@ -0,0 +1,92 @@
+import json
+import time
+import asyncio
+from caixa.trace import Tracer, TRACER
+from caixa.decorators import memoize
+from caixa.xdir import XDir
+
+
+def test_nesting():
+    tracer = Tracer(enabled=True)
+
+    @tracer.traced('inner')
+    def inner():
+        time.sleep(0.002)
+
+    with tracer.span('outer', size=3):
+        for _ in range(3):
+            inner()
+    spans = {s.name: s for s in tracer.spans}
+    assert len(tracer.spans) == 4
+    assert spans['inner'].parent is spans['outer']
+    outer = spans['outer']
+    assert outer.child_ns <= outer.duration
+    assert outer.self_ns < outer.child_ns
+    profile = {e.name: e for e in tracer.flat_profile()}
+    assert profile['inner'].count == 3
+    assert profile['outer'].total_ns == outer.duration
+
+
+def test_disabled_and_sampled():
+    tracer = Tracer()
+    with tracer.span('nothing') as span:
+        assert span is None
+    assert not tracer.spans
+    tracer.enable(sample=0.5)
+    for _ in range(200):
+        with tracer.span('root'):
+            with tracer.span('child'):
+                pass
+    names = [s.name for s in tracer.spans]
+    assert 0 < names.count('root') < 200
+    assert names.count('root') == names.count('child')
+
+
+def test_tasks():
+    tracer = Tracer(enabled=True)
+
+    @tracer.traced()
+    async def work(n):
+        with tracer.span(f"step-{n}"):
+            await asyncio.sleep(0.001)
+
+    async def main():
+        await asyncio.gather(*(work(n) for n in range(3)))
+
+    asyncio.run(main())
+    for span in tracer.spans:
+        if span.name.startswith('step-'):
+            assert span.parent.name.endswith('work')
+
+
+def test_chrome_export(tmpdir):
+    tracer = Tracer(enabled=True)
+    with tracer.span('a', path='/tmp/x'):
+        pass
+    path = str(tmpdir.join('trace.json'))
+    tracer.export_chrome(path)
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    assert events[0]['name'] == 'a' and events[0]['ph'] == 'X'
+    assert events[0]['args'] == {'path': '/tmp/x'}
+
+
+def test_hooks(tmpdir):
+    @memoize
+    def square(x):
+        return x * x
+
+    xdir = XDir(str(tmpdir), vivify=True)
+    TRACER.clear()
+    TRACER.enable()
+    try:
+        square(2)
+        square(2)
+        xdir.save_pickle('foo.pickle', [1, 2])
+        xdir.load_pickle('foo.pickle')
+    finally:
+        TRACER.disable()
+    names = [s.name for s in TRACER.spans]
+    assert names.count('memoize:test_hooks.<locals>.square') == 1
+    assert 'xdir.save_pickle' in names and 'xdir.load_pickle' in names
+    TRACER.clear()
@@ -0,0 +1,64 @@
+import os
+import zlib
+import hashlib
+import pytest
+from caixa.util.filediff import (
+    file_checksum, pairwise_crc32, compare_files, compare_files_crc32, compare_many, checksum_many, compare_trees
+)
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_checksums(tmpdir):
+    data = os.urandom(10000)
+    path = write(str(tmpdir.join('a.bin')), data)
+    empty = write(str(tmpdir.join('empty.bin')), b'')
+    for use_mmap in (False, True):
+        assert file_checksum(path, 'crc32', chunksize=999, use_mmap=use_mmap) == zlib.crc32(data)
+        assert file_checksum(path, 'adler32', chunksize=999, use_mmap=use_mmap) == zlib.adler32(data)
+        assert file_checksum(path, 'blake2b', chunksize=999, use_mmap=use_mmap) == hashlib.blake2b(data).hexdigest()
+        assert file_checksum(empty, 'adler32', use_mmap=use_mmap) == zlib.adler32(b'')
+    assert pairwise_crc32(path, empty) == (zlib.crc32(data), 0)
+    with pytest.raises(ValueError):
+        file_checksum(path, 'crc64')
+
+
+def test_compare(tmpdir):
+    data = os.urandom(5000)
+    a = write(str(tmpdir.join('a')), data)
+    b = write(str(tmpdir.join('b')), data)
+    c = write(str(tmpdir.join('c')), data[:-1] + bytes([data[-1] ^ 1]))
+    d = write(str(tmpdir.join('d')), data[:100])
+    for mode in ('bytes', 'hash'):
+        for chunksize in (7, 1000, 5000, 1 << 20):
+            assert compare_files(a, b, mode=mode, chunksize=chunksize)
+            assert not compare_files(a, c, mode=mode, chunksize=chunksize)
+            assert not compare_files(a, d, mode=mode, chunksize=chunksize)
+    assert compare_files_crc32(a, b) and not compare_files_crc32(a, c)
+    assert list(compare_many([(a, b), (a, c), (a, d), (b, b)], workers=2)) == [True, False, False, True]
+    assert list(checksum_many([a, c], 'sha256', workers=2)) == [file_checksum(a, 'sha256'), file_checksum(c, 'sha256')]
+
+
+def test_trees(tmpdir):
+    left, right = str(tmpdir.join('left')), str(tmpdir.join('right'))
+    for root in (left, right):
+        write(os.path.join(root, 'same.txt'), b'hello')
+        write(os.path.join(root, 'sub', 'deep.txt'), b'deep')
+    write(os.path.join(left, 'changed.txt'), b'abc')
+    write(os.path.join(right, 'changed.txt'), b'abd')
+    write(os.path.join(left, 'resized.txt'), b'abc')
+    write(os.path.join(right, 'resized.txt'), b'abcd')
+    write(os.path.join(left, 'sub', 'left.txt'), b'')
+    write(os.path.join(right, 'right.txt'), b'')
+    diff = compare_trees(left, right, workers=2)
+    assert diff.same == ['same.txt', os.path.join('sub', 'deep.txt')]
+    assert diff.different == ['changed.txt', 'resized.txt']
+    assert diff.left_only == [os.path.join('sub', 'left.txt')]
+    assert diff.right_only == ['right.txt']
+    assert not diff.identical
+    assert compare_trees(left, left).identical
@@ -0,0 +1,98 @@
+import os
+import pytest
+from multiprocessing import Pool
+from caixa.xdir import XDir
+from caixa.xdir.atomic import WriteBatch, atomic_path
+
+
+def test_atomic_save(tmp_path):
+    xdir = XDir(str(tmp_path))
+    xdir.save_json('a.json', {'x': 1})
+    with pytest.raises(RuntimeError):
+        with xdir.atomic('b.json') as path:
+            with open(path, 'w') as f:
+                f.write('{')
+            raise RuntimeError('crash')
+    assert os.listdir(tmp_path) == ['a.json']
+
+
+def test_write_batch(tmp_path):
+    xdir = XDir(str(tmp_path))
+    with xdir.write_batch() as batch:
+        for i in range(3):
+            xdir.save_block('foo', i, i)
+        assert len(batch) == 3
+        assert xdir.max_offset('foo') is None
+    assert list(xdir.read_blocks('foo')) == [0, 1, 2]
+    with pytest.raises(ValueError):
+        with xdir.write_batch():
+            xdir.save_block('foo', 3, 3)
+            raise ValueError('abort')
+    assert sorted(os.listdir(tmp_path)) == [f"foo-00000{i}.pickle" for i in range(3)]
+
+
+def _produce(path: str) -> list[int]:
+    xdir = XDir(path, fsync=False)
+    positions = []
+    for _ in range(5):
+        position = xdir.claim_position('foo')
+        xdir.save_block('foo', position, os.getpid())
+        positions.append(position)
+    return positions
+
+
+def test_claims(tmp_path):
+    with Pool(3) as pool:
+        results = pool.map(_produce, [str(tmp_path)] * 3)
+    positions = sorted(p for r in results for p in r)
+    assert positions == list(range(15))
+    xdir = XDir(str(tmp_path))
+    assert xdir.next_position('foo') == 15
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.claim')]
+
+
+def test_failed_commit(tmp_path):
+    batch = WriteBatch(fsync=False)
+    for name in ('a', 'b', 'c'):
+        with atomic_path(str(tmp_path / name), fsync=False, batch=batch) as path:
+            with open(path, 'w') as f:
+                f.write(name)
+    # Make the second rename fail, by pointing it into a directory which doesn't exist
+    temppath, _ = batch._pending[1]
+    batch._pending[1] = (temppath, str(tmp_path / 'missing' / 'b'))
+    with pytest.raises(FileNotFoundError):
+        batch.commit()
+    # The first file made it into place; the temp files for the rest were removed rather than leaked
+    assert os.listdir(tmp_path) == ['a']
+    assert len(batch) == 0
+
+
+def test_stale_claims(tmp_path):
+    dead = XDir(str(tmp_path))
+    assert dead.claim_position('foo') == 0
+    dead.save_block('foo', 0, 'x')
+    assert dead.claim_position('foo') == 1
+    assert dead.claim_position('foo') == 2
+    marker = tmp_path / '.foo-000002.pickle.claim'
+    old = os.stat(marker).st_mtime - 7200
+    os.utime(marker, (old, old))
+    xdir = XDir(str(tmp_path))
+    assert xdir.sweep_claims('foo', stale_after=3600) == [2]
+    assert xdir.claim_position('foo') == 2
+    # Our own claims are never swept, however old
+    marker = tmp_path / '.foo-000002.pickle.claim'
+    os.utime(marker, (old, old))
+    assert xdir.sweep_claims('foo', stale_after=3600) == []
+    os.utime(tmp_path / '.foo-000001.pickle.claim', (old, old))
+    assert xdir.claim_position('foo', stale_after=3600) == 3
+    assert not (tmp_path / '.foo-000001.pickle.claim').exists()
+
+
+def test_segment_claims(tmp_path):
+    xdir = XDir(str(tmp_path))
+    seg = xdir.segment('foo', vivify=True)
+    assert seg.append_block('x') == 0
+    with pytest.raises(ValueError):
+        xdir.claim_position('foo')
+    assert xdir.claim_position('foo', 'json') == 0
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.pickle.claim')]
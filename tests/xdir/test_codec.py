@@ -0,0 +1,42 @@
+import pickle
+import pytest
+from caixa.xdir import XDir, Codec
+from caixa.xdir.codec import encode, decode
+
+SPECS = ['pickle', 'pickle5', 'marshal', 'pickle+zlib', 'pickle5+lzma:1', 'marshal+bz2:9']
+
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_roundtrip(spec):
+    obj = {'a': [1, 2.5, 'x'], 'b': (None, True), 'c': b'\x00' * 1000}
+    codec = Codec.parse(spec)
+    assert str(codec) == spec
+    assert decode(encode(obj, codec)) == obj
+
+
+def test_out_of_band():
+    payload = bytearray(range(256)) * 100
+    data = Codec.parse('pickle5').encode([payload, 'tail'])
+    assert decode(data) == [payload, 'tail']
+
+
+def test_legacy():
+    assert decode(pickle.dumps([1, 2, 3])) == [1, 2, 3]
+    with pytest.raises(ValueError):
+        Codec.parse('json')
+
+
+def test_xdir_codecs(tmp_path):
+    xdir = XDir(str(tmp_path), codec='pickle+zlib')
+    xdir.set_codec('marshal', label='raw')
+    xdir.save_block('foo', 0, {'x': 1})
+    xdir.save_block('raw', 0, [1, 2])
+    assert (tmp_path / 'foo-000000.pickle').read_bytes()[:4] == Codec.parse('pickle+zlib').header
+    assert (tmp_path / 'raw-000000.pickle').read_bytes()[:4] == Codec.parse('marshal').header
+    # Readers need no configuration
+    plain = XDir(str(tmp_path))
+    assert plain.load_block('foo', 0) == {'x': 1}
+    assert plain.load_block('raw', 0) == [1, 2]
+    seg = plain.segment('big', vivify=True)
+    seg.save_block(0, bytearray(b'abc') * 1000, 'pickle5')
+    assert plain.load_block('big', 0) == bytearray(b'abc') * 1000
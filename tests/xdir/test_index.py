@@ -0,0 +1,49 @@
+from caixa.xdir import XDir
+
+
+def test_find_items(tmp_path):
+    xdir = XDir(str(tmp_path))
+    assert xdir.next_position('foo') == 0
+    for i in (3, 0, 1):
+        xdir.save_block('foo', i, i)
+    xdir.save_block('foo-bar', 7, 'x')
+    (tmp_path / 'foo-000005.pickle.bak').write_bytes(b'')
+    assert [(a.offset, a.subpath) for a in xdir.find_items('foo', 'pickle')] == [
+        (0, 'foo-000000.pickle'), (1, 'foo-000001.pickle'), (3, 'foo-000003.pickle')]
+    assert xdir.max_offset('foo') == 3
+    assert xdir.next_position('foo-bar') == 8
+    assert list(xdir.read_blocks('foo')) == [0, 1, 3]
+
+
+def test_external_changes(tmp_path):
+    xdir = XDir(str(tmp_path))
+    xdir.save_block('foo', 0, 'a')
+    assert xdir.max_offset('foo') == 0
+    # A file created behind our back bumps the directory mtime, forcing a rescan
+    other = XDir(str(tmp_path))
+    other.save_block('foo', 4, 'e')
+    assert xdir.max_offset('foo') == 4
+
+
+def test_items_copy(tmp_path):
+    xdir = XDir(str(tmp_path))
+    xdir.save_block('foo', 0, 'a')
+    items = xdir.item_index.items('foo', 'pickle')
+    items.append((9, 'foo-000009.pickle'))
+    # Neither the caller's changes nor later saves leak between the index and the returned list
+    xdir.save_block('foo', 1, 'b')
+    assert items == [(0, 'foo-000000.pickle'), (9, 'foo-000009.pickle')]
+    assert xdir.max_offset('foo') == 1
+    assert [a.offset for a in xdir.find_items('foo', 'pickle')] == [0, 1]
+
+
+def test_dotted_ext(tmp_path):
+    xdir = XDir(str(tmp_path))
+    for i in (1, 4):
+        (tmp_path / xdir.item_path('foo', 'tar.gz', i)).write_bytes(b'')
+    (tmp_path / 'foo-000007.tar').write_bytes(b'')
+    assert [(a.offset, a.subpath) for a in xdir.find_items('foo', 'tar.gz')] == [
+        (1, 'foo-000001.tar.gz'), (4, 'foo-000004.tar.gz')]
+    assert xdir.max_offset('foo', 'tar.gz') == 4
+    assert xdir.max_offset('foo', 'tar') == 7
+    assert xdir.next_position('foo', 'tar.gz') == 5
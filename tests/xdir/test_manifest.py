@@ -0,0 +1,89 @@
+import os
+import caixa.xdir.manifest as manifest_module
+from caixa.xdir import XDir
+from caixa.xdir.manifest import Manifest
+
+
+def write(root, relpath, data, age=None):
+    path = root / relpath
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if age is not None:
+        # Backdate the file, so that it isn't considered racy on the next scan
+        mtime = os.stat(path).st_mtime_ns - age
+        os.utime(path, ns=(mtime, mtime))
+
+
+def test_scan(tmp_path, monkeypatch):
+    hashed = []
+    file_checksum = manifest_module.file_checksum
+    def recording(path, *args, **kwargs):
+        hashed.append(os.path.relpath(path, tmp_path))
+        return file_checksum(path, *args, **kwargs)
+    monkeypatch.setattr(manifest_module, 'file_checksum', recording)
+
+    old = 10 * 10**9
+    write(tmp_path, 'a.txt', b'alpha', old)
+    write(tmp_path, 'sub/b.txt', b'beta', old)
+    write(tmp_path, 'sub/c.txt', b'alpha', old)
+    write(tmp_path, 'gone.txt', b'gone', old)
+    write(tmp_path, 'touched.txt', b'same', old)
+    write(tmp_path, 'recent.txt', b'recent')
+    write(tmp_path, '.hidden', b'alpha', old)
+    manifest, diff = Manifest.scan(str(tmp_path), workers=2)
+    assert diff.added == ['a.txt', 'gone.txt', 'recent.txt', os.path.join('sub', 'b.txt'), os.path.join('sub', 'c.txt'), 'touched.txt']
+    assert diff.removed == [] and diff.modified == []
+    assert diff.duplicates == [['a.txt', os.path.join('sub', 'c.txt')]]
+    assert sorted(hashed) == diff.added
+
+    hashed.clear()
+    write(tmp_path, 'sub/b.txt', b'BETA', old // 2)
+    write(tmp_path, 'touched.txt', b'same', old // 2)
+    write(tmp_path, 'new.txt', b'beta')
+    os.unlink(tmp_path / 'gone.txt')
+    manifest2, diff = Manifest.scan(str(tmp_path), previous=Manifest.from_dict(manifest.to_dict()), workers=2)
+    assert diff.added == ['new.txt']
+    assert diff.removed == ['gone.txt']
+    assert diff.modified == [os.path.join('sub', 'b.txt')]
+    assert diff.changed
+    # Unchanged files aren't rehashed, unless they were modified too close to the last scan
+    assert sorted(hashed) == ['new.txt', 'recent.txt', os.path.join('sub', 'b.txt'), 'touched.txt']
+    assert manifest2['a.txt'] == manifest['a.txt']
+    assert manifest2.by_checksum(manifest['a.txt'].checksum) == ['a.txt', os.path.join('sub', 'c.txt')]
+
+    hashed.clear()
+    _, diff = Manifest.scan(str(tmp_path), previous=manifest2, algorithm='crc32')
+    assert not diff.changed
+    assert len(hashed) == len(manifest2)
+
+
+def test_vanishing_files(tmp_path, monkeypatch):
+    write(tmp_path, 'a.txt', b'alpha')
+    write(tmp_path, 'gone.txt', b'gone')
+    manifest, _ = Manifest.scan(str(tmp_path))
+    write(tmp_path, 'new.txt', b'new')
+    file_checksum = manifest_module.file_checksum
+    def vanishing(path, *args, **kwargs):
+        # As if deleted by some other process in between the scandir and the hashing
+        if os.path.basename(path) != 'a.txt':
+            os.unlink(path)
+        return file_checksum(path, *args, **kwargs)
+    monkeypatch.setattr(manifest_module, 'file_checksum', vanishing)
+    manifest, diff = Manifest.scan(str(tmp_path), previous=manifest, workers=2)
+    assert list(manifest.entries) == ['a.txt']
+    assert (diff.added, diff.removed, diff.modified) == ([], ['gone.txt'], [])
+
+
+def test_update_manifest(tmp_path):
+    xdir = XDir(str(tmp_path))
+    assert xdir.load_manifest() is None
+    xdir.save_block('foo', 0, [1, 2, 3])
+    xdir.save_block('foo', 1, [1, 2, 3])
+    diff = xdir.update_manifest()
+    assert diff.added == ['foo-000000.pickle', 'foo-000001.pickle']
+    assert diff.duplicates == [diff.added]
+    assert len(xdir.load_manifest()) == 2
+    xdir.save_block('foo', 1, [4])
+    diff = xdir.update_manifest()
+    assert (diff.added, diff.removed, diff.modified) == ([], [], ['foo-000001.pickle'])
+    assert diff.duplicates == []
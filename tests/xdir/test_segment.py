@@ -0,0 +1,63 @@
+import pickle
+import pytest
+from caixa.xdir import XDir, BlockSegment
+
+
+def test_roundtrip(tmp_path):
+    xdir = XDir(str(tmp_path))
+    assert xdir.segment('foo') is None
+    seg = xdir.segment('foo', vivify=True)
+    for i in range(5):
+        xdir.save_block('foo', i, list(range(i)))
+    assert len(seg) == 5
+    assert xdir.load_block('foo', 3) == [0, 1, 2]
+    assert list(xdir.read_blocks('foo')) == [list(range(i)) for i in range(5)]
+    # No per-block files should have been created
+    assert sorted(xdir.get_files()) == ['foo.idx', 'foo.seg']
+
+
+def test_holes_and_rewrites(tmp_path):
+    with BlockSegment(str(tmp_path), 'bar', vivify=True) as seg:
+        seg.save_block(0, 'a')
+        seg.save_block(3, 'd')
+        assert list(seg.positions()) == [0, 3]
+        assert 1 not in seg
+        with pytest.raises(ValueError):
+            seg.load_block(1)
+        seg.save_block(0, 'aa')
+        assert list(seg.read_blocks()) == ['aa', 'd']
+        assert seg.append_block('e') == 4
+    # A fresh reader sees the same state
+    seg = BlockSegment(str(tmp_path), 'bar')
+    assert seg.load_block(0) == 'aa'
+    assert pickle.loads(seg.raw_block(3)) == 'd'
+    assert seg.load_block(4) == 'e'
+    seg.close()
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_parallel_read(tmp_path, executor):
+    xdir = XDir(str(tmp_path))
+    expected = [{'n': i, 'data': 'x' * i} for i in range(20)]
+    for i, block in enumerate(expected):
+        xdir.save_block('files', i, block)
+    xdir.segment('seg', vivify=True)
+    for i, block in enumerate(expected):
+        xdir.save_block('seg', i, block)
+    for label in ('files', 'seg'):
+        blocks = xdir.read_blocks(label, workers=3, prefetch=4, executor=executor)
+        assert list(blocks) == expected
+
+
+def test_concurrent_mapping(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    xdir = XDir(str(tmp_path))
+    seg = xdir.segment('seg', vivify=True)
+    for i in range(50):
+        seg.save_block(i, i)
+    for _ in range(20):
+        # Each round starts unmapped, so that the workers all race to map the segment
+        seg.close()
+        with ThreadPoolExecutor(8) as pool:
+            assert list(pool.map(seg.load_block, range(50))) == list(range(50))
+        assert seg._readf is not None
@@ -0,0 +1,34 @@
+import pytest
+from caixa.xdir import XDir
+
+
+def test_csv(tmp_path):
+    xdir = XDir(str(tmp_path))
+    recs = ({'id': str(i), 'name': f"n{i}"} for i in range(7))
+    assert xdir.save_recs('recs.csv', recs, flush_every=3) == 7
+    assert list(xdir.iter_csv('recs.csv'))[2] == {'id': '2', 'name': 'n2'}
+    assert [len(b) for b in xdir.iter_csv('recs.csv', batch=3)] == [3, 3, 1]
+    with pytest.raises(ValueError):
+        next(xdir.iter_csv('nope.csv'))
+
+
+def test_csv_headers(tmp_path):
+    xdir = XDir(str(tmp_path))
+    recs = [{'id': '1', 'name': 'a'}, {'id': '2'}, {'id': '3', 'name': 'c', 'extra': 'x'}]
+    with pytest.raises(ValueError):
+        xdir.save_recs('recs.csv', recs)
+    assert not xdir.exists('recs.csv')
+    assert xdir.save_recs('recs.csv', recs, extrasaction='ignore') == 3
+    assert [r['name'] for r in xdir.iter_csv('recs.csv')] == ['a', '', 'c']
+    assert xdir.save_recs('recs.csv', recs, fieldnames=['id', 'name', 'extra']) == 3
+    assert list(xdir.iter_csv('recs.csv'))[2] == recs[2]
+    assert xdir.save_recs('empty.csv', [], fieldnames=['id']) == 0
+    assert xdir.load_lines('empty.csv') == ['id']
+
+
+def test_jsonl_and_lines(tmp_path):
+    xdir = XDir(str(tmp_path))
+    assert xdir.append_jsonl('objs.jsonl', [{'a': 1}, [2]]) == 2
+    assert xdir.append_jsonl('objs.jsonl', iter([None]), flush_every=1) == 1
+    assert list(xdir.iter_jsonl('objs.jsonl')) == [{'a': 1}, [2], None]
+    assert list(xdir.iter_lines('objs.jsonl', batch=2)) == [['{"a": 1}', '[2]'], ['null']]